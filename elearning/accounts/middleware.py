@@ -1,45 +1,76 @@
-from django.utils.deprecation import MiddlewareMixin
+from importlib import import_module
+
+from django.conf import settings
 from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
 from .models import UserSession
 
+# How long a verified (user, session, device, ip) fingerprint is trusted
+# before the UserSession row is touched again; this bounds how stale
+# UserSession.last_activity can get.
+FINGERPRINT_TIMEOUT = getattr(settings, 'SESSION_FINGERPRINT_TIMEOUT', 60 * 15)
+
+
+def _fingerprint_key(session_key):
+    return f'user-session-fingerprint:{session_key}'
+
+
+def register_session(user, session_key, device_info, ip_address):
+    """
+    Record ``session_key`` as the user's only active session: log out every
+    other session with one bulk UPDATE and one DELETE, then refresh or
+    create the current UserSession row.
+    """
+    stale = list(
+        UserSession.objects.filter(user=user, is_active=True)
+        .exclude(session_key=session_key).values_list('session_key', flat=True)
+    )
+    if stale:
+        Session.objects.filter(session_key__in=stale).delete()
+        # Cache-backed session engines would otherwise keep serving them.
+        prefix = getattr(import_module(settings.SESSION_ENGINE).SessionStore, 'cache_key_prefix', None)
+        if prefix:
+            caches[settings.SESSION_CACHE_ALIAS].delete_many([prefix + key for key in stale])
+        UserSession.objects.filter(session_key__in=stale).update(is_active=False)
+        cache.delete_many([_fingerprint_key(key) for key in stale])
+
+    values = {'device_info': device_info, 'ip_address': ip_address, 'is_active': True}
+    if UserSession.objects.filter(user=user, session_key=session_key).update(last_activity=timezone.now(), **values):
+        return
+    try:
+        with transaction.atomic():
+            UserSession.objects.create(user=user, session_key=session_key, **values)
+    except IntegrityError:
+        # A concurrent request of the same session created the row first.
+        UserSession.objects.filter(user=user, session_key=session_key).update(**values)
+
+
 class SingleDeviceLoginMiddleware(MiddlewareMixin):
+    """
+    Keep each user logged in on one device. The database is only consulted
+    when a request's fingerprint is not in the cache: a new login, a new
+    device or address, or an expired fingerprint.
+    """
+
     def process_request(self, request):
-        if request.user.is_authenticated:
-            session_key = request.session.session_key
-            
-            if session_key:
-                user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
-                ip_address = self.get_client_ip(request)
-                
-                active_sessions = UserSession.objects.filter(
-                    user=request.user,
-                    is_active=True
-                ).exclude(session_key=session_key)
-                
-                for old_session in active_sessions:
-                    try:
-                        Session.objects.filter(session_key=old_session.session_key).delete()
-                    except:
-                        pass
-                    old_session.is_active = False
-                    old_session.save()
-                
-                user_session, created = UserSession.objects.get_or_create(
-                    user=request.user,
-                    session_key=session_key,
-                    defaults={
-                        'device_info': user_agent,
-                        'ip_address': ip_address,
-                        'is_active': True
-                    }
-                )
-                
-                if not created:
-                    user_session.device_info = user_agent
-                    user_session.ip_address = ip_address
-                    user_session.is_active = True
-                    user_session.save()
-    
+        if not request.user.is_authenticated:
+            return
+        session_key = request.session.session_key
+        if not session_key:
+            return
+
+        user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
+        ip_address = self.get_client_ip(request)
+        fingerprint = (request.user.pk, user_agent, ip_address)
+        key = _fingerprint_key(session_key)
+        if cache.get(key) == fingerprint:
+            return
+        register_session(request.user, session_key, user_agent, ip_address)
+        cache.set(key, fingerprint, FINGERPRINT_TIMEOUT)
+
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
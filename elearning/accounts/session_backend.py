@@ -0,0 +1,212 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'elearning.session_backend'
+EXPIRY_FLUSH_INTERVAL = getattr(settings, 'SESSION_EXPIRY_FLUSH_INTERVAL', 300)
+
+
+class ExpiryBuffer:
+    """
+    Write-behind buffer for sliding session expiry. Extensions are merged
+    per session key in process memory and written with one bulk UPDATE per
+    flush, at most ``flush_interval`` seconds after the first of them.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._entries = {}
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def add(self, session_key, expire_date):
+        with self._lock:
+            current = self._entries.get(session_key)
+            if current is None or expire_date > current:
+                self._entries[session_key] = expire_date
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = time.monotonic() - self._oldest >= self.flush_interval
+
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # flush() has put the batch back; the request itself succeeded.
+                logger.exception('Session expiry flush failed')
+                self._ensure_timer()
+        else:
+            self._ensure_timer()
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _ensure_timer(self):
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Session expiry flush failed')
+        finally:
+            connection.close()
+
+    def _drain(self):
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self._oldest = None
+        return entries
+
+    def _restore(self, entries):
+        with self._lock:
+            for key, expire_date in entries.items():
+                current = self._entries.get(key)
+                if current is None or expire_date > current:
+                    self._entries[key] = expire_date
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def flush(self):
+        """Write buffered expiry dates. Returns the number of sessions written."""
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            entries = self._drain()
+            if not entries:
+                return 0
+            try:
+                return write_expiry(entries)
+            except Exception:
+                self._restore(entries)
+                raise
+        finally:
+            self._flush_lock.release()
+
+
+def write_expiry(entries):
+    """
+    Store ``{session_key: expire_date}`` with a bulk UPDATE. Sessions that
+    were deleted in the meantime (logout, eviction) are simply not matched.
+    """
+    model = SessionStore.get_model_class()
+    with transaction.atomic():
+        model.objects.bulk_update(
+            [model(session_key=key, expire_date=expire_date) for key, expire_date in entries.items()],
+            ['expire_date'], batch_size=500,
+        )
+    return len(entries)
+
+
+expiry_buffer = ExpiryBuffer(EXPIRY_FLUSH_INTERVAL)
+
+
+def _flush_at_exit():
+    try:
+        expiry_buffer.flush()
+    except Exception:
+        logger.exception('Session expiry flush at exit failed')
+
+
+atexit.register(_flush_at_exit)
+
+
+class SessionStore(DBStore):
+    """
+    Database sessions that are only written when their data changes.
+
+    With SESSION_SAVE_EVERY_REQUEST each request re-saves the session just
+    to slide its expiry. Here an unchanged session costs no write; its new
+    expiry goes to ``expiry_buffer`` once it is SESSION_EXPIRY_FLUSH_INTERVAL
+    ahead of the stored one. Reads go through the session cache when that
+    cache is shared between processes. A per-process local-memory cache is
+    skipped, since another worker's logout would go unnoticed.
+    """
+
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._stored_expiry = None
+        self._stored_data = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    @property
+    def _use_cache(self):
+        return not isinstance(self._cache, LocMemCache)
+
+    def _snapshot(self, data):
+        return self.serializer().dumps(data)
+
+    def _cache_entry(self, data):
+        if self._use_cache:
+            timeout = self.get_expiry_age(expiry=self._stored_expiry)
+            self._cache.set(self.cache_key, (data, self._stored_expiry), timeout)
+
+    def load(self):
+        entry = None
+        if self._use_cache:
+            try:
+                entry = self._cache.get(self.cache_key)
+            except Exception:
+                # Some backends (e.g. memcache) raise an exception on invalid
+                # cache keys; fall back to the database.
+                entry = None
+
+        if entry is not None:
+            data, self._stored_expiry = entry
+        else:
+            s = self._get_session_from_db()
+            if s:
+                data = self.decode(s.session_data)
+                self._stored_expiry = s.expire_date
+                self._cache_entry(data)
+            else:
+                data = {}
+                self._stored_expiry = None
+        self._stored_data = self._snapshot(data)
+        return data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        snapshot = self._snapshot(data)
+        expiry = self.get_expiry_date()
+        if must_create or snapshot != self._stored_data or self._stored_expiry is None:
+            super().save(must_create=must_create)
+            self._stored_data, self._stored_expiry = snapshot, expiry
+            self._cache_entry(data)
+        elif expiry - self._stored_expiry >= timedelta(seconds=EXPIRY_FLUSH_INTERVAL):
+            expiry_buffer.add(self.session_key, expiry)
+            self._stored_expiry = expiry
+            self._cache_entry(data)
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
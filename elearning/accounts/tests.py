@@ -1,3 +1,133 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.sessions.models import Session
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import session_backend
+from .session_backend import EXPIRY_FLUSH_INTERVAL, ExpiryBuffer, SessionStore
+
+
+class SessionBackendTests(TestCase):
+
+    def setUp(self):
+        self.buffer = ExpiryBuffer(flush_interval=3600)
+        self.addCleanup(lambda: self.buffer._timer and self.buffer._timer.cancel())
+        patcher = mock.patch.object(session_backend, 'expiry_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        store = SessionStore()
+        store['cart'] = [1]
+        store.save()
+        self.session_key = store.session_key
+
+    def stored_expiry(self):
+        return Session.objects.values_list('expire_date', flat=True).get(session_key=self.session_key)
+
+    def age_session(self, seconds):
+        Session.objects.filter(session_key=self.session_key).update(expire_date=self.stored_expiry() - timedelta(seconds=seconds))
+
+    def test_unchanged_session_is_not_written(self):
+        store = SessionStore(self.session_key)
+        store['cart']
+        with self.assertNumQueries(0):
+            store.save()
+        self.assertEqual(self.buffer.pending(), 0)
+
+    def test_changed_data_is_written_at_once(self):
+        store = SessionStore(self.session_key)
+        store['cart'] = [1, 2]
+        store.save()
+
+        self.assertEqual(SessionStore(self.session_key)['cart'], [1, 2])
+        self.assertEqual(self.buffer.pending(), 0)
+
+    def test_sliding_expiry_is_buffered_and_coalesced(self):
+        self.age_session(EXPIRY_FLUSH_INTERVAL + 60)
+        aged = self.stored_expiry()
+        for _ in range(3):
+            store = SessionStore(self.session_key)
+            store['cart']
+            store.save()
+
+        self.assertEqual(self.buffer.pending(), 1)
+        self.assertEqual(self.stored_expiry(), aged)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual([query['sql'].split()[0] for query in queries].count('UPDATE'), 1)
+        self.assertGreater(self.stored_expiry(), aged + timedelta(seconds=EXPIRY_FLUSH_INTERVAL))
+
+    def test_small_expiry_changes_are_not_buffered(self):
+        self.age_session(EXPIRY_FLUSH_INTERVAL - 60)
+        store = SessionStore(self.session_key)
+        store['cart']
+        store.save()
+
+        self.assertEqual(self.buffer.pending(), 0)
+
+    def test_flush_does_not_revive_deleted_sessions(self):
+        self.age_session(EXPIRY_FLUSH_INTERVAL + 60)
+        store = SessionStore(self.session_key)
+        store['cart']
+        store.save()
+        SessionStore(self.session_key).delete()
+
+        self.buffer.flush()
+
+        self.assertFalse(Session.objects.filter(session_key=self.session_key).exists())
+
+    def test_failed_due_flush_keeps_the_extension(self):
+        later = timezone.now() + timedelta(days=2)
+        self.buffer.add(self.session_key, later - timedelta(days=1))
+        self.buffer._oldest -= self.buffer.flush_interval
+        with mock.patch.object(session_backend, 'write_expiry', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('elearning.accounts.session_backend', 'ERROR'):
+                self.buffer.add(self.session_key, later)
+
+        self.assertEqual(self.buffer.pending(), 1)
+        self.buffer.flush()
+        self.assertEqual(self.stored_expiry(), later)
+
+    def test_buffer_keeps_the_latest_expiry(self):
+        later = timezone.now() + timedelta(days=2)
+        self.buffer.add(self.session_key, later)
+        self.buffer.add(self.session_key, later - timedelta(days=1))
+
+        self.buffer.flush()
+
+        self.assertEqual(self.stored_expiry(), later)
+
+
+class CachedSessionBackendTests(TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        settings = override_settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'sessions': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir},
+            },
+            SESSION_CACHE_ALIAS='sessions',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_shared_cache_serves_reads_and_forgets_deleted_sessions(self):
+        store = SessionStore()
+        store['cart'] = [1]
+        store.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(store.session_key)['cart'], [1])
+
+        SessionStore(store.session_key).delete()
+
+        with self.assertNumQueries(1):
+            self.assertNotIn('cart', SessionStore(store.session_key))
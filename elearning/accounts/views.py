@@ -86,19 +86,19 @@ from .decorators import admin_required, tutor_required, student_required
 
 @admin_required
 def admin_dashboard(request):
-    from elearning.courses.models import Course, CourseEnrollment
-    from elearning.payments.models import Purchase
-    from django.db.models import Sum
+    from elearning.courses.models import Course
+    from elearning.payments.models import Purchase, TutorDailyStats
+    from elearning.payments.rollups import summary
+    from django.db.models import Count, Q
     
-    total_users = User.objects.count()
-    total_tutors = User.objects.filter(role='tutor').count()
-    total_students = User.objects.filter(role='student').count()
+    user_counts = User.objects.aggregate(
+        total=Count('id'),
+        tutors=Count('id', filter=Q(role='tutor')),
+        students=Count('id', filter=Q(role='student')),
+    )
     total_courses = Course.objects.count()
-    total_enrollments = CourseEnrollment.objects.count()
-    
-    total_revenue = Purchase.objects.filter(status='completed').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    # Tutor rollups cover every course, with far fewer rows than the course ones.
+    totals, revenue_series = summary(TutorDailyStats.objects.all())
     
     recent_users = User.objects.order_by('-date_joined')[:5]
     recent_courses = Course.objects.order_by('-created_at')[:5]
@@ -107,12 +107,14 @@ def admin_dashboard(request):
     ).order_by('-completed_at')[:10]
     
     return render(request, 'dashboards/admin.html', {
-        'total_users': total_users,
-        'total_tutors': total_tutors,
-        'total_students': total_students,
+        'total_users': user_counts['total'],
+        'total_tutors': user_counts['tutors'],
+        'total_students': user_counts['students'],
         'total_courses': total_courses,
-        'total_enrollments': total_enrollments,
-        'total_revenue': total_revenue,
+        'total_enrollments': totals['new_enrollments'],
+        'total_revenue': totals['net_revenue'],
+        'total_refunds': totals['refunds'],
+        'revenue_series': revenue_series,
         'recent_users': recent_users,
         'recent_courses': recent_courses,
         'recent_purchases': recent_purchases
@@ -122,8 +124,11 @@ def admin_dashboard(request):
 def tutor_dashboard(request):
     from elearning.courses.models import Course, CourseEnrollment
     from elearning.quizzes.models import QuizAttempt
+    from elearning.payments.models import TutorDailyStats
+    from elearning.payments.rollups import summary
     
     my_courses = Course.objects.filter(tutor=request.user)
+    revenue, revenue_series = summary(TutorDailyStats.objects.filter(tutor=request.user))
     total_students = CourseEnrollment.objects.filter(
         course__in=my_courses
     ).count()
@@ -141,12 +146,15 @@ def tutor_dashboard(request):
         'total_courses': my_courses.count(),
         'total_students': total_students,
         'recent_enrollments': recent_enrollments,
-        'recent_quiz_attempts': recent_quiz_attempts
+        'recent_quiz_attempts': recent_quiz_attempts,
+        'revenue': revenue,
+        'revenue_series': revenue_series
     })
 
 @student_required
 def student_dashboard(request):
     from elearning.courses.models import CourseEnrollment, Course
+    from elearning.quizzes.schedule import open_quizzes_for, run_due_transitions
     
     enrollments = CourseEnrollment.objects.filter(
         student=request.user,
@@ -160,9 +168,12 @@ def student_dashboard(request):
         id__in=enrollments.values_list('course_id', flat=True)
     )[:6]
     
+    run_due_transitions()
+    
     return render(request, 'dashboards/student.html', {
         'enrollments': enrollments,
-        'available_courses': available_courses
+        'available_courses': available_courses,
+        'open_quizzes': open_quizzes_for(request.user, limit=5)
     })
 
 
@@ -21,8 +21,8 @@ class UnitAdmin(admin.ModelAdmin):
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
-    list_display = ['title', 'unit', 'duration', 'is_free', 'order']
-    list_filter = ['is_free', 'unit__course']
+    list_display = ['title', 'unit', 'duration', 'is_free', 'order', 'transcode_status']
+    list_filter = ['is_free', 'transcode_status', 'unit__course']
     search_fields = ['title', 'unit__title']
 
 @admin.register(Material)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'elearning.courses'
+
+    def ready(self):
+        from . import signals  # noqa: F401
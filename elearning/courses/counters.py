@@ -0,0 +1,44 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Course, Unit, Video, Material
+
+
+def adjust_counters(queryset, **deltas):
+    """Apply ``field=delta`` increments in one UPDATE, never going below zero."""
+    updates = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items() if delta
+    }
+    if updates:
+        queryset.update(**updates)
+
+
+def _subquery_total(queryset, group_field, aggregate):
+    subquery = queryset.filter(**{group_field: OuterRef('pk')}).order_by().values(group_field)
+    subquery = subquery.annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def rebuild_unit_counters(units=None):
+    units = Unit.objects.all() if units is None else units
+    return units.update(
+        video_count=_subquery_total(Video.objects.all(), 'unit', Count('pk')),
+        material_count=_subquery_total(Material.objects.all(), 'unit', Count('pk')),
+        total_video_duration=_subquery_total(Video.objects.all(), 'unit', Sum('duration')),
+    )
+
+
+def rebuild_course_counters(courses=None):
+    from elearning.payments.models import Purchase
+
+    courses = Course.objects.all() if courses is None else courses
+    return courses.update(
+        unit_count=_subquery_total(Unit.objects.all(), 'course', Count('pk')),
+        video_count=_subquery_total(Video.objects.all(), 'unit__course', Count('pk')),
+        material_count=_subquery_total(Material.objects.all(), 'unit__course', Count('pk')),
+        total_video_duration=_subquery_total(Video.objects.all(), 'unit__course', Sum('duration')),
+        completed_purchase_count=_subquery_total(
+            Purchase.objects.filter(status='completed'), 'course', Count('pk')
+        ),
+    )
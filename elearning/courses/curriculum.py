@@ -0,0 +1,66 @@
+from django.db.models import F, Prefetch
+
+from .models import MaterialView, Video, VideoWatch
+
+CURRICULUM_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def bump_content_version(courses):
+    """Invalidate cached curriculum fragments for ``courses`` (a queryset)."""
+    courses.update(content_version=F('content_version') + 1)
+
+
+def load_learning_curriculum(course, student):
+    """
+    Fetch everything course_learn renders for one student in five queries:
+    units, videos with their quiz, materials, and the student's VideoWatch and
+    MaterialView rows. Returns plain dicts so the template never touches the
+    database while iterating.
+    """
+    units = list(course.units.prefetch_related(
+        Prefetch('videos', queryset=Video.objects.select_related('quiz')),
+        'materials',
+    ))
+
+    watches = {
+        watch.video_id: watch
+        for watch in VideoWatch.objects.filter(student=student, video__unit__course=course)
+    }
+    views = {
+        view.material_id: view
+        for view in MaterialView.objects.filter(student=student, material__unit__course=course)
+    }
+
+    curriculum = {
+        'units': [],
+        'total_videos': 0,
+        'completed_videos': 0,
+        'total_materials': 0,
+        'completed_materials': 0,
+    }
+    for unit in units:
+        videos = []
+        for video in unit.videos.all():
+            watch = watches.get(video.id)
+            videos.append({
+                'video': video,
+                'quiz': getattr(video, 'quiz', None),
+                'watch': watch,
+                'is_completed': bool(watch and watch.is_completed),
+            })
+        materials = []
+        for material in unit.materials.all():
+            view = views.get(material.id)
+            materials.append({
+                'material': material,
+                'view': view,
+                'is_completed': bool(view and view.is_completed),
+            })
+
+        curriculum['units'].append({'unit': unit, 'videos': videos, 'materials': materials})
+        curriculum['total_videos'] += len(videos)
+        curriculum['completed_videos'] += sum(1 for item in videos if item['is_completed'])
+        curriculum['total_materials'] += len(materials)
+        curriculum['completed_materials'] += sum(1 for item in materials if item['is_completed'])
+
+    return curriculum
@@ -0,0 +1,150 @@
+"""
+ffmpeg/ffprobe helpers for the transcoding pool.
+
+Everything here runs inside pool worker processes, so this module must not
+import Django or touch the database: it works on plain paths and returns
+plain data for the parent process to store.
+"""
+import json
+import os
+import shutil
+import subprocess
+
+SEGMENT_SECONDS = 6
+COMMAND_TIMEOUT = 60 * 60 * 3
+
+# (name, height, video kbps, audio kbps), best first.
+RENDITION_LADDER = [
+    ('1080p', 1080, 5000, 192),
+    ('720p', 720, 2800, 128),
+    ('480p', 480, 1400, 128),
+    ('360p', 360, 800, 96),
+    ('240p', 240, 400, 64),
+]
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def _run(command):
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=COMMAND_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        raise TranscodeError(f'{os.path.basename(command[0])} failed: {exc}')
+    if result.returncode != 0:
+        stderr = result.stderr.decode(errors='replace').strip()
+        raise TranscodeError(f'{os.path.basename(command[0])} exited with {result.returncode}: {stderr[-500:]}')
+    return result.stdout
+
+
+def probe(source, ffprobe='ffprobe'):
+    """Return duration (seconds), frame size and whether there is an audio track."""
+    output = _run([
+        ffprobe, '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', source,
+    ])
+    info = json.loads(output or b'{}')
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video is None:
+        raise TranscodeError('No video stream found')
+    duration = info.get('format', {}).get('duration') or video.get('duration') or 0
+    return {
+        'duration': float(duration),
+        'width': int(video.get('width') or 0),
+        'height': int(video.get('height') or 0),
+        'has_audio': any(s.get('codec_type') == 'audio' for s in streams),
+    }
+
+
+def _even(value):
+    return max(2, int(round(value / 2.0)) * 2)
+
+
+def select_renditions(width, height):
+    """Ladder rungs no taller than the source; a small source gets one rung at its own size."""
+    rungs = [rung for rung in RENDITION_LADDER if rung[1] <= height]
+    if not rungs:
+        name, _, video_kbps, audio_kbps = RENDITION_LADDER[-1]
+        rungs = [(name, _even(height or 240), video_kbps, audio_kbps)]
+    aspect = (width / height) if width and height else 16 / 9
+    return [
+        {'name': name, 'width': _even(rung_height * aspect), 'height': rung_height,
+         'video_kbps': video_kbps, 'audio_kbps': audio_kbps}
+        for name, rung_height, video_kbps, audio_kbps in rungs
+    ]
+
+
+def transcode_rendition(source, directory, rendition, has_audio, ffmpeg='ffmpeg'):
+    os.makedirs(directory, exist_ok=True)
+    video_kbps = rendition['video_kbps']
+    command = [
+        ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-i', source,
+        '-map', '0:v:0',
+        '-vf', f"scale={rendition['width']}:{rendition['height']}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+        '-b:v', f'{video_kbps}k', '-maxrate', f'{int(video_kbps * 1.07)}k', '-bufsize', f'{video_kbps * 2}k',
+        # Keyframes on segment boundaries keep renditions switchable at every segment.
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})', '-sc_threshold', '0',
+    ]
+    if has_audio:
+        command += ['-map', '0:a:0', '-c:a', 'aac', '-b:a', f"{rendition['audio_kbps']}k", '-ac', '2']
+    command += [
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(directory, 'segment_%05d.ts'),
+        os.path.join(directory, 'index.m3u8'),
+    ]
+    _run(command)
+
+
+def extract_poster(source, destination, duration, ffmpeg='ffmpeg'):
+    offset = min(duration * 0.1, 5.0) if duration else 0
+    _run([
+        ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-ss', f'{offset:.2f}', '-i', source,
+        '-frames:v', '1', '-vf', 'scale=-2:min(720\\,ih)', '-q:v', '3', destination,
+    ])
+
+
+def write_master_playlist(directory, renditions, has_audio):
+    codecs = 'avc1.4d401f,mp4a.40.2' if has_audio else 'avc1.4d401f'
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for rendition in renditions:
+        bandwidth = (rendition['video_kbps'] + (rendition['audio_kbps'] if has_audio else 0)) * 1000
+        lines.append(
+            f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},"
+            f"RESOLUTION={rendition['width']}x{rendition['height']},CODECS=\"{codecs}\""
+        )
+        lines.append(f"{rendition['name']}/index.m3u8")
+    with open(os.path.join(directory, 'master.m3u8'), 'w') as handle:
+        handle.write('\n'.join(lines) + '\n')
+
+
+def transcode_to_hls(source, output_dir, ffmpeg='ffmpeg', ffprobe='ffprobe'):
+    """
+    Build an HLS ladder plus poster.jpg for ``source`` in ``output_dir``.
+    Work happens in a sibling temporary directory that is renamed into place,
+    so a half-written ladder is never visible. Returns the probed metadata.
+    """
+    work_dir = output_dir + '.tmp'
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    try:
+        info = probe(source, ffprobe)
+        renditions = select_renditions(info['width'], info['height'])
+        for rendition in renditions:
+            transcode_rendition(
+                source, os.path.join(work_dir, rendition['name']), rendition, info['has_audio'], ffmpeg
+            )
+        write_master_playlist(work_dir, renditions, info['has_audio'])
+        extract_poster(source, os.path.join(work_dir, 'poster.jpg'), info['duration'], ffmpeg)
+    except Exception:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(work_dir, output_dir)
+    return {
+        'duration': info['duration'],
+        'renditions': [rendition['name'] for rendition in renditions],
+    }
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from elearning.courses.models import UploadSession
+from elearning.courses.uploads import TARGET_FIELDS, discard
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked upload sessions (and their files) that were abandoned'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Age in hours after which an unclaimed upload is removed')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        removed = 0
+        for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+            if session.is_complete and session.file_name:
+                TARGET_FIELDS[session.target].storage.delete(session.file_name)
+            discard(session)
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} abandoned uploads.'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from elearning.courses.counters import rebuild_course_counters, rebuild_unit_counters
+from elearning.courses.models import Course, CourseEnrollment, Unit
+from elearning.courses.progress import rebuild_enrollment_progress
+
+
+class Command(BaseCommand):
+    help = 'Recompute stored course/unit counters and enrollment progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help='Only rebuild the given course id (repeatable)')
+
+    def handle(self, *args, **options):
+        course_ids = options.get('course_ids')
+        courses = Course.objects.all()
+        units = Unit.objects.all()
+        enrollments = CourseEnrollment.objects.all()
+        if course_ids:
+            courses = courses.filter(pk__in=course_ids)
+            units = units.filter(course_id__in=course_ids)
+            enrollments = enrollments.filter(course_id__in=course_ids)
+
+        with transaction.atomic():
+            unit_rows = rebuild_unit_counters(units)
+            course_rows = rebuild_course_counters(courses)
+            enrollment_rows = rebuild_enrollment_progress(enrollments)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt counters for {course_rows} courses, {unit_rows} units '
+            f'and {enrollment_rows} enrollments.'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elearning.courses.ffmpeg import TranscodeError
+from elearning.courses.models import Video
+from elearning.courses.transcoding import transcode_now, transcoding_available
+
+
+class Command(BaseCommand):
+    help = 'Build HLS renditions for uploaded videos that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--video', type=int, action='append', dest='video_ids',
+                            help='Only transcode the given video id (repeatable)')
+        parser.add_argument('--all', action='store_true',
+                            help='Also redo videos whose renditions are already ready')
+
+    def handle(self, *args, **options):
+        if not transcoding_available():
+            raise CommandError('ffmpeg/ffprobe not found or VIDEO_TRANSCODE_ENABLED is off.')
+
+        videos = Video.objects.exclude(video_file='').exclude(video_file__isnull=True)
+        if options.get('video_ids'):
+            videos = videos.filter(pk__in=options['video_ids'])
+        elif not options['all']:
+            # Pending jobs are lost if the web process restarts, so pick them up too.
+            videos = videos.exclude(transcode_status='ready')
+
+        done = failed = 0
+        for video in videos.order_by('pk').iterator():
+            try:
+                transcode_now(video)
+            except TranscodeError as exc:
+                failed += 1
+                self.stderr.write(f'Video {video.pk}: {exc}')
+            else:
+                done += 1
+                self.stdout.write(f'Video {video.pk}: ready')
+
+        self.stdout.write(self.style.SUCCESS(f'Transcoded {done} videos, {failed} failed.'))
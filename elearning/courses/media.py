@@ -0,0 +1,155 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+STREAM_CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+COMPRESSED_TYPES = {
+    'br': 'application/x-brotli',
+    'bzip2': 'application/x-bzip',
+    'compress': 'application/x-compress',
+    'gzip': 'application/gzip',
+    'xz': 'application/x-xz',
+}
+
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+
+
+def _etag_for(stat):
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def parse_range(header, size):
+    """
+    Parse a single ``bytes=start-end`` range against ``size``. Returns
+    ``(start, end)`` inclusive, ``None`` when the header is absent or not
+    something we serve partially, or ``False`` when it cannot be satisfied.
+    Multi-range requests fall back to a full response.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_range(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _offload_response(name, path):
+    """Hand the transfer to the front-end server when MEDIA_SENDFILE_BACKEND is set."""
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', '')
+    if backend == 'nginx':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name.lstrip('/')
+        return response
+    if backend in ('apache', 'lighttpd'):
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def serve_media_file(request, field_file, as_attachment=False):
+    """
+    Serve a FileField from MEDIA_ROOT with Range/206 and ETag/Last-Modified
+    support, or delegate to nginx/Apache via X-Accel-Redirect/X-Sendfile.
+    Access control is the caller's job.
+    """
+    if not field_file:
+        raise Http404('File not found')
+    return serve_media_path(request, field_file.name, as_attachment, storage=field_file.storage)
+
+
+def serve_media_path(request, name, as_attachment=False, storage=None):
+    """Like serve_media_file, for a storage name that is not attached to a FileField."""
+    storage = storage or default_storage
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (OSError, NotImplementedError, ValueError):
+        raise Http404('File not found')
+
+    etag = _etag_for(stat)
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if conditional is not None:
+        return conditional
+
+    content_type, encoding = mimetypes.guess_type(path)
+    # Files are sent as stored: a .gz upload is a gzip file, not a gzip
+    # Content-Encoding of something else.
+    content_type = COMPRESSED_TYPES.get(encoding, content_type) or 'application/octet-stream'
+    filename = os.path.basename(name)
+
+    response = _offload_response(name, path)
+    if response is None:
+        size = stat.st_size
+        byte_range = None
+        if _if_range_matches(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _iter_range(path, start, length), status=206, content_type=content_type
+            )
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+    else:
+        response['Content-Type'] = content_type
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = 'private, max-age=3600'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
@@ -0,0 +1,85 @@
+# Full-text search index for the course catalog.
+#
+# SQLite gets an external-content FTS5 table kept in sync by triggers, so any
+# save, update or delete of a course row is reflected without app code.
+# PostgreSQL gets a GIN index over the same weighted tsvector used by
+# elearning.courses.search. Other backends fall back to icontains.
+#
+# Note: SQLite drops the triggers whenever Django rebuilds courses_course
+# (AddField, AlterField...); such migrations must create them again, as
+# 0010_restore_course_search_triggers does.
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS courses_course_fts USING fts5(
+        title, description,
+        content='courses_course', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS courses_course_fts_ai AFTER INSERT ON courses_course BEGIN
+        INSERT INTO courses_course_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS courses_course_fts_ad AFTER DELETE ON courses_course BEGIN
+        INSERT INTO courses_course_fts(courses_course_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS courses_course_fts_au AFTER UPDATE OF title, description ON courses_course BEGIN
+        INSERT INTO courses_course_fts(courses_course_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO courses_course_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO courses_course_fts(courses_course_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS courses_course_fts_au",
+    "DROP TRIGGER IF EXISTS courses_course_fts_ad",
+    "DROP TRIGGER IF EXISTS courses_course_fts_ai",
+    "DROP TABLE IF EXISTS courses_course_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS courses_course_search_idx ON courses_course USING GIN ((
+        setweight(to_tsvector('english'::regconfig, COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, COALESCE(description, '')), 'B')
+    ))
+    """,
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS courses_course_search_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_materialview'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
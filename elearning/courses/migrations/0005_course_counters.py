@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:14
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def _total(queryset, group_field, aggregate):
+    subquery = queryset.filter(**{group_field: OuterRef('pk')}).order_by().values(group_field)
+    subquery = subquery.annotate(total=aggregate).values('total')
+    return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+
+def populate_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Unit = apps.get_model('courses', 'Unit')
+    Video = apps.get_model('courses', 'Video')
+    Material = apps.get_model('courses', 'Material')
+    Purchase = apps.get_model('payments', 'Purchase')
+
+    Unit.objects.update(
+        video_count=_total(Video.objects.all(), 'unit', Count('pk')),
+        material_count=_total(Material.objects.all(), 'unit', Count('pk')),
+        total_video_duration=_total(Video.objects.all(), 'unit', Sum('duration')),
+    )
+    Course.objects.update(
+        unit_count=_total(Unit.objects.all(), 'course', Count('pk')),
+        video_count=_total(Video.objects.all(), 'unit__course', Count('pk')),
+        material_count=_total(Material.objects.all(), 'unit__course', Count('pk')),
+        total_video_duration=_total(Video.objects.all(), 'unit__course', Sum('duration')),
+        completed_purchase_count=_total(Purchase.objects.filter(status='completed'), 'course', Count('pk')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_keyset_indexes'),
+        ('payments', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='completed_purchase_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='material_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_video_duration',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Total video duration in seconds'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='unit_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='material_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='total_video_duration',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Total video duration in seconds'),
+        ),
+        migrations.AddField(
+            model_name='unit',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:17
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_completed_items(apps, schema_editor):
+    CourseEnrollment = apps.get_model('courses', 'CourseEnrollment')
+    Course = apps.get_model('courses', 'Course')
+    VideoWatch = apps.get_model('courses', 'VideoWatch')
+    MaterialView = apps.get_model('courses', 'MaterialView')
+
+    def completed(model, item_path):
+        subquery = model.objects.filter(
+            student_id=OuterRef('student_id'),
+            is_completed=True,
+            **{f'{item_path}__unit__course_id': OuterRef('course_id')}
+        ).order_by().values('student_id').annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+    CourseEnrollment.objects.update(
+        completed_items=completed(VideoWatch, 'video') + completed(MaterialView, 'material')
+    )
+
+    totals = {
+        course_id: videos + materials
+        for course_id, videos, materials in Course.objects.values_list('id', 'video_count', 'material_count')
+    }
+    enrollments = list(CourseEnrollment.objects.only('id', 'course_id', 'completed_items'))
+    for enrollment in enrollments:
+        total = totals.get(enrollment.course_id, 0)
+        enrollment.progress = min(enrollment.completed_items * 100.0 / total, 100.0) if total else 0.0
+    CourseEnrollment.objects.bulk_update(enrollments, ['progress'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseenrollment',
+            name='completed_items',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Completed videos and materials'),
+        ),
+        migrations.RunPython(populate_completed_items, migrations.RunPython.noop),
+    ]
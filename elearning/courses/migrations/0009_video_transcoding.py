@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_playlist',
+            field=models.CharField(blank=True, editable=False, help_text='Master HLS playlist, relative to MEDIA_ROOT', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='transcode_status',
+            field=models.CharField(choices=[('none', 'Not transcoded'), ('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# On SQLite, AddField on courses_course (0005, 0006) rebuilds the table,
+# which drops the triggers keeping the FTS5 index in sync. Create them again
+# and rebuild the index from the table.
+
+from importlib import import_module
+
+from django.db import migrations
+
+search_index = import_module('elearning.courses.migrations.0003_course_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_video_transcoding'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            search_index._run({'sqlite': search_index.SQLITE_FORWARD}),
+            migrations.RunPython.noop,
+        ),
+    ]
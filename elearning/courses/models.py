@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils.text import slugify
+import uuid
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -28,6 +29,12 @@ class Course(models.Model):
     is_published = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    unit_count = models.PositiveIntegerField(default=0, editable=False)
+    video_count = models.PositiveIntegerField(default=0, editable=False)
+    material_count = models.PositiveIntegerField(default=0, editable=False)
+    total_video_duration = models.PositiveIntegerField(default=0, editable=False, help_text="Total video duration in seconds")
+    completed_purchase_count = models.PositiveIntegerField(default=0, editable=False)
+    content_version = models.PositiveIntegerField(default=1, editable=False, help_text="Bumped whenever the curriculum changes")
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -38,14 +45,16 @@ class Course(models.Model):
         return self.title
     
     def get_total_units(self):
-        return self.units.count()
+        return self.unit_count
     
     def get_enrolled_students(self):
-        from elearning.payments.models import Purchase
-        return Purchase.objects.filter(course=self, status='completed').count()
+        return self.completed_purchase_count
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='course_created_id_idx'),
+        ]
 
 
 class Unit(models.Model):
@@ -55,6 +64,14 @@ class Unit(models.Model):
     order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    video_count = models.PositiveIntegerField(default=0, editable=False)
+    material_count = models.PositiveIntegerField(default=0, editable=False)
+    total_video_duration = models.PositiveIntegerField(default=0, editable=False, help_text="Total video duration in seconds")
+    
+    def save(self, *args, **kwargs):
+        # Counter signals run inside this block so the row and its counters commit together.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
@@ -65,6 +82,14 @@ class Unit(models.Model):
 
 
 class Video(models.Model):
+    TRANSCODE_STATUSES = [
+        ('none', 'Not transcoded'),
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='videos')
     title = models.CharField(max_length=200)
     video_url = models.URLField(help_text="Video URL (YouTube, Vimeo, or direct link)")
@@ -73,9 +98,20 @@ class Video(models.Model):
     duration = models.PositiveIntegerField(help_text="Duration in seconds", default=0)
     order = models.PositiveIntegerField(default=0)
     is_free = models.BooleanField(default=False)
+    transcode_status = models.CharField(max_length=20, choices=TRANSCODE_STATUSES, default='none', editable=False)
+    hls_playlist = models.CharField(max_length=255, blank=True, editable=False,
+                                    help_text="Master HLS playlist, relative to MEDIA_ROOT")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    @property
+    def has_hls(self):
+        return self.transcode_status == 'ready' and bool(self.hls_playlist)
+    
     def __str__(self):
         return f"{self.unit.title} - {self.title}"
     
@@ -100,6 +136,10 @@ class Material(models.Model):
     is_downloadable = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     def __str__(self):
         return self.title
     
@@ -164,6 +204,7 @@ class CourseEnrollment(models.Model):
     enrolled_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     progress = models.FloatField(default=0.0, help_text="Course completion percentage")
+    completed_items = models.PositiveIntegerField(default=0, editable=False, help_text="Completed videos and materials")
     
     def __str__(self):
         return f"{self.student.username} - {self.course.title}"
@@ -171,3 +212,36 @@ class CourseEnrollment(models.Model):
     class Meta:
         unique_together = ['student', 'course']
         ordering = ['-enrolled_at']
+        indexes = [
+            models.Index(fields=['student', '-enrolled_at', '-id'], name='enroll_student_idx'),
+            models.Index(fields=['course', '-enrolled_at', '-id'], name='enroll_course_idx'),
+        ]
+
+
+class UploadSession(models.Model):
+    TARGET_CHOICES = [
+        ('video', 'Video'),
+        ('material', 'Material'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tutor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField(help_text="Declared file size in bytes")
+    received = models.PositiveBigIntegerField(default=0, help_text="Bytes stored so far")
+    file_name = models.CharField(max_length=255, blank=True, help_text="Storage name once assembled")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
+    
+    def __str__(self):
+        return f"{self.tutor.username} - {self.filename} ({self.received}/{self.total_size})"
+    
+    class Meta:
+        ordering = ['-created_at']
@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+ESTIMATE_CACHE_TIMEOUT = 60 * 5
+
+
+def _encode_cursor(values, backwards=False):
+    payload = json.dumps({'v': values, 'b': backwards}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload['v'], bool(payload['b'])
+    except (ValueError, TypeError, KeyError):
+        return None, False
+
+
+def estimate_count(queryset):
+    """
+    Cheap row count for "about N results" labels. PostgreSQL answers from the
+    planner estimate; other backends run the real COUNT once and cache it.
+    """
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    key = 'estimate-count:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, ESTIMATE_CACHE_TIMEOUT)
+    return count
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor, params):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def estimated_total(self):
+        return self.paginator.estimated_total()
+
+    def _querystring(self, cursor):
+        params = self._params.copy()
+        params[self.paginator.cursor_param] = cursor
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        return self._querystring(self.next_cursor) if self.next_cursor else ''
+
+    @property
+    def previous_querystring(self):
+        return self._querystring(self.previous_cursor) if self.previous_cursor else ''
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a stable ordering such as ('-created_at', '-id').
+
+    Each page is one indexed range query for per_page + 1 rows; there is no
+    COUNT and no OFFSET, so page 5,000 costs the same as page 1. The last
+    field must be unique (normally the primary key) to break ties.
+    """
+
+    cursor_param = 'cursor'
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id'), estimate_total=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.estimate_total_enabled = estimate_total
+        self._estimated_total = None
+
+    def _fields(self):
+        return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def _values_for(self, obj):
+        values = []
+        for name, _ in self._fields():
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def _parse_values(self, values):
+        """
+        Convert cursor values back to field values, or return None if the
+        cursor does not fit this ordering (stale or tampered with).
+        """
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None
+        model = self.queryset.model
+        parsed = []
+        for (name, _), value in zip(self._fields(), values):
+            field = model._meta.get_field(name)
+            if value is None or isinstance(value, (list, dict)):
+                return None
+            try:
+                if field.get_internal_type() == 'DateTimeField':
+                    value = parse_datetime(value) if isinstance(value, str) else None
+                    if value is None or (settings.USE_TZ and timezone.is_naive(value)):
+                        return None
+                else:
+                    value = field.to_python(value)
+            except (ValueError, ValidationError):
+                return None
+            parsed.append(value)
+        return parsed
+
+    def _seek(self, values, backwards):
+        """Build the row-value comparison (a, b) < (x, y) as nested Q objects."""
+        condition = Q()
+        fields = self._fields()
+        for i, (name, descending) in enumerate(fields):
+            ahead = descending != backwards
+            lookup = f'{name}__lt' if ahead else f'{name}__gt'
+            clause = Q(**{lookup: values[i]})
+            for j in range(i):
+                clause &= Q(**{fields[j][0]: values[j]})
+            condition |= clause
+        return condition
+
+    def estimated_total(self):
+        if not self.estimate_total_enabled:
+            return None
+        if self._estimated_total is None:
+            self._estimated_total = estimate_count(self.queryset)
+        return self._estimated_total
+
+    def get_page(self, params):
+        """Return the page addressed by the cursor in ``params`` (a QueryDict)."""
+        cursor = params.get(self.cursor_param)
+        values, backwards = _decode_cursor(cursor) if cursor else (None, False)
+        if values is not None:
+            values = self._parse_values(values)
+        if values is None:
+            backwards = False
+
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(f[1:] if f.startswith('-') else f'-{f}' for f in ordering)
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = _encode_cursor(self._values_for(rows[-1]))
+            if values is not None and (has_more or not backwards):
+                previous_cursor = _encode_cursor(self._values_for(rows[0]), backwards=True)
+
+        page_params = params.copy()
+        page_params.pop(self.cursor_param, None)
+        return KeysetPage(rows, self, next_cursor, previous_cursor, page_params)
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Least
+from django.db.models.lookups import GreaterThan
+
+from .models import Course, CourseEnrollment, MaterialView, VideoWatch
+
+
+def _course_total():
+    """Videos + materials of the enrollment's course, read from the stored counters."""
+    total = Course.objects.filter(pk=OuterRef('course_id')).values(
+        total=F('video_count') + F('material_count')
+    )
+    return Subquery(total, output_field=IntegerField())
+
+
+def _progress_for(completed):
+    total = _course_total()
+    percentage = Cast(completed, FloatField()) * Value(100.0) / Cast(total, FloatField())
+    return Case(
+        When(GreaterThan(Coalesce(total, Value(0)), 0), then=Least(percentage, Value(100.0))),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def apply_completion_delta(enrollments, delta):
+    """
+    Add ``delta`` completed items to ``enrollments`` and recompute progress in
+    the same UPDATE. O(1) regardless of how big the course is.
+    """
+    completed = Greatest(F('completed_items') + Value(delta), Value(0))
+    return enrollments.update(completed_items=completed, progress=_progress_for(completed))
+
+
+def record_completions(pairs):
+    """Apply +1 per ``(student_id, course_id)`` in ``pairs`` (repeats add up)."""
+    for (student_id, course_id), delta in Counter(pairs).items():
+        apply_completion_delta(
+            CourseEnrollment.objects.filter(student_id=student_id, course_id=course_id),
+            delta,
+        )
+
+
+def rebase_progress(enrollments):
+    """Recompute progress against the current curriculum size, keeping completed_items."""
+    return enrollments.update(progress=_progress_for(F('completed_items')))
+
+
+def rebuild_enrollment_progress(enrollments=None):
+    """Recount completed_items from VideoWatch/MaterialView and recompute progress."""
+    enrollments = CourseEnrollment.objects.all() if enrollments is None else enrollments
+
+    def completed(model, item_path):
+        subquery = model.objects.filter(
+            student_id=OuterRef('student_id'),
+            is_completed=True,
+            **{f'{item_path}__unit__course_id': OuterRef('course_id')}
+        ).order_by().values('student_id').annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(subquery, output_field=IntegerField()), Value(0))
+
+    enrollments.update(
+        completed_items=completed(VideoWatch, 'video') + completed(MaterialView, 'material')
+    )
+    return rebase_progress(enrollments)
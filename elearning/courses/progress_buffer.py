@@ -0,0 +1,226 @@
+import atexit
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django.utils import timezone
+
+from .models import Video, VideoWatch
+from .progress import record_completions
+
+logger = logging.getLogger(__name__)
+
+COMPLETION_THRESHOLD = 90
+# Upper bound for reported watch time and position, in seconds.
+MAX_TRACKED_SECONDS = 60 * 60 * 24 * 7
+WRITE_FIELDS = [
+    'watch_time', 'progress', 'last_position', 'is_active',
+    'is_completed', 'completed_at', 'updated_at',
+]
+
+
+def clean_heartbeat(watch_time, progress, last_position):
+    """
+    Coerce a player heartbeat to ``(watch_time, progress, last_position)``
+    within sane bounds. Raises ValueError for values that are not finite
+    numbers.
+    """
+    values = [float(watch_time), float(progress), float(last_position)]
+    if not all(math.isfinite(value) for value in values):
+        raise ValueError('heartbeat values must be finite numbers')
+    watch_time, progress, last_position = values
+    return (
+        int(min(max(watch_time, 0), MAX_TRACKED_SECONDS)),
+        min(max(progress, 0.0), 100.0),
+        int(min(max(last_position, 0), MAX_TRACKED_SECONDS)),
+    )
+
+
+class ProgressBuffer:
+    """
+    Write-behind buffer for player heartbeats.
+
+    Heartbeats are merged per (student, video) in process memory, keeping the
+    largest watch time and progress and the latest position seen, and written
+    in a single batch per flush. ``flush_interval`` is the durability
+    knob: at most that many seconds of progress can be lost if the process
+    dies. An interval of 0 writes every heartbeat straight through.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._entries = {}
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def add(self, student_id, video_id, watch_time, progress, last_position):
+        key = (student_id, video_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [watch_time, progress, last_position]
+            else:
+                entry[0] = max(entry[0], watch_time)
+                entry[1] = max(entry[1], progress)
+                # The resume point follows the student, rewinds included.
+                entry[2] = last_position
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            due = time.monotonic() - self._oldest >= self.flush_interval
+
+        if due:
+            try:
+                self.flush()
+            except Exception:
+                # flush() has put the batch back; the heartbeat itself succeeded.
+                logger.exception('Video progress flush failed')
+                self._ensure_timer()
+        else:
+            self._ensure_timer()
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _ensure_timer(self):
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Video progress flush failed')
+        finally:
+            connection.close()
+
+    def _drain(self):
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self._oldest = None
+        return entries
+
+    def _restore(self, entries):
+        with self._lock:
+            for key, values in entries.items():
+                current = self._entries.get(key)
+                # Newer heartbeats, if any, hold the more recent position.
+                self._entries[key] = values if current is None else [
+                    max(current[0], values[0]), max(current[1], values[1]), current[2]
+                ]
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def flush(self):
+        """Write buffered heartbeats. Returns the number of rows written."""
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            entries = self._drain()
+            if not entries:
+                return 0
+            try:
+                return write_progress(entries)
+            except (OperationalError, InterfaceError):
+                # The database is unreachable; keep everything for the next flush.
+                self._restore(entries)
+                raise
+            except Exception:
+                logger.exception('Video progress batch failed, writing rows one by one')
+                return self._write_each(entries)
+        finally:
+            self._flush_lock.release()
+
+    def _write_each(self, entries):
+        """Write entries separately, dropping the ones the database rejects."""
+        written = 0
+        for key, values in entries.items():
+            try:
+                written += write_progress({key: values})
+            except (OperationalError, InterfaceError):
+                self._restore({key: values})
+            except Exception:
+                logger.exception('Dropping video progress for student %s, video %s', *key)
+        return written
+
+
+def write_progress(entries):
+    """
+    Merge ``{(student_id, video_id): [watch_time, progress, last_position]}``
+    into VideoWatch rows. The rows are locked and read inside the write
+    transaction, with missing ones inserted first, so the merge and the
+    completions it records are based on the stored state even when another
+    process writes the same rows: one locking SELECT, an INSERT and a second
+    locking SELECT for new pairs only, then a single bulk_update.
+    """
+    video_ids = {video_id for _, video_id in entries}
+    student_ids = {student_id for student_id, _ in entries}
+    known_videos = dict(Video.objects.filter(id__in=video_ids).values_list('id', 'unit__course_id'))
+    pairs = {(student_id, video_id) for student_id, video_id in entries if video_id in known_videos}
+    if not pairs:
+        return 0
+
+    def locked(student_ids, video_ids):
+        return {
+            (watch.student_id, watch.video_id): watch
+            for watch in VideoWatch.objects.select_for_update().filter(
+                video_id__in=video_ids, student_id__in=student_ids
+            )
+        }
+
+    now = timezone.now()
+    completions = []
+    with transaction.atomic():
+        watches = locked(student_ids, known_videos)
+        missing = pairs - watches.keys()
+        if missing:
+            # Another process may insert the same pairs meanwhile; its row wins
+            # and is locked and merged below like any other.
+            VideoWatch.objects.bulk_create(
+                [VideoWatch(student_id=student_id, video_id=video_id) for student_id, video_id in missing],
+                ignore_conflicts=True,
+            )
+            watches.update(locked(
+                {student_id for student_id, _ in missing}, {video_id for _, video_id in missing}
+            ))
+
+        updated = []
+        for pair in pairs:
+            watch = watches[pair]
+            watch_time, progress, last_position = entries[pair]
+            watch.watch_time = max(watch.watch_time, int(watch_time))
+            watch.progress = min(max(watch.progress, float(progress)), 100.0)
+            watch.last_position = int(last_position)
+            watch.is_active = True
+            if watch.progress >= COMPLETION_THRESHOLD and not watch.is_completed:
+                watch.is_completed = True
+                watch.completed_at = now
+                completions.append((pair[0], known_videos[pair[1]]))
+            watch.updated_at = now
+            updated.append(watch)
+
+        VideoWatch.objects.bulk_update(updated, WRITE_FIELDS, batch_size=500)
+        if completions:
+            record_completions(completions)
+    return len(updated)
+
+
+progress_buffer = ProgressBuffer(getattr(settings, 'VIDEO_PROGRESS_FLUSH_INTERVAL', 10))
+
+
+def _flush_at_exit():
+    try:
+        progress_buffer.flush()
+    except Exception:
+        logger.exception('Video progress flush at exit failed')
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,117 @@
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'courses_course_fts'
+SEARCH_RESULT_LIMIT = 240
+
+# Control characters never appear in course text, so they are safe to use as
+# highlight markers before the snippet is HTML-escaped.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression. Every word must match; the
+    last one is treated as a prefix so partially typed words still hit.
+    """
+    tokens = [f'"{token}"' for token in _TOKEN_RE.findall(query)]
+    if tokens:
+        tokens[-1] += '*'
+    return ' '.join(tokens)
+
+
+def _highlight(snippet):
+    if not snippet:
+        return ''
+    html = escape(snippet).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def _search_sqlite(queryset, query, limit):
+    match = build_match_expression(query)
+    if not match:
+        return []
+
+    # Rank inside the FTS query, restricted to the rows ``queryset`` allows,
+    # so the LIMIT applies to the best visible matches. Snippets are only
+    # built for the rows that survive the LIMIT. The unary + keeps SQLite
+    # from handing the IN lists to FTS5 as rowid lookups, each of which
+    # would evaluate the whole MATCH again.
+    allowed_sql, allowed_params = queryset.order_by().values('pk').query.sql_with_params()
+    rank = f'bm25({FTS_TABLE}, 10.0, 1.0)'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, {rank}, snippet({FTS_TABLE}, 1, %s, %s, '…', 24) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND +rowid IN ("
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND +rowid IN ({allowed_sql}) "
+            f"ORDER BY {rank} LIMIT %s"
+            f") ORDER BY {rank}",
+            [_MARK_START, _MARK_END, match, match, *allowed_params, limit],
+        )
+        ranked = cursor.fetchall()
+
+    found = queryset.in_bulk([course_id for course_id, _, _ in ranked])
+    courses = []
+    for course_id, score, snippet in ranked:
+        course = found.get(course_id)
+        if course is None:
+            continue
+        # bm25() is lower-is-better; flip it so every backend ranks high-first.
+        course.search_rank = -score
+        course.search_snippet = _highlight(snippet)
+        courses.append(course)
+    return courses
+
+
+def _search_postgresql(queryset, query, limit):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+
+    search_query = SearchQuery(query, search_type='websearch', config='english')
+    vector = (
+        SearchVector('title', weight='A', config='english') +
+        SearchVector('description', weight='B', config='english')
+    )
+    # Matching on the vector itself (@@) lets the GIN index pick the rows;
+    # only those are ranked.
+    courses = queryset.annotate(search=vector).filter(search=search_query).annotate(
+        search_rank=SearchRank(F('search'), search_query),
+        headline=SearchHeadline(
+            'description', search_query, config='english',
+            start_sel=_MARK_START, stop_sel=_MARK_END, max_words=24,
+        ),
+    ).order_by('-search_rank', '-created_at')[:limit]
+
+    courses = list(courses)
+    for course in courses:
+        course.search_snippet = _highlight(course.headline)
+    return courses
+
+
+def _search_fallback(queryset, query, limit):
+    courses = list(queryset.filter(
+        Q(title__icontains=query) |
+        Q(description__icontains=query)
+    )[:limit])
+    for course in courses:
+        course.search_rank = 0
+        course.search_snippet = ''
+    return courses
+
+
+def search_courses(queryset, query, limit=SEARCH_RESULT_LIMIT):
+    """
+    Return up to ``limit`` courses from ``queryset`` matching ``query``, best
+    match first. Each course carries ``search_rank`` and an HTML-safe
+    ``search_snippet`` with the matched terms wrapped in ``<mark>``.
+    """
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(queryset, query, limit)
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(queryset, query, limit)
+    return _search_fallback(queryset, query, limit)
@@ -0,0 +1,166 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .counters import adjust_counters
+from .curriculum import bump_content_version
+from .models import Course, CourseEnrollment, Unit, Video, Material, MaterialView, VideoWatch
+from .progress import apply_completion_delta, rebase_progress
+from .transcoding import queue_transcode, remove_stale_renditions
+
+
+@receiver(post_save, sender=Unit)
+def unit_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_counters(Course.objects.filter(pk=instance.course_id), unit_count=1)
+
+
+@receiver(post_delete, sender=Unit)
+def unit_deleted(sender, instance, **kwargs):
+    # Videos and materials are cascaded first and adjust the course themselves.
+    adjust_counters(Course.objects.filter(pk=instance.course_id), unit_count=-1)
+
+
+def _move_item(previous_unit_id, unit_id, removed, added, completions):
+    """
+    Move an item's counts from its previous unit (and course) to its new
+    one. ``completions`` holds the item's completed watch/view rows; when the
+    course changes, those students' completions move between enrollments.
+    """
+    adjust_counters(Unit.objects.filter(pk=previous_unit_id), **removed)
+    adjust_counters(Course.objects.filter(units=previous_unit_id), **removed)
+    adjust_counters(Unit.objects.filter(pk=unit_id), **added)
+    adjust_counters(Course.objects.filter(units=unit_id), **added)
+
+    courses = dict(Unit.objects.filter(pk__in=[previous_unit_id, unit_id]).values_list('pk', 'course_id'))
+    previous_course, course = courses.get(previous_unit_id), courses.get(unit_id)
+    if previous_course == course:
+        return
+    students = list(completions.values_list('student_id', flat=True))
+    if students:
+        apply_completion_delta(
+            CourseEnrollment.objects.filter(course_id=previous_course, student_id__in=students), -1
+        )
+        apply_completion_delta(CourseEnrollment.objects.filter(course_id=course, student_id__in=students), 1)
+    rebase_progress(CourseEnrollment.objects.filter(course_id__in=[previous_course, course]))
+    bump_content_version(Course.objects.filter(pk=previous_course))
+
+
+@receiver(pre_save, sender=Video)
+def video_remember_previous(sender, instance, **kwargs):
+    instance._previous_duration = None
+    instance._previous_file = None
+    instance._previous_unit_id = None
+    if not instance._state.adding and instance.pk:
+        previous = Video.objects.filter(pk=instance.pk).values_list('duration', 'video_file', 'unit_id').first()
+        if previous is not None:
+            instance._previous_duration, instance._previous_file, instance._previous_unit_id = previous
+
+
+@receiver(post_save, sender=Video)
+def video_saved(sender, instance, created, **kwargs):
+    duration = int(instance.duration or 0)
+    if created:
+        deltas = {'video_count': 1, 'total_video_duration': duration}
+    else:
+        previous = getattr(instance, '_previous_duration', None)
+        previous_unit_id = getattr(instance, '_previous_unit_id', None)
+        if previous_unit_id is not None and previous_unit_id != instance.unit_id:
+            _move_item(
+                previous_unit_id, instance.unit_id,
+                {'video_count': -1, 'total_video_duration': -int(previous or 0)},
+                {'video_count': 1, 'total_video_duration': duration},
+                VideoWatch.objects.filter(video=instance, is_completed=True),
+            )
+            return
+        if previous is None or previous == duration:
+            return
+        deltas = {'total_video_duration': duration - previous}
+    adjust_counters(Unit.objects.filter(pk=instance.unit_id), **deltas)
+    adjust_counters(Course.objects.filter(units=instance.unit_id), **deltas)
+    if created:
+        rebase_progress(CourseEnrollment.objects.filter(course__units=instance.unit_id))
+
+
+@receiver(post_save, sender=Video)
+def video_file_changed(sender, instance, created, **kwargs):
+    name = instance.video_file.name or ''
+    if not created and name == (getattr(instance, '_previous_file', None) or ''):
+        return
+    if name:
+        queue_transcode(instance)
+    elif not created:
+        Video.objects.filter(pk=instance.pk).update(transcode_status='none', hls_playlist='')
+        remove_stale_renditions(instance.pk)
+
+
+@receiver(post_delete, sender=Video)
+def video_deleted(sender, instance, **kwargs):
+    deltas = {'video_count': -1, 'total_video_duration': -int(instance.duration or 0)}
+    adjust_counters(Unit.objects.filter(pk=instance.unit_id), **deltas)
+    adjust_counters(Course.objects.filter(units=instance.unit_id), **deltas)
+    rebase_progress(CourseEnrollment.objects.filter(course__units=instance.unit_id))
+    video_id = instance.pk
+    transaction.on_commit(lambda: remove_stale_renditions(video_id))
+
+
+@receiver(pre_save, sender=Material)
+def material_remember_previous(sender, instance, **kwargs):
+    instance._previous_unit_id = None
+    if not instance._state.adding and instance.pk:
+        instance._previous_unit_id = Material.objects.filter(pk=instance.pk).values_list(
+            'unit_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Material)
+def material_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_counters(Unit.objects.filter(pk=instance.unit_id), material_count=1)
+        adjust_counters(Course.objects.filter(units=instance.unit_id), material_count=1)
+        rebase_progress(CourseEnrollment.objects.filter(course__units=instance.unit_id))
+        return
+    previous_unit_id = getattr(instance, '_previous_unit_id', None)
+    if previous_unit_id is not None and previous_unit_id != instance.unit_id:
+        _move_item(
+            previous_unit_id, instance.unit_id, {'material_count': -1}, {'material_count': 1},
+            MaterialView.objects.filter(material=instance, is_completed=True),
+        )
+
+
+@receiver(post_delete, sender=Material)
+def material_deleted(sender, instance, **kwargs):
+    adjust_counters(Unit.objects.filter(pk=instance.unit_id), material_count=-1)
+    adjust_counters(Course.objects.filter(units=instance.unit_id), material_count=-1)
+    rebase_progress(CourseEnrollment.objects.filter(course__units=instance.unit_id))
+
+
+@receiver(post_delete, sender=VideoWatch)
+def video_watch_deleted(sender, instance, **kwargs):
+    # Runs before the video itself is removed in a cascade, so the join still resolves.
+    if instance.is_completed:
+        apply_completion_delta(CourseEnrollment.objects.filter(
+            student_id=instance.student_id, course__units__videos=instance.video_id
+        ), -1)
+
+
+@receiver(post_delete, sender=MaterialView)
+def material_view_deleted(sender, instance, **kwargs):
+    if instance.is_completed:
+        apply_completion_delta(CourseEnrollment.objects.filter(
+            student_id=instance.student_id, course__units__materials=instance.material_id
+        ), -1)
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+def unit_curriculum_changed(sender, instance, **kwargs):
+    bump_content_version(Course.objects.filter(pk=instance.course_id))
+
+
+@receiver(post_save, sender=Video)
+@receiver(post_delete, sender=Video)
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def unit_item_changed(sender, instance, **kwargs):
+    bump_content_version(Course.objects.filter(units=instance.unit_id))
@@ -1,3 +1,223 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import progress_buffer as buffering
+from . import transcoding
+from .models import Course, CourseEnrollment, Unit, Video, VideoWatch
+from .pagination import KeysetPaginator, _encode_cursor
+from .progress_buffer import MAX_TRACKED_SECONDS, ProgressBuffer, clean_heartbeat
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = User.objects.create_user(username='tutor', role='tutor')
+        Course.objects.bulk_create([
+            Course(title=f'Course {index}', slug=f'course-{index}', description='', tutor=tutor)
+            for index in range(7)
+        ])
+        # Pairs of courses share a timestamp, so the id has to break ties.
+        start = timezone.now() - timedelta(days=1)
+        for index, course in enumerate(Course.objects.order_by('id')):
+            Course.objects.filter(pk=course.pk).update(created_at=start + timedelta(minutes=index // 2))
+        cls.expected = list(Course.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def paginator(self):
+        return KeysetPaginator(Course.objects.all(), 3)
+
+    def page(self, cursor=None):
+        params = QueryDict(mutable=True)
+        if cursor is not None:
+            params['cursor'] = cursor
+        return self.paginator().get_page(params)
+
+    def ids(self, page):
+        return [course.id for course in page]
+
+    def test_forward_and_backward_round_trip(self):
+        first = self.page()
+        second = self.page(first.next_cursor)
+        third = self.page(second.next_cursor)
+        self.assertEqual(self.ids(first) + self.ids(second) + self.ids(third), self.expected)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+
+        back = self.page(third.previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(second))
+        back = self.page(back.previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(first))
+        self.assertFalse(back.has_previous())
+        self.assertEqual(self.ids(self.page(back.next_cursor)), self.ids(second))
+
+    def test_querystring_keeps_other_parameters(self):
+        params = QueryDict('q=algebra')
+        page = self.paginator().get_page(params)
+        self.assertEqual(QueryDict(page.next_querystring)['q'], 'algebra')
+        self.assertEqual(QueryDict(page.next_querystring)['cursor'], page.next_cursor)
+
+    def test_bad_cursors_fall_back_to_the_first_page(self):
+        first = self.ids(self.page())
+        bad_cursors = [
+            'not base64 !',
+            'e30',  # {}
+            _encode_cursor('nope'),
+            _encode_cursor([]),
+            _encode_cursor(['2024-01-01T00:00:00+00:00']),
+            _encode_cursor(['2024-01-01T00:00:00+00:00', 1, 2]),
+            _encode_cursor([None, 1]),
+            _encode_cursor([['2024-01-01T00:00:00+00:00'], 1]),
+            _encode_cursor([{'a': 1}, 1]),
+            _encode_cursor([12345, 1]),
+            _encode_cursor(['yesterday', 1]),
+            _encode_cursor(['2024-01-01T00:00:00', 1]),
+            _encode_cursor(['2024-13-45T00:00:00+00:00', 1]),
+            _encode_cursor(['2024-01-01T00:00:00+00:00', 'abc']),
+            _encode_cursor(['2024-01-01T00:00:00+00:00', 'abc'], backwards=True),
+        ]
+        for cursor in bad_cursors:
+            with self.subTest(cursor=cursor):
+                page = self.page(cursor)
+                self.assertEqual(self.ids(page), first)
+                self.assertFalse(page.has_previous())
+
+
+class ProgressBufferTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = User.objects.create_user(username='tutor', role='tutor')
+        cls.student = User.objects.create_user(username='student')
+        cls.course = Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor)
+        unit = Unit.objects.create(course=cls.course, title='Unit 1')
+        cls.video = Video.objects.create(unit=unit, title='Intro', video_url='https://example.com/1', duration=600)
+        cls.other = Video.objects.create(unit=unit, title='Next', video_url='https://example.com/2', duration=600, order=1)
+        CourseEnrollment.objects.create(student=cls.student, course=cls.course)
+
+    def setUp(self):
+        self.buffer = ProgressBuffer(flush_interval=3600)
+        self.addCleanup(lambda: self.buffer._timer and self.buffer._timer.cancel())
+
+    def watch(self, video=None):
+        return VideoWatch.objects.get(student=self.student, video=video or self.video)
+
+    def test_heartbeats_are_merged_into_one_write(self):
+        self.buffer.add(self.student.pk, self.video.pk, 30, 10.0, 30)
+        self.buffer.add(self.student.pk, self.video.pk, 60, 20.0, 60)
+        # A rewind moves the resume point back but keeps the furthest progress.
+        self.buffer.add(self.student.pk, self.video.pk, 65, 12.0, 5)
+        self.assertEqual(self.buffer.pending(), 1)
+        self.assertFalse(VideoWatch.objects.exists())
+
+        self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(self.buffer.pending(), 0)
+        watch = self.watch()
+        self.assertEqual((watch.watch_time, watch.progress, watch.last_position), (65, 20.0, 5))
+        self.assertTrue(watch.is_active)
+        self.assertFalse(watch.is_completed)
+
+    def test_flush_merges_with_the_stored_row(self):
+        VideoWatch.objects.create(student=self.student, video=self.video, watch_time=500, progress=50.0, last_position=300)
+        self.buffer.add(self.student.pk, self.video.pk, 100, 30.0, 120)
+
+        self.buffer.flush()
+
+        watch = self.watch()
+        self.assertEqual((watch.watch_time, watch.progress, watch.last_position), (500, 50.0, 120))
+
+    def test_completion_is_recorded_once(self):
+        self.buffer.add(self.student.pk, self.video.pk, 560, 95.0, 560)
+        self.buffer.flush()
+        completed_at = self.watch().completed_at
+        self.assertIsNotNone(completed_at)
+
+        self.buffer.add(self.student.pk, self.video.pk, 600, 100.0, 600)
+        self.buffer.flush()
+
+        watch = self.watch()
+        self.assertTrue(watch.is_completed)
+        self.assertEqual(watch.completed_at, completed_at)
+        enrollment = CourseEnrollment.objects.get(student=self.student, course=self.course)
+        self.assertEqual(enrollment.completed_items, 1)
+
+    def test_unreachable_database_keeps_the_batch(self):
+        self.buffer.add(self.student.pk, self.video.pk, 30, 10.0, 30)
+        with mock.patch.object(buffering, 'write_progress', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush()
+        # A heartbeat that arrived meanwhile keeps its newer position.
+        self.buffer.add(self.student.pk, self.video.pk, 20, 5.0, 40)
+        self.assertEqual(self.buffer.pending(), 1)
+
+        self.buffer.flush()
+
+        watch = self.watch()
+        self.assertEqual((watch.watch_time, watch.progress, watch.last_position), (30, 10.0, 40))
+
+    def test_heartbeat_survives_a_failed_due_flush(self):
+        self.buffer.add(self.student.pk, self.video.pk, 30, 10.0, 30)
+        self.buffer._oldest -= self.buffer.flush_interval
+        with mock.patch.object(buffering, 'write_progress', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('elearning.courses.progress_buffer', 'ERROR'):
+                self.buffer.add(self.student.pk, self.video.pk, 60, 20.0, 60)
+
+        self.assertEqual(self.buffer.pending(), 1)
+        self.buffer.flush()
+        watch = self.watch()
+        self.assertEqual((watch.watch_time, watch.progress, watch.last_position), (60, 20.0, 60))
+
+    def test_a_bad_row_does_not_block_the_others(self):
+        write_progress = buffering.write_progress
+
+        def reject_other_video(entries):
+            if (self.student.pk, self.other.pk) in entries:
+                raise ValueError('bad row')
+            return write_progress(entries)
+
+        self.buffer.add(self.student.pk, self.video.pk, 30, 10.0, 30)
+        self.buffer.add(self.student.pk, self.other.pk, 30, 10.0, 30)
+        with mock.patch.object(buffering, 'write_progress', side_effect=reject_other_video):
+            with self.assertLogs('elearning.courses.progress_buffer', 'ERROR'):
+                self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(self.watch().watch_time, 30)
+        self.assertFalse(VideoWatch.objects.filter(video=self.other).exists())
+
+    def test_clean_heartbeat(self):
+        self.assertEqual(clean_heartbeat('12.7', 140, -3), (12, 100.0, 0))
+        self.assertEqual(clean_heartbeat(1e30, -5, 1e30), (MAX_TRACKED_SECONDS, 0.0, MAX_TRACKED_SECONDS))
+        for value in ('nan', 'inf', float('-inf')):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                clean_heartbeat(value, 0, 0)
+        with self.assertRaises(ValueError):
+            clean_heartbeat('ten', 0, 0)
+
+
+class HlsJsUrlTests(TestCase):
+
+    def setUp(self):
+        transcoding._vendored_hls_js.cache_clear()
+        self.addCleanup(transcoding._vendored_hls_js.cache_clear)
+
+    def test_pinned_cdn_build_without_a_vendored_copy(self):
+        with mock.patch.object(transcoding.finders, 'find', return_value=None):
+            self.assertEqual(transcoding.hls_js_url(), transcoding.HLS_JS_CDN_URL)
+        self.assertIn(f'hls.js@{transcoding.HLS_JS_VERSION}/', transcoding.HLS_JS_CDN_URL)
+
+    def test_vendored_copy_is_preferred(self):
+        with mock.patch.object(transcoding.finders, 'find', return_value='/static/hls.min.js'):
+            self.assertTrue(transcoding.hls_js_url().endswith(transcoding.HLS_JS_STATIC_PATH))
+
+    @override_settings(HLS_JS_URL='https://cdn.example.com/hls.min.js')
+    def test_setting_overrides_both(self):
+        self.assertEqual(transcoding.hls_js_url(), 'https://cdn.example.com/hls.min.js')
@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import posixpath
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.core.files import File
+from django.db import connection, transaction
+
+from .ffmpeg import TranscodeError, transcode_to_hls
+from .models import Video
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BINARY = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+TRANSCODE_WORKERS = getattr(settings, 'VIDEO_TRANSCODE_WORKERS', 2)
+HLS_ROOT = 'hls'
+HLS_JS_VERSION = '1.5.20'
+HLS_JS_STATIC_PATH = f'vendor/hls.js/{HLS_JS_VERSION}/hls.min.js'
+HLS_JS_CDN_URL = f'https://cdn.jsdelivr.net/npm/hls.js@{HLS_JS_VERSION}/dist/hls.min.js'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def transcoding_available():
+    return bool(
+        getattr(settings, 'VIDEO_TRANSCODE_ENABLED', True)
+        and shutil.which(FFMPEG_BINARY) and shutil.which(FFPROBE_BINARY)
+    )
+
+
+def get_executor():
+    """
+    The shared transcoding pool. Workers are spawned rather than forked so
+    they do not inherit the web process's threads and database connections.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=TRANSCODE_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def _discard_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+@lru_cache(maxsize=None)
+def _vendored_hls_js():
+    return finders.find(HLS_JS_STATIC_PATH) is not None
+
+
+def hls_js_url():
+    """
+    Where the player loads hls.js from: HLS_JS_URL if set, else the pinned
+    copy under static/ when it has been vendored, else the same pinned
+    version from jsDelivr.
+    """
+    if settings.HLS_JS_URL:
+        return settings.HLS_JS_URL
+    if _vendored_hls_js():
+        return static(HLS_JS_STATIC_PATH)
+    return HLS_JS_CDN_URL
+
+
+def video_hls_dir(video_id):
+    return os.path.join(settings.MEDIA_ROOT, HLS_ROOT, str(video_id))
+
+
+def _output_name(video):
+    # One directory per source file, so a job for a replaced upload can never
+    # overwrite the renditions of its successor.
+    token = hashlib.sha1(video.video_file.name.encode()).hexdigest()[:12]
+    return posixpath.join(HLS_ROOT, str(video.pk), token)
+
+
+def queue_transcode(video):
+    """Mark ``video`` pending and hand it to the pool once the transaction commits."""
+    if not video.video_file or not transcoding_available():
+        return False
+    Video.objects.filter(pk=video.pk).update(transcode_status='pending')
+    source_name = video.video_file.name
+    source_path = video.video_file.path
+    output_name = _output_name(video)
+    transaction.on_commit(partial(_submit, video.pk, source_name, source_path, output_name))
+    return True
+
+
+def _submit(video_id, source_name, source_path, output_name):
+    output_dir = os.path.join(settings.MEDIA_ROOT, output_name)
+    job = (transcode_to_hls, source_path, output_dir, FFMPEG_BINARY, FFPROBE_BINARY)
+    executor = get_executor()
+    try:
+        future = executor.submit(*job)
+    except BrokenProcessPool:
+        # A worker died (OOM, killed ffmpeg parent); start a fresh pool.
+        _discard_executor(executor)
+        future = get_executor().submit(*job)
+    Video.objects.filter(pk=video_id, video_file=source_name, transcode_status='pending').update(
+        transcode_status='processing'
+    )
+    future.add_done_callback(partial(_job_finished, video_id, source_name, output_name))
+
+
+def _job_finished(video_id, source_name, output_name, future):
+    try:
+        try:
+            result = future.result()
+        except TranscodeError as exc:
+            logger.warning('Transcoding video %s failed: %s', video_id, exc)
+            Video.objects.filter(pk=video_id, video_file=source_name).update(transcode_status='failed')
+        except BrokenProcessPool:
+            logger.exception('Transcoding pool broke while processing video %s', video_id)
+            with _executor_lock:
+                broken = _executor
+            if broken is not None:
+                _discard_executor(broken)
+            Video.objects.filter(pk=video_id, video_file=source_name).update(transcode_status='failed')
+        except Exception:
+            logger.exception('Transcoding video %s failed', video_id)
+            Video.objects.filter(pk=video_id, video_file=source_name).update(transcode_status='failed')
+        else:
+            apply_transcode_result(video_id, source_name, output_name, result)
+    except Exception:
+        logger.exception('Could not record transcoding result for video %s', video_id)
+    finally:
+        connection.close()
+
+
+def apply_transcode_result(video_id, source_name, output_name, result):
+    """Store the ladder, duration and poster on the video if its file has not changed since."""
+    output_dir = os.path.join(settings.MEDIA_ROOT, output_name)
+    video = Video.objects.filter(pk=video_id).first()
+    if video is None or video.video_file.name != source_name:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return False
+
+    video.transcode_status = 'ready'
+    video.hls_playlist = posixpath.join(output_name, 'master.m3u8')
+    fields = ['transcode_status', 'hls_playlist', 'updated_at']
+    duration = int(round(result['duration']))
+    if duration:
+        video.duration = duration
+        fields.append('duration')
+
+    poster = os.path.join(output_dir, 'poster.jpg')
+    if os.path.exists(poster):
+        if not video.thumbnail:
+            with open(poster, 'rb') as handle:
+                video.thumbnail.save(f'video_{video.pk}.jpg', File(handle), save=False)
+            fields.append('thumbnail')
+        os.remove(poster)
+
+    video.save(update_fields=fields)
+    remove_stale_renditions(video_id, keep=os.path.basename(output_name))
+    return True
+
+
+def remove_stale_renditions(video_id, keep=None):
+    root = video_hls_dir(video_id)
+    if not os.path.isdir(root):
+        return
+    for entry in os.listdir(root):
+        if entry != keep:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    if keep is None:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def transcode_now(video):
+    """Transcode ``video`` in the current process (used by the management command)."""
+    source_name = video.video_file.name
+    output_name = _output_name(video)
+    Video.objects.filter(pk=video.pk).update(transcode_status='processing')
+    try:
+        result = transcode_to_hls(
+            video.video_file.path, os.path.join(settings.MEDIA_ROOT, output_name),
+            FFMPEG_BINARY, FFPROBE_BINARY,
+        )
+    except TranscodeError:
+        Video.objects.filter(pk=video.pk, video_file=source_name).update(transcode_status='failed')
+        raise
+    return apply_transcode_result(video.pk, source_name, output_name, result)
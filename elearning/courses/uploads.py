@@ -0,0 +1,193 @@
+import base64
+import binascii
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Material, UploadSession, Video
+
+MAX_UPLOAD_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 10 * 1024 ** 3)
+MAX_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 ** 2)
+READ_SIZE = 1024 * 1024
+CHECKSUM_ALGORITHMS = {'md5', 'sha1', 'sha256'}
+
+TARGET_FIELDS = {
+    'video': Video._meta.get_field('video_file'),
+    'material': Material._meta.get_field('file'),
+}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', 'partial')
+
+
+def part_path(session):
+    return os.path.join(partial_dir(), f'{session.id}.part')
+
+
+def start_upload(tutor, unit, target, filename, size):
+    if target not in TARGET_FIELDS:
+        raise UploadError('Unknown upload target')
+    filename = os.path.basename(filename or '').strip()
+    if not filename:
+        raise UploadError('A filename is required')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('Upload size must be an integer')
+    if size <= 0 or size > MAX_UPLOAD_SIZE:
+        raise UploadError('Upload size is out of range', status=413)
+
+    session = UploadSession.objects.create(
+        tutor=tutor, unit=unit, target=target, filename=filename, total_size=size
+    )
+    os.makedirs(partial_dir(), exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def parse_checksum(header):
+    """Parse a tus-style ``Upload-Checksum: <algorithm> <base64 digest>`` header."""
+    if not header:
+        raise UploadError('Upload-Checksum header is required')
+    try:
+        algorithm, encoded = header.split(' ', 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except (ValueError, binascii.Error):
+        raise UploadError('Malformed Upload-Checksum header')
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise UploadError('Unsupported checksum algorithm')
+    return algorithm, digest
+
+
+def _check_chunk(session, offset, length):
+    if session.is_complete:
+        raise UploadError('Upload already finished', status=409)
+    if offset != session.received:
+        raise UploadError('Upload-Offset does not match the server offset', status=409)
+    if length <= 0 or length > MAX_CHUNK_SIZE:
+        raise UploadError('Chunk size is out of range', status=413)
+    if offset + length > session.total_size:
+        raise UploadError('Chunk runs past the declared upload size', status=413)
+
+
+def _receive_chunk(session, stream, length, algorithm, expected):
+    """Stream the chunk body into a temporary file and verify it; returns its path."""
+    digest = hashlib.new(algorithm)
+    handle = tempfile.NamedTemporaryFile(dir=partial_dir(), prefix=f'{session.id}.', suffix='.chunk', delete=False)
+    with handle:
+        remaining = length
+        while remaining > 0:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            handle.write(data)
+            remaining -= len(data)
+
+    if remaining or digest.digest() != expected:
+        os.remove(handle.name)
+        if remaining:
+            raise UploadError('Chunk body was shorter than Content-Length')
+        raise UploadError('Checksum mismatch', status=460)
+    return handle.name
+
+
+def append_chunk(session, stream, offset, length, checksum_header):
+    """
+    Receive one chunk from ``stream`` and append it to the session's part
+    file at ``offset``. The body is streamed to a temporary file and its
+    checksum verified first, with memory bounded by READ_SIZE; the session
+    row is only locked to re-check the offset, copy the chunk into place and
+    advance ``received``. A bad chunk leaves the part file untouched, so the
+    client can resend it from the same offset. ``session`` is refreshed to
+    the stored state, also when an UploadError is raised.
+    """
+    _check_chunk(session, offset, length)
+    algorithm, expected = parse_checksum(checksum_header)
+    chunk_path = _receive_chunk(session, stream, length, algorithm, expected)
+    try:
+        with transaction.atomic():
+            try:
+                session.refresh_from_db(from_queryset=UploadSession.objects.select_for_update())
+            except UploadSession.DoesNotExist:
+                raise UploadError('Upload not found', status=404)
+            # Another request may have stored this chunk while ours was in flight.
+            _check_chunk(session, offset, length)
+            with open(chunk_path, 'rb') as source, open(part_path(session), 'r+b') as handle:
+                handle.seek(offset)
+                handle.truncate()
+                shutil.copyfileobj(source, handle, READ_SIZE)
+
+            session.received = offset + length
+            session.save(update_fields=['received', 'updated_at'])
+            if session.received == session.total_size:
+                assemble(session)
+    finally:
+        os.remove(chunk_path)
+    return session
+
+
+def assemble(session):
+    """Move the finished part file into MEDIA_ROOT under the target field's upload_to."""
+    field = TARGET_FIELDS[session.target]
+    storage = field.storage
+    name = storage.get_available_name(field.generate_filename(None, session.filename))
+    source = part_path(session)
+
+    try:
+        destination = storage.path(name)
+    except NotImplementedError:
+        with open(source, 'rb') as handle:
+            name = storage.save(name, File(handle))
+        os.remove(source)
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(source, destination)
+
+    session.file_name = name
+    session.completed_at = timezone.now()
+    session.save(update_fields=['file_name', 'completed_at', 'updated_at'])
+
+
+def discard(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def claim_upload(upload_id, tutor, unit, target):
+    """
+    Return the stored file name of a finished upload for ``unit``/``target`` and
+    consume the session, or None if there is no such finished upload. Call it
+    in the transaction that creates the owning row, so a failed create keeps
+    the session claimable.
+    """
+    try:
+        session = UploadSession.objects.select_for_update().filter(
+            id=upload_id, tutor=tutor, unit=unit, target=target, completed_at__isnull=False
+        ).first()
+    except (ValueError, ValidationError):
+        return None
+    if session is None:
+        return None
+    name = session.file_name
+    session.delete()
+    return name
+
@@ -1,16 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Count, Avg
 from django.core.paginator import Paginator
 from elearning.accounts.decorators import admin_required, tutor_required, student_required
-from .models import Course, Category, Unit, Video, Material, CourseEnrollment, VideoWatch, Attendance, MaterialView
+from .models import Course, Category, Unit, Video, Material, CourseEnrollment, VideoWatch, Attendance, MaterialView, UploadSession
 from elearning.accounts.models import User
 from elearning.quizzes.models import Quiz, Question, Answer
+from elearning.quizzes.schedule import run_due_transitions
 from elearning.payments.models import Purchase
-from django.http import JsonResponse
+from .media import serve_media_file, serve_media_path
+from .curriculum import CURRICULUM_CACHE_TIMEOUT, load_learning_curriculum
+from .pagination import KeysetPaginator
+from .progress import record_completions
+from .progress_buffer import clean_heartbeat, progress_buffer
+from .search import search_courses
+from .transcoding import hls_js_url
+from .uploads import UploadError, append_chunk, claim_upload, discard, start_upload
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseForbidden
+from django.db import transaction
+from django.conf import settings
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.clickjacking import xframe_options_sameorigin
+from django.utils import timezone
 import json
+import posixpath
 
 
 @admin_required
@@ -101,13 +116,14 @@ def admin_delete_course(request, course_id):
 
 @tutor_required
 def tutor_my_courses(request):
-    courses = Course.objects.filter(tutor=request.user).prefetch_related('units')
+    courses = Course.objects.filter(tutor=request.user)
     return render(request, 'courses/tutor_my_courses.html', {'courses': courses})
 
 
 @tutor_required
 def tutor_course_detail(request, course_id):
     course = get_object_or_404(Course, id=course_id, tutor=request.user)
+    run_due_transitions()
     units = course.units.prefetch_related('videos', 'materials').all()
     return render(request, 'courses/tutor_course_detail.html', {
         'course': course,
@@ -170,16 +186,21 @@ def tutor_add_video(request, unit_id):
         order = request.POST.get('order', 0)
         is_free = request.POST.get('is_free') == 'on'
         
-        Video.objects.create(
-            unit=unit,
-            title=title,
-            video_url=video_url or '',
-            video_file=video_file,
-            thumbnail=thumbnail,
-            duration=duration,
-            order=order,
-            is_free=is_free
-        )
+        upload_id = request.POST.get('upload_id')
+        with transaction.atomic():
+            if upload_id and not video_file:
+                video_file = claim_upload(upload_id, request.user, unit, 'video')
+            
+            Video.objects.create(
+                unit=unit,
+                title=title,
+                video_url=video_url or '',
+                video_file=video_file,
+                thumbnail=thumbnail,
+                duration=duration,
+                order=order,
+                is_free=is_free
+            )
         
         messages.success(request, 'Video added successfully!')
         return redirect('tutor_course_detail', course_id=unit.course.id)
@@ -202,16 +223,22 @@ def tutor_add_material(request, unit_id):
         is_free = request.POST.get('is_free') == 'on'
         is_downloadable = request.POST.get('is_downloadable') == 'on'
         
-        if file:
-            Material.objects.create(
-                unit=unit,
-                title=title,
-                file=file,
-                material_type=material_type,
-                is_free=is_free,
-                is_downloadable=is_downloadable
-            )
+        upload_id = request.POST.get('upload_id')
+        with transaction.atomic():
+            if upload_id and not file:
+                file = claim_upload(upload_id, request.user, unit, 'material')
             
+            if file:
+                Material.objects.create(
+                    unit=unit,
+                    title=title,
+                    file=file,
+                    material_type=material_type,
+                    is_free=is_free,
+                    is_downloadable=is_downloadable
+                )
+        
+        if file:
             messages.success(request, 'Material uploaded successfully!')
         else:
             messages.error(request, 'Please select a file to upload.')
@@ -221,6 +248,68 @@ def tutor_add_material(request, unit_id):
     return render(request, 'courses/tutor_add_material.html', {'unit': unit})
 
 
+def _upload_status(session, status=204):
+    response = HttpResponse(status=status)
+    response['Upload-Offset'] = str(session.received)
+    response['Upload-Length'] = str(session.total_size)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@tutor_required
+@require_http_methods(["POST"])
+def tutor_start_upload(request, unit_id):
+    unit = get_object_or_404(Unit, id=unit_id, course__tutor=request.user)
+    
+    try:
+        data = json.loads(request.body)
+        session = start_upload(
+            request.user, unit, data.get('target'), data.get('filename'), data.get('size')
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    
+    upload_url = reverse('tutor_upload_chunk', args=[session.id])
+    response = JsonResponse({
+        'upload_id': str(session.id),
+        'upload_url': upload_url,
+        'offset': session.received
+    }, status=201)
+    response['Location'] = upload_url
+    return response
+
+
+@tutor_required
+@require_http_methods(["HEAD", "PATCH", "DELETE"])
+def tutor_upload_chunk(request, upload_id):
+    if request.method == 'DELETE':
+        session = get_object_or_404(UploadSession, id=upload_id, tutor=request.user)
+        discard(session)
+        return HttpResponse(status=204)
+    
+    if request.method == 'HEAD':
+        session = get_object_or_404(UploadSession, id=upload_id, tutor=request.user)
+        return _upload_status(session, status=200)
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Upload-Offset and Content-Length are required'}, status=400)
+    
+    session = get_object_or_404(UploadSession, id=upload_id, tutor=request.user)
+    try:
+        append_chunk(session, request, offset, length, request.headers.get('Upload-Checksum'))
+    except UploadError as e:
+        response = JsonResponse({'error': str(e)}, status=e.status)
+        response['Upload-Offset'] = str(session.received)
+        return response
+    
+    return _upload_status(session)
+
+
 def course_catalog(request):
     courses = Course.objects.filter(is_published=True, is_approved=True).select_related('tutor', 'category')
     categories = Category.objects.all()
@@ -232,14 +321,11 @@ def course_catalog(request):
         courses = courses.filter(category_id=category_filter)
     
     if search_query:
-        courses = courses.filter(
-            Q(title__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
-    
-    paginator = Paginator(courses, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        paginator = Paginator(search_courses(courses, search_query), 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    else:
+        paginator = KeysetPaginator(courses, 12, ordering=('-created_at', '-id'), estimate_total=True)
+        page_obj = paginator.get_page(request.GET)
     
     return render(request, 'courses/catalog.html', {
         'page_obj': page_obj,
@@ -250,7 +336,8 @@ def course_catalog(request):
 
 
 def course_detail(request, slug):
-    course = get_object_or_404(Course, slug=slug, is_published=True)
+    course = get_object_or_404(Course.objects.select_related('tutor'), slug=slug, is_published=True)
+    # Only evaluated when the cached curriculum fragment is missing.
     units = course.units.prefetch_related('videos', 'materials').all()
     
     is_enrolled = False
@@ -264,7 +351,8 @@ def course_detail(request, slug):
     return render(request, 'courses/course_detail.html', {
         'course': course,
         'units': units,
-        'is_enrolled': is_enrolled
+        'is_enrolled': is_enrolled,
+        'curriculum_cache_timeout': CURRICULUM_CACHE_TIMEOUT
     })
 
 
@@ -275,7 +363,13 @@ def my_courses(request):
         is_active=True
     ).select_related('course')
     
-    return render(request, 'courses/my_courses.html', {'enrollments': enrollments})
+    paginator = KeysetPaginator(enrollments, 12, ordering=('-enrolled_at', '-id'))
+    page_obj = paginator.get_page(request.GET)
+    
+    return render(request, 'courses/my_courses.html', {
+        'enrollments': page_obj,
+        'page_obj': page_obj
+    })
 
 
 @login_required
@@ -298,35 +392,31 @@ def course_learn(request, course_id):
             course=course
         )
     
-    units = course.units.prefetch_related('videos', 'materials').all()
+    run_due_transitions()
+    curriculum = load_learning_curriculum(course, request.user)
     
     return render(request, 'courses/course_learn.html', {
         'course': course,
-        'units': units,
-        'enrollment': enrollment
+        'curriculum': curriculum,
+        'enrollment': enrollment,
+        'hls_js_url': hls_js_url(),
+        'hls_js_integrity': settings.HLS_JS_INTEGRITY,
     })
 
 
 @login_required
 @require_http_methods(["POST"])
 def track_video_progress(request, video_id):
-    video = get_object_or_404(Video, id=video_id)
-    data = json.loads(request.body)
-    
-    watch_time = data.get('watch_time', 0)
-    progress = data.get('progress', 0)
-    last_position = data.get('last_position', 0)
-    
-    watch, created = VideoWatch.objects.get_or_create(
-        student=request.user,
-        video=video
-    )
+    try:
+        data = json.loads(request.body)
+        watch_time, progress, last_position = clean_heartbeat(
+            data.get('watch_time', 0), data.get('progress', 0), data.get('last_position', 0)
+        )
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return JsonResponse({'error': 'Invalid progress payload'}, status=400)
     
-    watch.watch_time = watch_time
-    watch.progress = progress
-    watch.last_position = last_position
-    watch.is_completed = progress >= 90
-    watch.save()
+    # Buffered and written in batches; unknown video ids are dropped at flush time.
+    progress_buffer.add(request.user.id, video_id, watch_time, progress, last_position)
     
     return JsonResponse({'status': 'success'})
 
@@ -336,9 +426,13 @@ def tutor_student_progress(request, course_id):
     course = get_object_or_404(Course, id=course_id, tutor=request.user)
     enrollments = CourseEnrollment.objects.filter(course=course).select_related('student')
     
+    paginator = KeysetPaginator(enrollments, 50, ordering=('-enrolled_at', '-id'), estimate_total=True)
+    page_obj = paginator.get_page(request.GET)
+    
     return render(request, 'courses/tutor_student_progress.html', {
         'course': course,
-        'enrollments': enrollments
+        'enrollments': page_obj,
+        'page_obj': page_obj
     })
 
 @login_required
@@ -382,34 +476,67 @@ def view_material(request, material_id):
         material=material
     )
     
-    if not material_view.is_completed:
-        material_view.is_completed = True
-        material_view.save()
-        
-        if enrollment:
-            total_materials = Material.objects.filter(unit__course=course).count()
-            viewed_materials = MaterialView.objects.filter(
-                student=request.user,
-                material__unit__course=course,
-                is_completed=True
-            ).count()
-            
-            total_videos = Video.objects.filter(unit__course=course).count()
-            completed_videos = VideoWatch.objects.filter(
-                student=request.user,
-                video__unit__course=course,
-                is_completed=True
-            ).count()
-            
-            total_items = total_materials + total_videos
-            completed_items = viewed_materials + completed_videos
-            
-            if total_items > 0:
-                enrollment.progress = (completed_items / total_items) * 100
-                enrollment.save()
+    # The conditional UPDATE makes completion count once even under concurrent views.
+    if not material_view.is_completed and MaterialView.objects.filter(
+        pk=material_view.pk, is_completed=False
+    ).update(is_completed=True, last_viewed_at=timezone.now()):
+        record_completions([(request.user.id, course.id)])
     
     return render(request, 'courses/view_material.html', {
         'material': material,
         'unit': unit,
         'course': course
     })
+
+
+def _has_course_access(user, course):
+    if user.role == 'admin' or course.tutor_id == user.id or course.is_free:
+        return True
+    return CourseEnrollment.objects.filter(
+        student=user,
+        course=course,
+        is_active=True
+    ).exists()
+
+
+@login_required
+def stream_video(request, video_id):
+    video = get_object_or_404(Video.objects.select_related('unit__course'), id=video_id)
+    
+    if not video.is_free and not _has_course_access(request.user, video.unit.course):
+        return HttpResponseForbidden('You need to enroll in this course to watch this video.')
+    
+    return serve_media_file(request, video.video_file)
+
+
+@login_required
+def video_hls(request, video_id, path):
+    video = get_object_or_404(Video.objects.select_related('unit__course'), id=video_id)
+    
+    if not video.is_free and not _has_course_access(request.user, video.unit.course):
+        return HttpResponseForbidden('You need to enroll in this course to watch this video.')
+    if not video.has_hls:
+        raise Http404('This video has no adaptive renditions yet.')
+    
+    # Playlists use relative URIs, so every segment resolves under the master's directory.
+    base = posixpath.dirname(video.hls_playlist)
+    name = posixpath.normpath(posixpath.join(base, path))
+    if not name.startswith(base + '/'):
+        raise Http404('File not found')
+    return serve_media_path(request, name)
+
+
+@login_required
+@xframe_options_sameorigin
+def material_file(request, material_id):
+    material = get_object_or_404(Material.objects.select_related('unit__course'), id=material_id)
+    
+    if not material.is_free and not _has_course_access(request.user, material.unit.course):
+        return HttpResponseForbidden('You need to enroll in this course to access this material.')
+    
+    as_attachment = request.GET.get('download') == '1'
+    if as_attachment and not material.is_downloadable and not (
+        request.user.role == 'admin' or material.unit.course.tutor_id == request.user.id
+    ):
+        return HttpResponseForbidden('This material cannot be downloaded.')
+    return serve_media_file(request, material.file, as_attachment=as_attachment)
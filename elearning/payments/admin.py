@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Purchase, Transaction, PaymentMethod
+from django.utils import timezone
+from .models import CourseDailyStats, Purchase, Transaction, PaymentMethod, TutorDailyStats, WebhookEvent
 
 @admin.register(Purchase)
 class PurchaseAdmin(admin.ModelAdmin):
@@ -19,3 +20,28 @@ class PaymentMethodAdmin(admin.ModelAdmin):
     list_display = ['user', 'card_brand', 'card_last4', 'is_default', 'created_at']
     list_filter = ['card_brand', 'is_default']
     search_fields = ['user__username', 'card_last4']
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'event_type', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['event_id']
+    readonly_fields = ['event_id', 'event_type', 'payload', 'attempts', 'last_error', 'received_at', 'processed_at']
+    actions = ['retry_events']
+
+    @admin.action(description='Retry selected events')
+    def retry_events(self, request, queryset):
+        count = queryset.exclude(status='done').update(status='pending', available_at=timezone.now(), locked_until=None)
+        self.message_user(request, f'{count} events queued for retry.')
+
+@admin.register(CourseDailyStats)
+class CourseDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'course', 'revenue', 'purchases', 'refunds', 'refunded_amount', 'new_enrollments']
+    list_filter = ['date']
+    search_fields = ['course__title']
+
+@admin.register(TutorDailyStats)
+class TutorDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ['date', 'tutor', 'revenue', 'purchases', 'refunds', 'refunded_amount', 'new_enrollments']
+    list_filter = ['date']
+    search_fields = ['tutor__username']
@@ -0,0 +1,240 @@
+import hashlib
+import hmac
+import itertools
+import json
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+import stripe
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .stripe_client import OUTAGE_ERRORS, GatewayUnavailable, call_stripe
+
+PAYMENT_GATEWAY = getattr(settings, 'PAYMENT_GATEWAY', 'elearning.payments.gateways.StripeGateway')
+LIST_PAGE_SIZE = 100
+
+# charge_id and payment_method are only known once the intent has succeeded.
+Intent = namedtuple('Intent', 'id status client_secret created charge_id payment_method')
+
+
+class PaymentError(Exception):
+    """The provider refused the request (declined card, invalid amount...)."""
+
+    def __init__(self, user_message):
+        super().__init__(user_message)
+        self.user_message = user_message
+
+
+class InvalidWebhook(Exception):
+    pass
+
+
+def _as_intent(obj):
+    if not isinstance(obj, dict):
+        # Newer stripe releases no longer build their objects on dict.
+        obj = obj.to_dict()
+    return Intent(
+        obj['id'],
+        obj['status'],
+        obj.get('client_secret') or '',
+        obj.get('created'),
+        obj.get('latest_charge'),
+        (obj.get('payment_method_types') or [None])[0],
+    )
+
+
+def verify_webhook(payload, signature, secret=None):
+    """
+    Check a Stripe-Signature header against ``payload`` and return the
+    decoded event. Raises InvalidWebhook for a bad signature or body.
+    """
+    if not signature:
+        raise InvalidWebhook('missing signature')
+    try:
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        stripe.WebhookSignature.verify_header(
+            payload, signature, secret or settings.STRIPE_WEBHOOK_SECRET, stripe.Webhook.DEFAULT_TOLERANCE
+        )
+        return json.loads(payload)
+    except (ValueError, stripe.error.SignatureVerificationError) as exc:
+        raise InvalidWebhook(str(exc))
+
+
+def sign_webhook(payload, secret=None, timestamp=None):
+    """The Stripe-Signature header Stripe would send with ``payload``."""
+    timestamp = int(timestamp or time.time())
+    secret = secret or settings.STRIPE_WEBHOOK_SECRET
+    signed = f'{timestamp}.{payload.decode() if isinstance(payload, bytes) else payload}'
+    digest = hmac.new(secret.encode(), signed.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+class PaymentGateway:
+    """
+    What the payments app needs from a provider. Implementations raise
+    GatewayUnavailable when the provider cannot be reached and PaymentError
+    when it refuses a request.
+    """
+
+    def create_intent(self, amount, currency, metadata, idempotency_key):
+        raise NotImplementedError
+
+    def retrieve_intent(self, intent_id):
+        """The intent, or None if the provider does not know it."""
+        raise NotImplementedError
+
+    def list_intents(self, created_gte, created_lte):
+        """Iterate over intents created in the window (unix times, inclusive), newest first."""
+        raise NotImplementedError
+
+    def parse_webhook(self, payload, signature):
+        return verify_webhook(payload, signature)
+
+
+class StripeGateway(PaymentGateway):
+
+    def _call(self, func, *args, **kwargs):
+        try:
+            return call_stripe(func, *args, **kwargs)
+        except OUTAGE_ERRORS as exc:
+            raise GatewayUnavailable('Payment provider is unavailable, please try again shortly.') from exc
+        except stripe.error.StripeError as exc:
+            raise PaymentError(exc.user_message or 'Payment could not be started.') from exc
+
+    def create_intent(self, amount, currency, metadata, idempotency_key):
+        intent = self._call(
+            stripe.PaymentIntent.create,
+            amount=amount, currency=currency, metadata=metadata, idempotency_key=idempotency_key,
+        )
+        return _as_intent(intent)
+
+    def retrieve_intent(self, intent_id):
+        try:
+            return _as_intent(self._call(stripe.PaymentIntent.retrieve, intent_id))
+        except PaymentError as exc:
+            if getattr(exc.__cause__, 'code', None) == 'resource_missing':
+                return None
+            raise
+
+    def list_intents(self, created_gte, created_lte):
+        params = {'created': {'gte': created_gte, 'lte': created_lte}, 'limit': LIST_PAGE_SIZE}
+        while True:
+            page = self._call(stripe.PaymentIntent.list, **params)
+            for intent in page.data:
+                yield _as_intent(intent)
+            if not page.has_more or not page.data:
+                return
+            params['starting_after'] = page.data[-1].id
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-process stand-in for Stripe, for development and load tests. It
+    issues intents (idempotency keys included) and, through confirm(), moves
+    them on and returns the webhook Stripe would send. Webhooks are signed
+    and checked with the gateway's own ``webhook_secret``, so it works
+    without STRIPE_WEBHOOK_SECRET. ``latency`` adds a delay in seconds to
+    each call.
+    """
+
+    webhook_secret = 'whsec_fake_gateway'
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self._intents = {}
+        self._idempotency = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def create_intent(self, amount, currency, metadata, idempotency_key):
+        self._wait()
+        if amount <= 0:
+            raise PaymentError('Amount must be positive.')
+        with self._lock:
+            intent_id = self._idempotency.get(idempotency_key)
+            if intent_id is None:
+                intent_id = f'pi_fake_{next(self._ids)}'
+                self._intents[intent_id] = {
+                    'id': intent_id,
+                    'object': 'payment_intent',
+                    'amount': amount,
+                    'currency': currency,
+                    'metadata': dict(metadata),
+                    'status': 'requires_payment_method',
+                    'client_secret': f'{intent_id}_secret_{secrets.token_hex(8)}',
+                    'created': int(time.time()),
+                    'latest_charge': None,
+                    'payment_method_types': ['card'],
+                }
+                if idempotency_key:
+                    self._idempotency[idempotency_key] = intent_id
+            return _as_intent(self._intents[intent_id])
+
+    def retrieve_intent(self, intent_id):
+        self._wait()
+        with self._lock:
+            intent = self._intents.get(intent_id)
+            return _as_intent(intent) if intent else None
+
+    def parse_webhook(self, payload, signature):
+        return verify_webhook(payload, signature, self.webhook_secret)
+
+    def list_intents(self, created_gte, created_lte):
+        self._wait()
+        with self._lock:
+            intents = [
+                _as_intent(intent) for intent in self._intents.values()
+                if created_gte <= intent['created'] <= created_lte
+            ]
+        return iter(sorted(intents, key=lambda intent: intent.created, reverse=True))
+
+    def confirm(self, intent_id, succeed=True):
+        """
+        Settle an intent as the customer's payment would: ``succeed`` or
+        cancel it. Returns ``(payload, signature)`` of the webhook to post.
+        """
+        with self._lock:
+            intent = self._intents[intent_id]
+            if succeed:
+                intent['status'] = 'succeeded'
+                intent['latest_charge'] = f'ch_fake_{intent_id[8:]}'
+            else:
+                intent['status'] = 'canceled'
+            event = {
+                'id': f'evt_fake_{secrets.token_hex(12)}',
+                'object': 'event',
+                'type': 'payment_intent.succeeded' if succeed else 'payment_intent.canceled',
+                'created': int(time.time()),
+                'data': {'object': dict(intent)},
+            }
+        payload = json.dumps(event).encode()
+        return payload, sign_webhook(payload, self.webhook_secret)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The configured gateway (PAYMENT_GATEWAY), built once per process."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = import_string(PAYMENT_GATEWAY)()
+        return _gateway
+
+
+def set_gateway(gateway):
+    """Replace the process's gateway (benchmarks, local tools); returns the previous one."""
+    global _gateway
+    with _gateway_lock:
+        previous, _gateway = _gateway, gateway
+    return previous
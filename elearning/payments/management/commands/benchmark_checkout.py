@@ -0,0 +1,153 @@
+import math
+import secrets
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from elearning.courses.models import Course
+from elearning.payments.gateways import FakeGateway, set_gateway
+from elearning.payments.models import Purchase
+from elearning.payments.webhooks import drain
+
+User = get_user_model()
+
+STEPS = ('checkout page', 'create intent', 'webhook')
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent purchases through checkout, create_payment_intent and the webhook '
+        'against the in-process fake gateway, and report throughput, latency and queries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purchases', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=20, help='Simultaneous simulated students')
+        parser.add_argument('--latency', type=float, default=0,
+                            help='Milliseconds the fake gateway waits on every call, like a real round trip')
+        parser.add_argument('--timeout', type=float, default=120,
+                            help='Seconds to wait for the webhooks to be fulfilled')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark course, users and purchases')
+
+    def _purchase(self, gateway, course, student):
+        """One student's checkout. Returns ``[(step, ms, queries), ...]`` and an error or None."""
+        client = Client(raise_request_exception=False)
+        client.force_login(student)
+        timings = []
+
+        def timed(step, send, expected):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = send()
+                elapsed = (time.perf_counter() - started) * 1000
+            timings.append((step, elapsed, len(queries)))
+            if response.status_code != expected:
+                raise RuntimeError(f'{step}: HTTP {response.status_code}')
+            return response
+
+        try:
+            timed('checkout page', lambda: client.get(reverse('checkout', args=[course.pk])), 200)
+            response = timed(
+                'create intent', lambda: client.post(reverse('create_payment_intent', args=[course.pk])), 200
+            )
+            intent_id = response.json()['clientSecret'].split('_secret_')[0]
+            payload, signature = gateway.confirm(intent_id)
+            # Stripe posts webhooks without the student's session.
+            timed('webhook', lambda: Client(raise_request_exception=False).post(
+                reverse('stripe_webhook'), payload, content_type='application/json',
+                HTTP_STRIPE_SIGNATURE=signature,
+            ), 200)
+            error = None
+        except Exception as exc:
+            error = str(exc) or exc.__class__.__name__
+        finally:
+            client.logout()
+            connection.close()
+        return timings, error
+
+    def _wait_for_fulfilment(self, course, expected, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            # Help the webhook workers (or stand in for them when there are none).
+            drain()
+            completed = Purchase.objects.filter(course=course, status='completed').count()
+            if completed >= expected or time.monotonic() > deadline:
+                return completed
+            time.sleep(0.1)
+
+    def handle(self, *args, **options):
+        total = options['purchases']
+        if total < 1 or options['concurrency'] < 1:
+            raise CommandError('--purchases and --concurrency must be positive.')
+
+        token = secrets.token_hex(4)
+        tutor = User.objects.create_user(username=f'bench-tutor-{token}', role='tutor')
+        course = Course.objects.create(
+            title=f'Checkout benchmark {token}', slug=f'checkout-benchmark-{token}',
+            description='Created by benchmark_checkout.', tutor=tutor,
+            price=Decimal('5000'), is_published=True, is_approved=True,
+        )
+        students = [User(username=f'bench-{token}-{index}', role='student') for index in range(total)]
+        for student in students:
+            student.set_unusable_password()
+        students = User.objects.bulk_create(students, batch_size=1000)
+
+        gateway = FakeGateway(latency=options['latency'] / 1000)
+        previous = set_gateway(gateway)
+        timings = defaultdict(list)
+        errors = Counter()
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                for steps, error in executor.map(lambda student: self._purchase(gateway, course, student), students):
+                    for step, elapsed, queries in steps:
+                        timings[step].append((elapsed, queries))
+                    if error:
+                        errors[error] += 1
+            requests_done = time.perf_counter() - started
+            succeeded = total - sum(errors.values())
+            completed = self._wait_for_fulfilment(course, succeeded, options['timeout'])
+            fulfilled = time.perf_counter() - started
+        finally:
+            set_gateway(previous)
+            if not options['keep']:
+                User.objects.filter(pk__in=[student.pk for student in students]).delete()
+                course.delete()
+                tutor.delete()
+
+        self.stdout.write(
+            f'{total} purchases by {options["concurrency"]} concurrent students, '
+            f'gateway latency {options["latency"]:g} ms'
+        )
+        self.stdout.write(
+            f'Requests finished in {requests_done:.2f}s ({total / requests_done:.1f} purchases/s); '
+            f'{completed} fulfilled after {fulfilled:.2f}s ({completed / fulfilled:.1f} purchases/s)'
+        )
+        self.stdout.write(f'{"step":<16}{"requests":>10}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}{"queries":>10}')
+        for step in STEPS:
+            samples = timings.get(step)
+            if not samples:
+                continue
+            latencies = [elapsed for elapsed, _ in samples]
+            queries = sum(count for _, count in samples) / len(samples)
+            self.stdout.write(
+                f'{step:<16}{len(samples):>10}{_percentile(latencies, 0.5):>10.1f}'
+                f'{_percentile(latencies, 0.95):>10.1f}{max(latencies):>10.1f}{queries:>10.1f}'
+            )
+        for error, count in errors.most_common():
+            self.stdout.write(self.style.ERROR(f'{count} x {error}'))
+        if completed < total:
+            raise CommandError(f'Only {completed} of {total} purchases were fulfilled within {options["timeout"]:g}s.')
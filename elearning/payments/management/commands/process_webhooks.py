@@ -0,0 +1,37 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from elearning.payments.webhooks import WEBHOOK_BATCH_SIZE, drain
+
+
+class Command(BaseCommand):
+    help = 'Process stored Stripe webhook events (once, or continuously with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=WEBHOOK_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of worker threads claiming batches in parallel')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new events')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to wait between polls when the inbox is empty')
+
+    def _drain(self, batch_size):
+        try:
+            return drain(batch_size)
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                handled = sum(executor.map(self._drain, [options['batch_size']] * workers))
+                if handled:
+                    self.stdout.write(f'Processed {handled} webhook events.')
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Webhook inbox is drained.'))
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elearning.payments.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily revenue and enrollment rollups from purchases and enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days from this date on (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date like 2024-01-31.')
+        rows = rebuild_rollups(since)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} course-day rollups.'))
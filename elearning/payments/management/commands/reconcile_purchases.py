@@ -0,0 +1,34 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elearning.payments.reconcile import RECONCILE_CHUNK_SIZE, RECONCILE_MIN_AGE, pending_chunks, reconcile_chunk
+from elearning.payments.gateways import GatewayUnavailable
+
+
+class Command(BaseCommand):
+    help = 'Resolve pending purchases from their PaymentIntent status at the payment gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=RECONCILE_CHUNK_SIZE)
+        parser.add_argument('--older-than', type=int, default=int(RECONCILE_MIN_AGE.total_seconds() // 60),
+                            help='Only purchases pending for at least this many minutes')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without saving')
+
+    def handle(self, *args, **options):
+        stats = Counter()
+        chunks = pending_chunks(max(1, options['chunk_size']), timedelta(minutes=options['older_than']))
+        try:
+            for chunk in chunks:
+                stats.update(reconcile_chunk(chunk, dry_run=options['dry_run']))
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'Checked {stats["checked"]} purchases...')
+        except GatewayUnavailable as exc:
+            raise CommandError(f'{exc} Checked {stats["checked"]} purchases before stopping.')
+
+        prefix = 'Would complete' if options['dry_run'] else 'Completed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {stats["completed"]} and failed {stats["failed"]} of {stats["checked"]} pending purchases '
+            f'({stats["unchanged"]} still in progress, {stats["missing"]} unknown to the gateway).'
+        ))
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from elearning.courses.models import Course
 import uuid
@@ -15,17 +15,27 @@ class Purchase(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='purchases')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    stripe_client_secret = models.CharField(max_length=255, blank=True, editable=False)
     transaction_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(blank=True, null=True)
     
+    def save(self, *args, **kwargs):
+        # Keeps Course.completed_purchase_count in the same transaction as the status change.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.student.username} - {self.course.title} - {self.status}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student', '-created_at', '-id'], name='purchase_student_idx'),
+            models.Index(fields=['student', 'course', 'status'], name='purchase_pending_idx'),
+        ]
 
 
 class Transaction(models.Model):
@@ -62,3 +72,75 @@ class PaymentMethod(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+
+
+class WebhookEvent(models.Model):
+    """Inbox of Stripe events, stored on receipt and processed by the webhook workers."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(help_text="Not processed before this time (retry backoff)")
+    locked_until = models.DateTimeField(blank=True, null=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} - {self.status}"
+    
+    class Meta:
+        ordering = ['-received_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='webhook_status_available_idx'),
+        ]
+
+
+class DailyStats(models.Model):
+    """Per-day revenue and enrollment totals, kept current by signals and rebuilt by rebuild_rollups."""
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    purchases = models.PositiveIntegerField(default=0)
+    refunds = models.PositiveIntegerField(default=0)
+    refunded_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    new_enrollments = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+        ordering = ['-date']
+
+
+class CourseDailyStats(DailyStats):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+    
+    def __str__(self):
+        return f"{self.course.title} - {self.date}"
+    
+    class Meta(DailyStats.Meta):
+        verbose_name_plural = 'Course daily stats'
+        unique_together = ['course', 'date']
+        indexes = [
+            models.Index(fields=['date'], name='course_stats_date_idx'),
+        ]
+
+
+class TutorDailyStats(DailyStats):
+    tutor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_stats')
+    
+    def __str__(self):
+        return f"{self.tutor.username} - {self.date}"
+    
+    class Meta(DailyStats.Meta):
+        verbose_name_plural = 'Tutor daily stats'
+        unique_together = ['tutor', 'date']
+        indexes = [
+            models.Index(fields=['date'], name='tutor_stats_date_idx'),
+        ]
@@ -0,0 +1,197 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from elearning.courses.counters import adjust_counters
+from elearning.courses.models import Course, CourseEnrollment
+from .gateways import get_gateway
+from .models import Purchase, Transaction
+from .rollups import record_enrollments, record_sales
+from .services import fulfil_purchase
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_CHUNK_SIZE = 500
+# Leave recent purchases alone: their checkout may still be in progress.
+RECONCILE_MIN_AGE = timedelta(minutes=15)
+# Intents are created just before their purchase row; list this much
+# around each run of purchases to allow for that and for clock skew.
+WINDOW_SLACK = timedelta(minutes=5)
+
+
+def pending_chunks(chunk_size=RECONCILE_CHUNK_SIZE, older_than=RECONCILE_MIN_AGE):
+    """
+    Yield lists of ``(id, payment_intent_id, created_at)`` for pending
+    purchases, in id order. Paging is by id rather than offset, so rows
+    that stop being pending do not shift later pages.
+    """
+    cutoff = timezone.now() - older_than
+    last_id = 0
+    while True:
+        chunk = list(Purchase.objects.filter(
+            status='pending', stripe_payment_intent_id__isnull=False,
+            created_at__lt=cutoff, id__gt=last_id,
+        ).order_by('id').values_list('id', 'stripe_payment_intent_id', 'created_at')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def _windows(created):
+    """Group creation times into [start, end] runs no wider apart than the slack allows."""
+    windows = []
+    for moment in sorted(created):
+        if windows and moment - windows[-1][1] <= 2 * WINDOW_SLACK:
+            windows[-1][1] = moment
+        else:
+            windows.append([moment, moment])
+    return [(start - WINDOW_SLACK, end + WINDOW_SLACK) for start, end in windows]
+
+
+def fetch_intents(intent_ids, created):
+    """
+    Look up ``intent_ids`` by listing the intents created in the time
+    windows they belong to (100 per request with Stripe), and retrieve
+    the few that the windows missed one by one. Returns
+    ``{intent_id: intent}``; intents the gateway does not know are left out.
+    """
+    gateway = get_gateway()
+    wanted = set(intent_ids)
+    found = {}
+    for start, end in _windows(created):
+        for intent in gateway.list_intents(int(start.timestamp()), int(end.timestamp())):
+            if intent.id in wanted:
+                found[intent.id] = intent
+
+    for intent_id in wanted - found.keys():
+        intent = gateway.retrieve_intent(intent_id)
+        if intent is None:
+            logger.warning('Payment intent %s not found at the payment gateway', intent_id)
+        else:
+            found[intent_id] = intent
+    return found
+
+
+def _complete_chunk(purchase_ids, intents):
+    """
+    Complete the still-pending purchases among ``purchase_ids`` with one
+    bulk UPDATE, bulk enrollments and bulk transaction INSERTs. The rows are
+    locked first, so a webhook fulfilling the same purchase waits and then
+    finds it completed. Returns the number completed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        purchases = list(Purchase.objects.select_for_update().filter(pk__in=purchase_ids, status='pending'))
+        if not purchases:
+            return 0
+        for purchase in purchases:
+            purchase.status = 'completed'
+            purchase.completed_at = now
+            purchase.updated_at = now
+        Purchase.objects.bulk_update(purchases, ['status', 'completed_at', 'updated_at'], batch_size=500)
+
+        pairs = {(purchase.student_id, purchase.course_id) for purchase in purchases}
+        existing = {
+            (enrollment.student_id, enrollment.course_id): enrollment
+            for enrollment in CourseEnrollment.objects.filter(
+                student_id__in={student for student, _ in pairs},
+                course_id__in={course for _, course in pairs},
+            ).only('id', 'student_id', 'course_id', 'is_active')
+        }
+        reactivated = [
+            enrollment for pair, enrollment in existing.items()
+            if pair in pairs and not enrollment.is_active
+        ]
+        for enrollment in reactivated:
+            enrollment.is_active = True
+        CourseEnrollment.objects.bulk_update(reactivated, ['is_active'], batch_size=500)
+        created = CourseEnrollment.objects.bulk_create([
+            CourseEnrollment(student_id=student, course_id=course)
+            for student, course in pairs - existing.keys()
+        ], batch_size=500)
+
+        titles = dict(Course.objects.filter(
+            pk__in={purchase.course_id for purchase in purchases}
+        ).values_list('id', 'title'))
+        transactions = []
+        for purchase in purchases:
+            intent = intents[purchase.stripe_payment_intent_id]
+            transactions.append(Transaction(
+                purchase=purchase,
+                transaction_type='purchase',
+                amount=purchase.amount,
+                stripe_charge_id=intent.charge_id,
+                payment_method=intent.payment_method,
+                description=f'Purchase of {titles[purchase.course_id]}',
+            ))
+        Transaction.objects.bulk_create(transactions, batch_size=500)
+
+        # The bulk writes skip the Purchase and enrollment signals.
+        for course_id, count in Counter(purchase.course_id for purchase in purchases).items():
+            adjust_counters(Course.objects.filter(pk=course_id), completed_purchase_count=count)
+        record_sales(purchases)
+        record_enrollments(created)
+    return len(purchases)
+
+
+def _complete_one_by_one(purchase_ids, intents):
+    completed = 0
+    for purchase_id, intent_id in Purchase.objects.filter(
+        pk__in=purchase_ids, status='pending'
+    ).values_list('id', 'stripe_payment_intent_id'):
+        intent = intents[intent_id]
+        purchase = fulfil_purchase(intent_id, charge_id=intent.charge_id, payment_method=intent.payment_method)
+        completed += purchase is not None
+    return completed
+
+
+def reconcile_chunk(chunk, dry_run=False):
+    """
+    Bring one chunk of pending purchases in line with the gateway:
+    succeeded intents complete their purchase, canceled ones fail it, and
+    anything else stays pending. Returns a Counter of outcomes.
+    """
+    intents = fetch_intents([intent_id for _, intent_id, _ in chunk], [created for _, _, created in chunk])
+    stats = Counter(checked=len(chunk))
+    succeeded, canceled = [], []
+    for purchase_id, intent_id, _ in chunk:
+        intent = intents.get(intent_id)
+        if intent is None:
+            stats['missing'] += 1
+        elif intent.status == 'succeeded':
+            succeeded.append(purchase_id)
+        elif intent.status == 'canceled':
+            canceled.append(intent_id)
+        else:
+            stats['unchanged'] += 1
+
+    if dry_run:
+        stats['completed'] += len(succeeded)
+        stats['failed'] += len(canceled)
+        return stats
+
+    if succeeded:
+        try:
+            stats['completed'] += _complete_chunk(succeeded, intents)
+        except IntegrityError:
+            # Most likely an enrollment created concurrently for the same
+            # student and course; the per-purchase path copes with that.
+            logger.warning('Bulk reconciliation conflicted, completing %s purchases one by one', len(succeeded))
+            stats['completed'] += _complete_one_by_one(succeeded, intents)
+    if canceled:
+        stats['failed'] += Purchase.objects.filter(
+            stripe_payment_intent_id__in=canceled, status='pending'
+        ).update(status='failed', updated_at=timezone.now())
+    return stats
+
+
+def reconcile_pending_purchases(chunk_size=RECONCILE_CHUNK_SIZE, older_than=RECONCILE_MIN_AGE, dry_run=False):
+    """Reconcile every pending purchase older than ``older_than``, one chunk at a time."""
+    stats = Counter()
+    for chunk in pending_chunks(chunk_size, older_than):
+        stats.update(reconcile_chunk(chunk, dry_run=dry_run))
+    return stats
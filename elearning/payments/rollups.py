@@ -0,0 +1,178 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from elearning.courses.models import Course, CourseEnrollment
+from .models import CourseDailyStats, Purchase, TutorDailyStats
+
+ROLLUP_FIELDS = ('revenue', 'purchases', 'refunds', 'refunded_amount', 'new_enrollments')
+ZERO = Decimal('0')
+
+
+def _bump(model, day, owner, deltas):
+    updates = {field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()}
+    if model.objects.filter(date=day, **owner).update(**updates):
+        return
+    if all(delta < 0 for delta in deltas.values()):
+        # Nothing to take away from a day with no row. This is also the case
+        # while a course or tutor is being deleted, when a new row would
+        # point at the row going away.
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(date=day, **owner, **{
+                field: max(delta, 0) for field, delta in deltas.items()
+            })
+    except IntegrityError:
+        # Another transaction created the row first.
+        model.objects.filter(date=day, **owner).update(**updates)
+
+
+def local_day(moment=None):
+    return timezone.localdate(moment or timezone.now())
+
+
+def record(course_id, day, **deltas):
+    """
+    Add ``deltas`` (e.g. ``revenue=..., purchases=1``) to ``day`` for the
+    course and for its tutor: one UPDATE each, or an INSERT the first time
+    that day.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    tutor_id = Course.objects.filter(pk=course_id).values_list('tutor_id', flat=True).first()
+    _bump(CourseDailyStats, day, {'course_id': course_id}, deltas)
+    if tutor_id is not None:
+        _bump(TutorDailyStats, day, {'tutor_id': tutor_id}, deltas)
+
+
+def purchase_status_changed(purchase, previous_status):
+    """
+    Completion counts as a sale on the completion day. A refund of a
+    completed purchase counts on the day it happens and leaves the sale in
+    place. Any other move out of completed takes the sale back.
+    """
+    status = purchase.status
+    if status == previous_status:
+        return
+    was_sold = previous_status in ('completed', 'refunded')
+    if status == 'completed' and not was_sold:
+        record(purchase.course_id, local_day(purchase.completed_at), revenue=purchase.amount, purchases=1)
+    elif status == 'refunded' and previous_status == 'completed':
+        record(purchase.course_id, local_day(), refunds=1, refunded_amount=purchase.amount)
+    elif was_sold and status not in ('completed', 'refunded'):
+        record(purchase.course_id, local_day(purchase.completed_at), revenue=-purchase.amount, purchases=-1)
+
+
+def record_sales(purchases):
+    """Roll up purchases completed in bulk, which bypasses the Purchase signals."""
+    totals = {}
+    for purchase in purchases:
+        key = (purchase.course_id, local_day(purchase.completed_at))
+        revenue, count = totals.get(key, (ZERO, 0))
+        totals[key] = (revenue + purchase.amount, count + 1)
+    for (course_id, day), (revenue, count) in totals.items():
+        record(course_id, day, revenue=revenue, purchases=count)
+
+
+def record_enrollments(enrollments):
+    """Roll up enrollments created in bulk, which bypasses the enrollment signals."""
+    totals = {}
+    for enrollment in enrollments:
+        key = (enrollment.course_id, local_day(enrollment.enrolled_at))
+        totals[key] = totals.get(key, 0) + 1
+    for (course_id, day), count in totals.items():
+        record(course_id, day, new_enrollments=count)
+
+
+def rebuild_rollups(since=None):
+    """
+    Recompute the rollups from Purchase and CourseEnrollment with a few
+    GROUP BY queries, replacing every row from ``since`` (a date) onwards, or
+    all of them. Returns the number of course-day rows written.
+    """
+    purchases = Purchase.objects.filter(status__in=['completed', 'refunded'], completed_at__isnull=False)
+    refunds = Purchase.objects.filter(status='refunded')
+    enrollments = CourseEnrollment.objects.all()
+    if since is not None:
+        start = timezone.make_aware(datetime.combine(since, time.min))
+        purchases = purchases.filter(completed_at__gte=start)
+        refunds = refunds.filter(updated_at__gte=start)
+        enrollments = enrollments.filter(enrolled_at__gte=start)
+
+    rows = {}
+
+    def add(queryset, date_field, **aggregates):
+        grouped = queryset.annotate(day=TruncDate(date_field)).order_by().values('course_id', 'day')
+        for row in grouped.annotate(**aggregates):
+            values = rows.setdefault((row['course_id'], row['day']), dict.fromkeys(ROLLUP_FIELDS, 0))
+            for field in aggregates:
+                values[field] += row[field] or 0
+
+    add(purchases, 'completed_at', revenue=Sum('amount'), purchases=Count('id'))
+    add(refunds, 'updated_at', refunds=Count('id'), refunded_amount=Sum('amount'))
+    add(enrollments, 'enrolled_at', new_enrollments=Count('id'))
+
+    tutors = dict(Course.objects.values_list('id', 'tutor_id'))
+    tutor_rows = {}
+    for (course_id, day), values in rows.items():
+        totals = tutor_rows.setdefault((tutors[course_id], day), dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field in ROLLUP_FIELDS:
+            totals[field] += values[field]
+
+    with transaction.atomic():
+        stale_course = CourseDailyStats.objects.all()
+        stale_tutor = TutorDailyStats.objects.all()
+        if since is not None:
+            stale_course = stale_course.filter(date__gte=since)
+            stale_tutor = stale_tutor.filter(date__gte=since)
+        stale_course.delete()
+        stale_tutor.delete()
+        CourseDailyStats.objects.bulk_create([
+            CourseDailyStats(course_id=course_id, date=day, **values)
+            for (course_id, day), values in rows.items()
+        ], batch_size=1000)
+        TutorDailyStats.objects.bulk_create([
+            TutorDailyStats(tutor_id=tutor_id, date=day, **values)
+            for (tutor_id, day), values in tutor_rows.items()
+        ], batch_size=1000)
+    return len(rows)
+
+
+def summary(stats, days=30):
+    """
+    All-time totals and a ``days``-long daily series from a rollup queryset
+    (optionally pre-filtered to a tutor or course): two aggregate queries
+    over at most one row per owner and day.
+    """
+    totals = stats.aggregate(**{field: Sum(field) for field in ROLLUP_FIELDS})
+    totals = {field: totals[field] or 0 for field in ROLLUP_FIELDS}
+    totals['net_revenue'] = totals['revenue'] - totals['refunded_amount']
+
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    by_day = {
+        row['date']: row
+        for row in stats.filter(date__gte=start).order_by().values('date').annotate(
+            revenue_total=Sum('revenue'), refunded_total=Sum('refunded_amount'),
+            enrollments_total=Sum('new_enrollments'),
+        )
+    }
+    series = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = by_day.get(day)
+        series.append({
+            'date': day,
+            'revenue': (row['revenue_total'] - row['refunded_total']) if row else ZERO,
+            'enrollments': row['enrollments_total'] if row else 0,
+        })
+    peak = max((item['revenue'] for item in series), default=ZERO)
+    for item in series:
+        item['height'] = float(item['revenue'] * 100 / peak) if peak > 0 else 0.0
+    return totals, series
@@ -0,0 +1,112 @@
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from elearning.courses.models import CourseEnrollment
+from .models import Purchase, Transaction
+from .gateways import get_gateway
+
+logger = logging.getLogger(__name__)
+
+# Stripe keeps idempotency keys for 24 hours; stay safely inside that.
+PENDING_PURCHASE_REUSE = timedelta(hours=23)
+
+
+def reusable_pending_purchase(student, course):
+    """
+    The student's latest pending purchase of ``course`` at its current
+    price, whose PaymentIntent checkout can simply resume.
+    """
+    return Purchase.objects.filter(
+        student=student,
+        course=course,
+        status='pending',
+        amount=course.price,
+        created_at__gte=timezone.now() - PENDING_PURCHASE_REUSE,
+    ).exclude(stripe_client_secret='').order_by('-created_at').first()
+
+
+def start_purchase(student, course):
+    """
+    Create a PaymentIntent and its pending purchase. The idempotency key
+    covers the student, course, price and number of earlier purchases, so
+    concurrent clicks get the same intent back from the gateway and end up
+    with one Purchase row.
+    """
+    previous = Purchase.objects.filter(student=student, course=course).count()
+    intent = get_gateway().create_intent(
+        amount=int(course.price * 100),
+        currency='rwf',
+        metadata={
+            'course_id': course.id,
+            'student_id': student.id
+        },
+        idempotency_key=f'purchase-{student.pk}-{course.pk}-{course.price}-{previous}',
+    )
+    defaults = {
+        'student': student,
+        'course': course,
+        'amount': course.price,
+        'status': 'pending',
+        'stripe_client_secret': intent.client_secret,
+    }
+    try:
+        purchase, _ = Purchase.objects.get_or_create(stripe_payment_intent_id=intent.id, defaults=defaults)
+    except IntegrityError:
+        purchase = Purchase.objects.get(stripe_payment_intent_id=intent.id)
+    return purchase
+
+
+def enroll_student(student_id, course_id):
+    """Create the enrollment, or reactivate a cancelled one."""
+    enrollment, created = CourseEnrollment.objects.get_or_create(student_id=student_id, course_id=course_id)
+    if not created and not enrollment.is_active:
+        enrollment.is_active = True
+        enrollment.save(update_fields=['is_active'])
+    return enrollment
+
+
+def fulfil_purchase(payment_intent_id, charge_id=None, payment_method=None):
+    """
+    Complete the purchase paid by ``payment_intent_id``: mark it completed,
+    enroll the student and record the transaction, all in one transaction.
+    The purchase row is locked and its status checked first, so running this
+    again for the same intent (webhook retries, reconciliation) does nothing.
+    Returns the purchase, or None when no purchase matches.
+    """
+    with transaction.atomic():
+        purchase = Purchase.objects.select_for_update().select_related('course').filter(
+            stripe_payment_intent_id=payment_intent_id
+        ).first()
+        if purchase is None:
+            logger.warning('No purchase for payment intent %s', payment_intent_id)
+            return None
+        if purchase.status == 'completed':
+            return purchase
+
+        purchase.status = 'completed'
+        purchase.completed_at = timezone.now()
+        purchase.save(update_fields=['status', 'completed_at', 'updated_at'])
+        enroll_student(purchase.student_id, purchase.course_id)
+        Transaction.objects.create(
+            purchase=purchase,
+            transaction_type='purchase',
+            amount=purchase.amount,
+            stripe_charge_id=charge_id,
+            payment_method=payment_method,
+            description=f'Purchase of {purchase.course.title}'
+        )
+    return purchase
+
+
+def fail_purchase(payment_intent_id):
+    """
+    Mark a still-pending purchase as failed once its intent is canceled.
+    A declined card alone does not fail it, since the student can retry
+    the same intent. Completed purchases are left alone.
+    """
+    return Purchase.objects.filter(
+        stripe_payment_intent_id=payment_intent_id, status='pending'
+    ).update(status='failed')
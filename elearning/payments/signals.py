@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from elearning.courses.counters import adjust_counters
+from elearning.courses.models import Course, CourseEnrollment
+from .models import Purchase
+from .rollups import local_day, purchase_status_changed, record
+
+
+@receiver(pre_save, sender=Purchase)
+def purchase_remember_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if not instance._state.adding and instance.pk:
+        instance._previous_status = Purchase.objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Purchase)
+def purchase_saved(sender, instance, created, **kwargs):
+    purchase_status_changed(instance, getattr(instance, '_previous_status', None))
+    was_completed = getattr(instance, '_previous_status', None) == 'completed'
+    is_completed = instance.status == 'completed'
+    if was_completed != is_completed:
+        adjust_counters(
+            Course.objects.filter(pk=instance.course_id),
+            completed_purchase_count=1 if is_completed else -1,
+        )
+
+
+def _deleting_course(origin):
+    """Whether a post_delete comes from a course deletion, which takes its rollups with it."""
+    return isinstance(origin, Course) or getattr(origin, 'model', None) is Course
+
+
+@receiver(post_delete, sender=Purchase)
+def purchase_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_course(origin):
+        return
+    if instance.status == 'completed':
+        adjust_counters(Course.objects.filter(pk=instance.course_id), completed_purchase_count=-1)
+    if instance.status in ('completed', 'refunded') and instance.completed_at:
+        # Deleting a sale removes it from the rollups as a rebuild would.
+        record(instance.course_id, local_day(instance.completed_at), revenue=-instance.amount, purchases=-1)
+    if instance.status == 'refunded':
+        record(instance.course_id, local_day(instance.updated_at), refunds=-1, refunded_amount=-instance.amount)
+
+
+@receiver(post_save, sender=CourseEnrollment)
+def enrollment_created(sender, instance, created, **kwargs):
+    if created:
+        record(instance.course_id, local_day(instance.enrolled_at), new_enrollments=1)
+
+
+@receiver(post_delete, sender=CourseEnrollment)
+def enrollment_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_course(origin):
+        return
+    record(instance.course_id, local_day(instance.enrolled_at), new_enrollments=-1)
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+
+import requests
+import stripe
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+STRIPE_API_BASE = getattr(settings, 'STRIPE_API_BASE', '')
+STRIPE_TIMEOUT = getattr(settings, 'STRIPE_TIMEOUT', 10)
+STRIPE_MAX_RETRIES = getattr(settings, 'STRIPE_MAX_RETRIES', 2)
+STRIPE_POOL_SIZE = getattr(settings, 'STRIPE_POOL_SIZE', 10)
+BREAKER_FAILURES = getattr(settings, 'STRIPE_BREAKER_FAILURES', 5)
+BREAKER_COOLDOWN = getattr(settings, 'STRIPE_BREAKER_COOLDOWN', 30)
+
+# Failures that say Stripe is unreachable or unhealthy, as opposed to a
+# declined card or a bad request, which must not trip the breaker.
+OUTAGE_ERRORS = (stripe.error.APIConnectionError, stripe.error.APIError, stripe.error.RateLimitError)
+
+# stripe 5.x keeps the HTTP clients in stripe.http_client; later releases export them at the top level.
+_RequestsClient = getattr(stripe, 'RequestsClient', None) or stripe.http_client.RequestsClient
+
+
+class GatewayUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fails fast after ``threshold`` consecutive outage errors. After
+    ``cooldown`` seconds one trial call is let through; success closes the
+    breaker, failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def _before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self._trial_running:
+                raise GatewayUnavailable('Payment provider is unavailable, please try again shortly.')
+            self._trial_running = True
+
+    def _after_call(self, failed):
+        with self._lock:
+            self._trial_running = False
+            if not failed:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.error('Stripe circuit breaker opened after %s failures', self.failures)
+                self.opened_at = time.monotonic()
+
+    def call(self, func, *args, **kwargs):
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except OUTAGE_ERRORS:
+            self._after_call(failed=True)
+            raise
+        except BaseException:
+            self._after_call(failed=False)
+            raise
+        self._after_call(failed=False)
+        return result
+
+
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _session():
+    session = requests.Session()
+    # Stripe retries on its own (with idempotency keys), so the adapter does not.
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=STRIPE_POOL_SIZE, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def configure():
+    """Point the stripe library at a pooled, time-bounded HTTP client (once per process)."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        if STRIPE_API_BASE:
+            stripe.api_base = STRIPE_API_BASE
+        stripe.max_network_retries = STRIPE_MAX_RETRIES
+        stripe.default_http_client = _RequestsClient(timeout=STRIPE_TIMEOUT, session=_session())
+        _configured = True
+
+
+def call_stripe(func, *args, **kwargs):
+    """
+    Call a stripe library function through the shared client and the circuit
+    breaker. Raises GatewayUnavailable without touching the network while
+    the breaker is open.
+    """
+    configure()
+    return breaker.call(func, *args, **kwargs)
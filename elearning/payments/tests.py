@@ -1,3 +1,225 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from elearning.courses.models import Course, CourseEnrollment
+from .gateways import FakeGateway, set_gateway
+from .models import Purchase, Transaction, WebhookEvent
+from .reconcile import reconcile_pending_purchases
+from .services import start_purchase
+from .webhooks import HANDLERS, WEBHOOK_MAX_ATTEMPTS, drain, store_event, webhook_drainer
+
+User = get_user_model()
+
+
+class GatewayTestCase(TestCase):
+
+    def setUp(self):
+        self.gateway = FakeGateway()
+        previous = set_gateway(self.gateway)
+        self.addCleanup(set_gateway, previous)
+        tutor = User.objects.create_user(username='tutor', role='tutor')
+        self.course = Course.objects.create(
+            title='Algebra', slug='algebra', description='Algebra', tutor=tutor,
+            price=Decimal('5000'), is_published=True, is_approved=True,
+        )
+
+    def purchase(self, username):
+        student = User.objects.create_user(username=username)
+        return start_purchase(student, self.course)
+
+
+class ReconcileTests(GatewayTestCase):
+
+    def test_settles_pending_purchases_from_the_gateway(self):
+        paid = self.purchase('paid')
+        canceled = self.purchase('canceled')
+        open_ = self.purchase('open')
+        self.gateway.confirm(paid.stripe_payment_intent_id)
+        self.gateway.confirm(canceled.stripe_payment_intent_id, succeed=False)
+
+        stats = reconcile_pending_purchases(older_than=timedelta(0))
+
+        self.assertEqual(stats['checked'], 3)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(stats['unchanged'], 1)
+        paid.refresh_from_db()
+        canceled.refresh_from_db()
+        open_.refresh_from_db()
+        self.assertEqual((paid.status, canceled.status, open_.status), ('completed', 'failed', 'pending'))
+        self.assertIsNotNone(paid.completed_at)
+        self.assertTrue(CourseEnrollment.objects.filter(student=paid.student, course=self.course, is_active=True).exists())
+        self.assertFalse(CourseEnrollment.objects.filter(student=canceled.student).exists())
+        transaction = Transaction.objects.get(purchase=paid)
+        self.assertEqual(transaction.amount, paid.amount)
+        self.assertEqual(transaction.stripe_charge_id, f'ch_fake_{paid.stripe_payment_intent_id[8:]}')
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.completed_purchase_count, 1)
+
+    def test_second_run_changes_nothing(self):
+        paid = self.purchase('paid')
+        self.gateway.confirm(paid.stripe_payment_intent_id)
+        reconcile_pending_purchases(older_than=timedelta(0))
+
+        stats = reconcile_pending_purchases(older_than=timedelta(0))
+
+        self.assertEqual(stats['checked'], 0)
+        self.assertEqual(Transaction.objects.filter(purchase=paid).count(), 1)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.completed_purchase_count, 1)
+
+    def test_reactivates_a_cancelled_enrollment(self):
+        paid = self.purchase('paid')
+        CourseEnrollment.objects.create(student=paid.student, course=self.course, is_active=False)
+        self.gateway.confirm(paid.stripe_payment_intent_id)
+
+        reconcile_pending_purchases(older_than=timedelta(0))
+
+        enrollment = CourseEnrollment.objects.get(student=paid.student, course=self.course)
+        self.assertTrue(enrollment.is_active)
+
+    def test_intents_outside_the_listed_window_are_retrieved(self):
+        paid = self.purchase('paid')
+        self.gateway.confirm(paid.stripe_payment_intent_id)
+        # The intent was created now, an hour after the purchase row claims.
+        Purchase.objects.filter(pk=paid.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        with mock.patch.object(self.gateway, 'retrieve_intent', wraps=self.gateway.retrieve_intent) as retrieve:
+            stats = reconcile_pending_purchases()
+
+        retrieve.assert_called_once_with(paid.stripe_payment_intent_id)
+        self.assertEqual(stats['completed'], 1)
+
+    def test_leaves_recent_and_unknown_purchases_alone(self):
+        recent = self.purchase('recent')
+        self.gateway.confirm(recent.stripe_payment_intent_id)
+        unknown = Purchase.objects.create(
+            student=User.objects.create_user(username='unknown'), course=self.course,
+            amount=self.course.price, stripe_payment_intent_id='pi_unknown',
+        )
+        Purchase.objects.filter(pk=unknown.pk).update(created_at=timezone.now() - timedelta(hours=1))
+
+        with self.assertLogs('elearning.payments.reconcile', 'WARNING'):
+            stats = reconcile_pending_purchases()
+
+        self.assertEqual(stats['checked'], 1)
+        self.assertEqual(stats['missing'], 1)
+        self.assertEqual(Purchase.objects.filter(status='pending').count(), 2)
+
+    def test_dry_run_only_counts(self):
+        paid = self.purchase('paid')
+        self.gateway.confirm(paid.stripe_payment_intent_id)
+
+        stats = reconcile_pending_purchases(older_than=timedelta(0), dry_run=True)
+
+        self.assertEqual(stats['completed'], 1)
+        paid.refresh_from_db()
+        self.assertEqual(paid.status, 'pending')
+
+
+def _event(event_id='evt_1', intent_id='pi_missing'):
+    return {'id': event_id, 'type': 'payment_intent.succeeded', 'data': {'object': {'id': intent_id}}}
+
+
+class WebhookInboxTests(GatewayTestCase):
+
+    def test_redelivered_events_are_stored_once(self):
+        paid = self.purchase('paid')
+        payload, signature = self.gateway.confirm(paid.stripe_payment_intent_id)
+        for _ in range(2):
+            response = self.client.post(
+                reverse('stripe_webhook'), payload, content_type='application/json',
+                HTTP_STRIPE_SIGNATURE=signature,
+            )
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertEqual(drain(), 1)
+        paid.refresh_from_db()
+        self.assertEqual(paid.status, 'completed')
+        self.assertEqual(Transaction.objects.filter(purchase=paid).count(), 1)
+        self.assertEqual(WebhookEvent.objects.get().status, 'done')
+
+    def test_bad_signature_is_rejected(self):
+        paid = self.purchase('paid')
+        payload, _ = self.gateway.confirm(paid.stripe_payment_intent_id)
+        response = self.client.post(
+            reverse('stripe_webhook'), payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE='t=1,v1=bad',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_failed_event_is_retried_later(self):
+        store_event(_event())
+        failing = mock.Mock(side_effect=[RuntimeError('database busy'), None])
+        with mock.patch.dict(HANDLERS, {'payment_intent.succeeded': failing}):
+            with self.assertLogs('elearning.payments.webhooks', 'ERROR'):
+                self.assertEqual(drain(), 1)
+            event = WebhookEvent.objects.get()
+            self.assertEqual((event.status, event.attempts), ('pending', 1))
+            self.assertEqual(event.last_error, 'RuntimeError: database busy')
+            self.assertGreater(event.available_at, timezone.now())
+            # Not due yet.
+            self.assertEqual(drain(), 0)
+
+            WebhookEvent.objects.update(available_at=timezone.now())
+            self.assertEqual(drain(), 1)
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('done', 2, ''))
+        self.assertEqual(failing.call_count, 2)
+
+    def test_event_gives_up_after_the_last_attempt(self):
+        store_event(_event())
+        WebhookEvent.objects.update(attempts=WEBHOOK_MAX_ATTEMPTS - 1)
+        failing = mock.Mock(side_effect=RuntimeError('broken'))
+        with mock.patch.dict(HANDLERS, {'payment_intent.succeeded': failing}):
+            with self.assertLogs('elearning.payments.webhooks', 'ERROR'):
+                drain()
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('failed', WEBHOOK_MAX_ATTEMPTS))
+
+    def test_expired_lease_is_claimed_again(self):
+        paid = self.purchase('paid')
+        self.gateway.confirm(paid.stripe_payment_intent_id)
+        store_event(_event(intent_id=paid.stripe_payment_intent_id))
+        WebhookEvent.objects.update(status='processing', attempts=1, locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(drain(), 1)
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts), ('done', 2))
+        paid.refresh_from_db()
+        self.assertEqual(paid.status, 'completed')
+
+
+class BenchmarkCheckoutTests(TransactionTestCase):
+
+    def setUp(self):
+        # SQLite's shared in-memory test database does not wait for locks, so
+        # run one checkout at a time and let the command drain the inbox.
+        patcher = mock.patch.object(webhook_drainer, 'workers', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_every_purchase_is_fulfilled_with_default_settings(self):
+        out = StringIO()
+        call_command('benchmark_checkout', purchases=4, concurrency=1, stdout=out)
+
+        self.assertIn('4 fulfilled', out.getvalue())
+        self.assertFalse(Purchase.objects.exists())
+
+    def test_unfulfilled_purchases_fail_the_command(self):
+        with mock.patch.dict(HANDLERS, {'payment_intent.succeeded': lambda payload: None}):
+            with self.assertRaisesMessage(CommandError, 'Only 0 of 2 purchases were fulfilled'):
+                call_command('benchmark_checkout', purchases=2, concurrency=1, timeout=0.5, stdout=StringIO())
@@ -5,12 +5,13 @@ from django.conf import settings
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from .models import Purchase, Transaction
+from django.db import transaction
+from .models import Purchase
+from .gateways import GatewayUnavailable, InvalidWebhook, PaymentError, get_gateway
+from .services import reusable_pending_purchase, start_purchase
+from .webhooks import store_event, webhook_drainer
 from elearning.courses.models import Course, CourseEnrollment
-import stripe
-import json
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from elearning.courses.pagination import KeysetPaginator
 
 
 @login_required
@@ -55,27 +56,16 @@ def create_payment_intent(request, course_id):
     if existing_enrollment:
         return JsonResponse({'error': 'Already enrolled'}, status=400)
     
-    try:
-        intent = stripe.PaymentIntent.create(
-            amount=int(course.price * 100),
-            currency='rwf',
-            metadata={
-                'course_id': course.id,
-                'student_id': request.user.id
-            }
-        )
-        
-        Purchase.objects.create(
-            student=request.user,
-            course=course,
-            amount=course.price,
-            stripe_payment_intent_id=intent.id,
-            status='pending'
-        )
-        
-        return JsonResponse({'clientSecret': intent.client_secret})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
+    purchase = reusable_pending_purchase(request.user, course)
+    if purchase is None:
+        try:
+            purchase = start_purchase(request.user, course)
+        except GatewayUnavailable as e:
+            return JsonResponse({'error': str(e)}, status=503)
+        except PaymentError as e:
+            return JsonResponse({'error': e.user_message}, status=400)
+    
+    return JsonResponse({'clientSecret': purchase.stripe_client_secret})
 
 
 @csrf_exempt
@@ -85,38 +75,14 @@ def stripe_webhook(request):
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
-    except ValueError:
-        return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError:
+        event = get_gateway().parse_webhook(payload, sig_header)
+    except InvalidWebhook:
         return HttpResponse(status=400)
     
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        
-        purchase = Purchase.objects.filter(
-            stripe_payment_intent_id=payment_intent.id
-        ).first()
-        
-        if purchase:
-            purchase.status = 'completed'
-            purchase.save()
-            
-            CourseEnrollment.objects.get_or_create(
-                student=purchase.student,
-                course=purchase.course,
-                is_active=True
-            )
-            
-            Transaction.objects.create(
-                purchase=purchase,
-                transaction_type='purchase',
-                amount=purchase.amount,
-                stripe_charge_id=payment_intent.get('latest_charge'),
-                description=f'Purchase of {purchase.course.title}'
-            )
+    # Store the event and acknowledge at once; fulfilment happens in the
+    # webhook workers, and Stripe redeliveries are deduplicated by event id.
+    store_event(event)
+    transaction.on_commit(webhook_drainer.wake)
     
     return HttpResponse(status=200)
 
@@ -130,4 +96,9 @@ def payment_success(request, course_id):
 @login_required
 def payment_history(request):
     purchases = Purchase.objects.filter(student=request.user).select_related('course')
-    return render(request, 'payments/history.html', {'purchases': purchases})
+    paginator = KeysetPaginator(purchases, 20, ordering=('-created_at', '-id'))
+    page_obj = paginator.get_page(request.GET)
+    return render(request, 'payments/history.html', {
+        'purchases': page_obj,
+        'page_obj': page_obj
+    })
@@ -0,0 +1,171 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import WebhookEvent
+from .services import fail_purchase, fulfil_purchase
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_BATCH_SIZE = 50
+WEBHOOK_MAX_ATTEMPTS = 8
+# How long a claimed batch stays with one worker before others may retry it.
+WEBHOOK_LEASE = timedelta(minutes=5)
+WEBHOOK_WORKERS = getattr(settings, 'STRIPE_WEBHOOK_WORKERS', 2)
+
+
+def store_event(event):
+    """
+    Add a verified Stripe event (the decoded JSON body) to the inbox with a single INSERT.
+    Redeliveries of an event that is already stored are dropped by the
+    unique event id.
+    """
+    WebhookEvent.objects.bulk_create([
+        WebhookEvent(
+            event_id=event['id'],
+            event_type=event['type'],
+            payload=event['data']['object'],
+            available_at=timezone.now(),
+        )
+    ], ignore_conflicts=True)
+
+
+def _handle_payment_intent_succeeded(payload):
+    fulfil_purchase(payload['id'], charge_id=payload.get('latest_charge'),
+                    payment_method=(payload.get('payment_method_types') or [None])[0])
+
+
+def _handle_payment_intent_canceled(payload):
+    fail_purchase(payload['id'])
+
+
+HANDLERS = {
+    'payment_intent.succeeded': _handle_payment_intent_succeeded,
+    'payment_intent.canceled': _handle_payment_intent_canceled,
+}
+
+
+def claim_batch(size=WEBHOOK_BATCH_SIZE, now=None):
+    """
+    Lease up to ``size`` due events to the calling worker, oldest first.
+    Rows locked by another worker are skipped where the database supports
+    it; expired leases of crashed workers are picked up again.
+    """
+    now = now or timezone.now()
+    due = Q(status='pending', available_at__lte=now) | Q(status='processing', locked_until__lt=now)
+    lease_until = now + WEBHOOK_LEASE
+    with transaction.atomic():
+        ids = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True).filter(due)
+            .order_by('available_at', 'id').values_list('id', flat=True)[:size]
+        )
+        # Re-checking ``due`` keeps the claim exclusive on databases without
+        # row locks: a second worker that read the same ids updates nothing.
+        WebhookEvent.objects.filter(due, id__in=ids).update(
+            status='processing', locked_until=lease_until, attempts=F('attempts') + 1
+        )
+    return list(
+        WebhookEvent.objects.filter(id__in=ids, status='processing', locked_until=lease_until)
+        .order_by('available_at', 'id')
+    )
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 60 * 60))
+
+
+def process_batch(size=WEBHOOK_BATCH_SIZE):
+    """
+    Claim and handle one batch. Each event runs in its own transaction and
+    the handlers are idempotent, so a redelivered or re-leased event is
+    harmless. Finished events are marked with one UPDATE. Returns the number
+    of events claimed.
+    """
+    events = claim_batch(size)
+    done = []
+    for event in events:
+        handler = HANDLERS.get(event.event_type)
+        try:
+            if handler is not None:
+                handler(event.payload)
+        except Exception as exc:
+            logger.exception('Processing webhook event %s failed', event.event_id)
+            give_up = event.attempts >= WEBHOOK_MAX_ATTEMPTS
+            WebhookEvent.objects.filter(pk=event.pk).update(
+                status='failed' if give_up else 'pending',
+                available_at=timezone.now() + _retry_delay(event.attempts),
+                locked_until=None,
+                last_error=f'{type(exc).__name__}: {exc}',
+            )
+        else:
+            done.append(event.pk)
+    if done:
+        WebhookEvent.objects.filter(pk__in=done).update(
+            status='done', processed_at=timezone.now(), locked_until=None, last_error=''
+        )
+    return len(events)
+
+
+def drain(size=WEBHOOK_BATCH_SIZE):
+    """Process batches until no event is due. Returns the number of events handled."""
+    handled = 0
+    while True:
+        claimed = process_batch(size)
+        if not claimed:
+            return handled
+        handled += claimed
+
+
+class WebhookDrainer:
+    """
+    Per-process pool that empties the inbox right after the webhook view
+    stores an event, with up to ``workers`` batches in flight. Wake-ups that
+    arrive while every worker is busy are folded into the running drains.
+    The process_webhooks command runs the same loop from cron or as a
+    dedicated worker.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._running = 0
+        self._pending = False
+
+    def wake(self):
+        if self.workers <= 0:
+            return
+        with self._lock:
+            self._pending = True
+            if self._running >= self.workers:
+                return
+            self._running += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='webhooks')
+            executor = self._executor
+        executor.submit(self._run)
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    self._pending = False
+                try:
+                    drain()
+                except Exception:
+                    logger.exception('Draining the webhook inbox failed')
+                with self._lock:
+                    if not self._pending:
+                        self._running -= 1
+                        return
+        finally:
+            connection.close()
+
+
+webhook_drainer = WebhookDrainer(WEBHOOK_WORKERS)
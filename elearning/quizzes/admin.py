@@ -14,8 +14,8 @@ class QuestionAdmin(admin.ModelAdmin):
 
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
-    list_display = ['title', 'video', 'pass_percentage', 'time_limit', 'is_active']
-    list_filter = ['is_active', 'created_at']
+    list_display = ['title', 'video', 'pass_percentage', 'time_limit', 'deadline', 'is_active', 'is_open', 'shuffle_answers']
+    list_filter = ['is_active', 'is_open', 'created_at']
     search_fields = ['title', 'video__title']
 
 @admin.register(QuizAttempt)
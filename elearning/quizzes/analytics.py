@@ -0,0 +1,225 @@
+from itertools import chain
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max, Value
+from django.db.models.functions import Coalesce
+
+from .grading import get_answer_key
+from .models import Question, QuizAttempt, StudentAnswer
+
+ANALYSIS_CACHE_TIMEOUT = 60 * 60 * 24
+HISTOGRAM_BINS = 10
+# Upper/lower groups for the discrimination index (Kelley's 27%).
+GROUP_FRACTION = 0.27
+
+
+def _attempts_marker(quiz):
+    """
+    ``(count, last id)`` of the quiz's finished attempts. It changes whenever
+    an attempt is added or deleted, so it versions the cached analysis
+    without any write on the submission path.
+    """
+    marker = QuizAttempt.objects.filter(quiz=quiz, completed_at__isnull=False).aggregate(
+        count=Count('id'), last=Max('id')
+    )
+    return marker['count'], marker['last'] or 0
+
+
+def _answer_matrix(quiz, after_id):
+    """
+    One query over StudentAnswer for the quiz's attempts with id > after_id,
+    straight from the cursor into an (n, 3) int64 array of attempt id,
+    question id and selected answer id (0 when unanswered).
+    """
+    queryset = StudentAnswer.objects.filter(
+        attempt__quiz=quiz, attempt_id__gt=after_id
+    ).values_list('attempt_id', 'question_id', Coalesce('selected_answer_id', Value(0)))
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 3)
+    return flat.reshape(-1, 3)
+
+
+def _positions(sorted_values, values):
+    """Index of each of ``values`` in ``sorted_values`` and a mask of those found."""
+    if not sorted_values.size:
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_values, values), sorted_values.size - 1)
+    return positions, sorted_values[positions] == values
+
+
+def _empty_state(question_ids):
+    width = len(question_ids)
+    return {
+        'question_ids': question_ids,
+        'last_id': 0,
+        'attempt_ids': np.empty(0, dtype=np.int64),
+        'percentages': np.empty(0, dtype=np.float64),
+        'correct': np.packbits(np.zeros((0, width), dtype=bool), axis=1),
+        'answered': np.packbits(np.zeros((0, width), dtype=bool), axis=1),
+        'picks': {},
+    }
+
+
+def _extend_state(quiz, state, correct_ids):
+    """
+    Fold attempts newer than ``state['last_id']`` into the state: their
+    percentages plus one row each in the bit-packed correct/answered
+    attempt x question matrices, and per-option pick counts.
+    """
+    attempts = list(QuizAttempt.objects.filter(
+        quiz=quiz, completed_at__isnull=False, id__gt=state['last_id']
+    ).order_by('id').values_list('id', 'percentage'))
+    if not attempts:
+        return state
+
+    new_ids = np.fromiter((attempt_id for attempt_id, _ in attempts), dtype=np.int64, count=len(attempts))
+    matrix = _answer_matrix(quiz, state['last_id'])
+    rows, known_attempt = _positions(new_ids, matrix[:, 0])
+    question_ids = state['question_ids']
+    order = np.argsort(question_ids)
+    columns, known_question = _positions(question_ids[order], matrix[:, 1])
+    # Answers to since-deleted questions, or to attempts committed after we
+    # read the attempt list, are left out.
+    keep = known_attempt & known_question
+    rows, columns, selected = rows[keep], order[columns[keep]], matrix[keep, 2]
+
+    width = len(question_ids)
+    correct = np.zeros((len(new_ids), width), dtype=bool)
+    hits = np.isin(selected, correct_ids)
+    correct[rows[hits], columns[hits]] = True
+    answered = np.zeros((len(new_ids), width), dtype=bool)
+    answered[rows, columns] = selected > 0
+
+    picks = dict(state['picks'])
+    options, counts = np.unique(selected[selected > 0], return_counts=True)
+    for option, count in zip(options.tolist(), counts.tolist()):
+        picks[option] = picks.get(option, 0) + count
+
+    return {
+        'question_ids': question_ids,
+        'last_id': int(new_ids[-1]),
+        'attempt_ids': np.concatenate([state['attempt_ids'], new_ids]),
+        'percentages': np.concatenate([
+            state['percentages'],
+            np.fromiter((percentage for _, percentage in attempts), dtype=np.float64, count=len(attempts)),
+        ]),
+        'correct': np.concatenate([state['correct'], np.packbits(correct, axis=1)]),
+        'answered': np.concatenate([state['answered'], np.packbits(answered, axis=1)]),
+        'picks': picks,
+    }
+
+
+def load_attempt_state(quiz, questions, key):
+    """
+    The cached attempt x question state for ``quiz``, brought up to date
+    with only the attempts added since it was last built. It is rebuilt from
+    scratch when the questions change or attempts have been deleted.
+    """
+    question_ids = np.array([question.id for question in questions], dtype=np.int64)
+    cache_key = f'quiz-attempt-state:{quiz.pk}:{quiz.answer_key_version}'
+    state = cache.get(cache_key)
+    if state is None or not np.array_equal(state['question_ids'], question_ids):
+        state = _empty_state(question_ids)
+
+    correct_ids = np.fromiter(key.correct_answers, dtype=np.int64, count=len(key.correct_answers))
+    extended = _extend_state(quiz, state, correct_ids)
+    total = QuizAttempt.objects.filter(quiz=quiz, completed_at__isnull=False).count()
+    if total != len(extended['attempt_ids']):
+        extended = _extend_state(quiz, _empty_state(question_ids), correct_ids)
+    if extended is not state:
+        cache.set(cache_key, extended, ANALYSIS_CACHE_TIMEOUT)
+    return extended
+
+
+def _rate(numerator, denominator):
+    return float(numerator) / denominator if denominator else 0.0
+
+
+def compute_item_analysis(quiz):
+    """
+    Item analysis for ``quiz`` from the attempt x question matrix:
+
+    * difficulty: share of attempts that answered the question correctly
+      (unanswered counts as wrong), so lower means harder;
+    * discrimination: difficulty in the top 27% of attempts by score minus
+      difficulty in the bottom 27%;
+    * selection rate of every option, distractors included;
+    * a histogram of attempt percentages.
+    """
+    key = get_answer_key(quiz)
+    questions = list(
+        Question.objects.filter(video_id=quiz.video_id).prefetch_related('answers').order_by('order', 'id')
+    )
+    state = load_attempt_state(quiz, questions, key)
+    width = len(questions)
+    attempts = len(state['attempt_ids'])
+    correct = np.unpackbits(state['correct'], axis=1, count=width).astype(np.float64)
+    answered = np.unpackbits(state['answered'], axis=1, count=width)
+    percentages = state['percentages']
+
+    counts, edges = np.histogram(percentages, bins=HISTOGRAM_BINS, range=(0, 100))
+    peak = counts.max()
+    histogram = [
+        {'label': f'{int(low)}–{int(high)}%', 'count': int(count), 'height': _rate(count * 100, peak)}
+        for low, high, count in zip(edges[:-1], edges[1:], counts)
+    ]
+
+    if attempts:
+        points = np.array([key.question_points.get(question.id, 0) for question in questions], dtype=np.float64)
+        order = np.argsort(correct @ points, kind='stable')
+        group = max(1, int(round(attempts * GROUP_FRACTION)))
+        difficulty = correct.mean(axis=0)
+        answered_rate = answered.mean(axis=0)
+        if attempts >= 2:
+            discrimination = correct[order[-group:]].mean(axis=0) - correct[order[:group]].mean(axis=0)
+        else:
+            discrimination = np.zeros(width)
+    else:
+        difficulty = answered_rate = discrimination = np.zeros(width)
+
+    picks = state['picks']
+    items = []
+    for column, question in enumerate(questions):
+        items.append({
+            'text': question.question_text,
+            'points': question.points,
+            'difficulty': float(difficulty[column]) * 100,
+            'discrimination': float(discrimination[column]),
+            'answered_rate': float(answered_rate[column]) * 100,
+            'options': [
+                {
+                    'text': answer.answer_text,
+                    'is_correct': answer.is_correct,
+                    'rate': _rate(picks.get(answer.id, 0) * 100, attempts),
+                }
+                for answer in question.answers.all()
+            ],
+        })
+
+    return {
+        'attempts': attempts,
+        'mean': float(percentages.mean()) if attempts else 0.0,
+        'median': float(np.median(percentages)) if attempts else 0.0,
+        'pass_rate': _rate((percentages >= quiz.pass_percentage).sum() * 100, attempts),
+        'histogram': histogram,
+        'items': items,
+    }
+
+
+def get_item_analysis(quiz):
+    """
+    Cached compute_item_analysis. A new attempt invalidates the result, and
+    recomputing it only reads the attempts added since the last run.
+    """
+    count, last_id = _attempts_marker(quiz)
+    cache_key = f'quiz-item-analysis:{quiz.pk}:{quiz.answer_key_version}:{count}:{last_id}'
+    analysis = cache.get(cache_key)
+    if analysis is None:
+        analysis = compute_item_analysis(quiz)
+        cache.set(cache_key, analysis, ANALYSIS_CACHE_TIMEOUT)
+    return analysis
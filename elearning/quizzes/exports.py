@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from .models import QuizAttempt, StudentAnswer
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_CHUNK_SIZE = 500
+# Rows per string handed to the response, so each write is a few hundred KB
+# rather than one tiny chunk per answer.
+ROWS_PER_WRITE = 1000
+
+ATTEMPT_COLUMNS = (
+    ('attempt_id', 'id'),
+    ('course_id', 'video__unit__course_id'),
+    ('unit_id', 'video__unit_id'),
+    ('quiz_id', 'quiz_id'),
+    ('quiz_title', 'quiz__title'),
+    ('student_id', 'student_id'),
+    ('student_username', 'student__username'),
+    ('started_at', 'started_at'),
+    ('completed_at', 'completed_at'),
+    ('score', 'score'),
+    ('total_points', 'total_points'),
+    ('percentage', 'percentage'),
+    ('is_passed', 'is_passed'),
+    ('time_taken', 'time_taken'),
+)
+ANSWER_COLUMNS = ('question_id', 'selected_answer_id', 'is_correct', 'points_earned')
+EXPORT_HEADER = [name for name, _ in ATTEMPT_COLUMNS] + list(ANSWER_COLUMNS)
+NO_ANSWER = (None,) * len(ANSWER_COLUMNS)
+
+
+def filter_attempts(course_id=None, unit_id=None, quiz_id=None, tutor=None):
+    attempts = QuizAttempt.objects.all()
+    if course_id is not None:
+        attempts = attempts.filter(video__unit__course_id=course_id)
+    if unit_id is not None:
+        attempts = attempts.filter(video__unit_id=unit_id)
+    if quiz_id is not None:
+        attempts = attempts.filter(quiz_id=quiz_id)
+    if tutor is not None:
+        attempts = attempts.filter(video__unit__course__tutor=tutor)
+    return attempts
+
+
+def _plain(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_rows(attempts, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield ``(attempt_values, answer_values)`` for every answer of
+    ``attempts``, and once with NO_ANSWER for attempts without answers.
+
+    Attempts stream off ``.iterator(chunk_size=...)`` in primary key order;
+    each chunk's answers are fetched with one ``attempt_id IN (...)`` query.
+    Attempt columns are converted once per attempt instead of once per
+    answer row, and memory is bounded by a single chunk.
+    """
+    stream = attempts.order_by('id').values_list(
+        *(lookup for _, lookup in ATTEMPT_COLUMNS)
+    ).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(stream, chunk_size))
+        if not chunk:
+            return
+        answers = {}
+        for attempt_id, *values in StudentAnswer.objects.filter(
+            attempt_id__in=[row[0] for row in chunk]
+        ).order_by('attempt_id', 'id').values_list('attempt_id', *ANSWER_COLUMNS):
+            answers.setdefault(attempt_id, []).append(values)
+        for row in chunk:
+            attempt = [_plain(value) for value in row]
+            for values in answers.get(row[0]) or (NO_ANSWER,):
+                yield attempt, values
+
+
+def iter_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for count, (attempt, answer) in enumerate(rows, start=1):
+        writer.writerow(attempt + list(answer))
+        if count % ROWS_PER_WRITE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(rows):
+    lines = []
+    for attempt, answer in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_HEADER, attempt + list(answer)))))
+        if len(lines) == ROWS_PER_WRITE:
+            lines.append('')
+            yield '\n'.join(lines)
+            lines = []
+    if lines:
+        lines.append('')
+        yield '\n'.join(lines)
+
+
+def stream_export(attempts, export_format='csv'):
+    """Lazily render ``attempts`` and their answers as CSV or JSON Lines text chunks."""
+    rows = export_rows(attempts)
+    return iter_jsonl(rows) if export_format == 'jsonl' else iter_csv(rows)
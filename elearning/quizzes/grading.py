@@ -0,0 +1,180 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Answer, Question, QuizAttempt, StudentAnswer
+
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_ANSWER_KEYS = getattr(settings, 'QUIZ_ANSWER_KEY_LRU_SIZE', 256)
+
+# question_points: {question_id: points}; answer_questions: {answer_id: question_id};
+# correct_answers: frozenset of correct answer ids.
+AnswerKey = namedtuple('AnswerKey', 'question_points answer_questions correct_answers total_points')
+
+
+class LocalKeyCache:
+    """
+    Small per-process LRU for data compiled from a quiz, such as answer keys
+    and papers. Keys include a version (e.g. (quiz_id, answer_key_version)),
+    so a bumped version simply misses and old entries age out. One loader per
+    key at a time: concurrent requests for a cold quiz wait for the first
+    load instead of all hitting the database.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def loader_lock(self, key):
+        with self._lock:
+            lock = self._loading.get(key)
+            if lock is None:
+                lock = self._loading[key] = threading.Lock()
+            return lock
+
+    def release_loader(self, key):
+        with self._lock:
+            self._loading.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_answer_keys = LocalKeyCache(LOCAL_ANSWER_KEYS)
+
+
+def bump_answer_key_version(quizzes):
+    """Invalidate cached answer keys for ``quizzes`` (a queryset)."""
+    quizzes.update(answer_key_version=F('answer_key_version') + 1)
+
+
+def load_answer_key(quiz):
+    """Compile the answer key of ``quiz`` from the database in two queries."""
+    question_points = dict(
+        Question.objects.filter(video_id=quiz.video_id).values_list('id', 'points')
+    )
+    answer_questions = {}
+    correct_answers = set()
+    for answer_id, question_id, is_correct in Answer.objects.filter(
+        question__video_id=quiz.video_id
+    ).values_list('id', 'question_id', 'is_correct'):
+        answer_questions[answer_id] = question_id
+        if is_correct:
+            correct_answers.add(answer_id)
+    return AnswerKey(
+        question_points, answer_questions, frozenset(correct_answers), sum(question_points.values())
+    )
+
+
+def get_answer_key(quiz):
+    """
+    The compiled answer key for ``quiz``: process LRU, then the shared cache,
+    then the database. ``quiz.answer_key_version`` comes with the quiz row
+    itself, so a warm lookup costs no queries.
+    """
+    version_key = (quiz.pk, quiz.answer_key_version)
+    key = local_answer_keys.get(version_key)
+    if key is not None:
+        return key
+
+    lock = local_answer_keys.loader_lock(version_key)
+    try:
+        with lock:
+            key = local_answer_keys.get(version_key)
+            if key is None:
+                cache_key = f'quiz-answer-key:{quiz.pk}:{quiz.answer_key_version}'
+                cached = cache.get(cache_key)
+                if cached is None:
+                    key = load_answer_key(quiz)
+                    cache.set(cache_key, tuple(key), ANSWER_KEY_CACHE_TIMEOUT)
+                else:
+                    key = AnswerKey(*cached)
+                local_answer_keys.set(version_key, key)
+    finally:
+        local_answer_keys.release_loader(version_key)
+    return key
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_answers(answer_key, submitted):
+    """
+    Grade ``submitted`` (``[{'question_id': .., 'answer_id': ..}, ...]``)
+    against ``answer_key`` in memory. Questions outside the quiz, answers
+    that belong to another question and repeated questions are ignored.
+    Returns ``(graded, score, total_points)`` where ``graded`` holds
+    ``(question_id, answer_id, is_correct, points_earned)`` tuples.
+    """
+    graded = []
+    seen = set()
+    score = 0
+    for item in submitted:
+        if not isinstance(item, dict):
+            continue
+        question_id = _as_id(item.get('question_id'))
+        answer_id = _as_id(item.get('answer_id'))
+        if question_id in seen or answer_key.answer_questions.get(answer_id) != question_id:
+            continue
+        seen.add(question_id)
+        is_correct = answer_id in answer_key.correct_answers
+        points_earned = answer_key.question_points[question_id] if is_correct else 0
+        score += points_earned
+        graded.append((question_id, answer_id, is_correct, points_earned))
+
+    return graded, score, answer_key.total_points
+
+
+def record_attempt(student, quiz, answer_key, submitted):
+    """Grade a submission and store the finished attempt with its answers atomically."""
+    graded, score, total_points = grade_answers(answer_key, submitted)
+    percentage = (score / total_points * 100) if total_points > 0 else 0
+
+    with transaction.atomic():
+        attempt = QuizAttempt.objects.create(
+            student=student,
+            quiz=quiz,
+            video=quiz.video,
+            score=score,
+            total_points=total_points,
+            percentage=percentage,
+            is_passed=percentage >= quiz.pass_percentage,
+            completed_at=timezone.now(),
+        )
+        StudentAnswer.objects.bulk_create([
+            StudentAnswer(
+                attempt=attempt,
+                question_id=question_id,
+                selected_answer_id=answer_id,
+                is_correct=is_correct,
+                points_earned=points_earned,
+            )
+            for question_id, answer_id, is_correct, points_earned in graded
+        ])
+    return attempt
@@ -0,0 +1,322 @@
+import csv
+import io
+import json
+import os
+import re
+
+from django.db import transaction
+from django.db.models import Max
+
+from .grading import bump_answer_key_version
+from .models import Answer, Question, Quiz
+
+MAX_IMPORT_QUESTIONS = 2000
+MAX_IMPORT_BYTES = 5 * 1024 * 1024
+FORMATS = ('csv', 'json', 'gift')
+
+QUESTION_TYPES = {value for value, _ in Question.QUESTION_TYPES}
+ANSWER_MAX_LENGTH = Answer._meta.get_field('answer_text').max_length
+TRUE_FALSE_ANSWERS = ('True', 'False')
+
+
+class QuestionImportError(Exception):
+    """Raised with the per-row ``errors`` when a file cannot be imported."""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} problem(s) found')
+        self.errors = errors
+
+
+def _question(row, text, answers, question_type='mcq', points=1):
+    return {'row': row, 'text': text, 'type': question_type, 'points': points, 'answers': answers}
+
+
+def _positive_int(value):
+    """``value`` as an int of at least 1, or None. Bools and fractions are refused, not truncated."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, str):
+        try:
+            value = int(value.strip())
+        except ValueError:
+            return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        return None
+    return value
+
+
+def detect_format(filename, requested=''):
+    if requested:
+        return requested.lower()
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension in ('txt', 'gift'):
+        return 'gift'
+    return extension
+
+
+# CSV: question,type,points,correct,answer1,answer2,...
+# "correct" lists the right options by number or letter ("2", "A;C"), or
+# "true"/"false" for true_false questions, which need no answer columns.
+
+def _correct_positions(value, count):
+    positions = set()
+    for token in re.split(r'[;,|\s]+', value.strip()):
+        if not token:
+            continue
+        if token.isdigit():
+            positions.add(int(token) - 1)
+        elif len(token) == 1 and token.isalpha():
+            positions.add(ord(token.upper()) - ord('A'))
+        else:
+            raise ValueError(f'cannot read correct option "{token}"')
+    if any(position < 0 or position >= count for position in positions):
+        raise ValueError('correct option is out of range')
+    return positions
+
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    fields = [name.strip().lower() for name in reader.fieldnames or []]
+    reader.fieldnames = fields
+    if 'question' not in fields:
+        return [], [(1, 'CSV header must include a "question" column')]
+    answer_columns = [name for name in fields if name.startswith('answer')]
+
+    questions, errors = [], []
+    for row_number, row in enumerate(reader, start=2):
+        text = (row.get('question') or '').strip()
+        question_type = (row.get('type') or 'mcq').strip().lower() or 'mcq'
+        correct = (row.get('correct') or '').strip()
+        answers = [(row.get(column) or '').strip() for column in answer_columns]
+        answers = [answer for answer in answers if answer]
+        if question_type == 'true_false' and not answers:
+            if correct.lower() not in ('true', 'false', 't', 'f'):
+                errors.append((row_number, 'true_false questions need "true" or "false" as the correct value'))
+                continue
+            is_true = correct.lower() in ('true', 't')
+            parsed = [(TRUE_FALSE_ANSWERS[0], is_true), (TRUE_FALSE_ANSWERS[1], not is_true)]
+        else:
+            try:
+                positions = _correct_positions(correct, len(answers))
+            except ValueError as exc:
+                errors.append((row_number, str(exc)))
+                continue
+            parsed = [(answer, index in positions) for index, answer in enumerate(answers)]
+        questions.append(_question(row_number, text, parsed, question_type, (row.get('points') or '1').strip()))
+    return questions, errors
+
+
+# JSON: [{"question": "...", "type": "mcq", "points": 1,
+#         "answers": [{"text": "...", "correct": true}, ...]}, ...]
+# or the same list under a top-level "questions" key.
+
+def parse_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError as exc:
+        return [], [(1, f'invalid JSON: {exc}')]
+    if isinstance(data, dict):
+        data = data.get('questions')
+    if not isinstance(data, list):
+        return [], [(1, 'expected a list of questions')]
+
+    questions, errors = [], []
+    for index, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            errors.append((index, 'each question must be an object'))
+            continue
+        answers = []
+        for answer in item.get('answers') or []:
+            if isinstance(answer, dict):
+                answers.append((str(answer.get('text', '')).strip(), bool(answer.get('correct'))))
+            else:
+                answers.append((str(answer).strip(), False))
+        questions.append(_question(
+            index,
+            str(item.get('question', '')).strip(),
+            answers,
+            str(item.get('type') or 'mcq').strip().lower(),
+            item.get('points', 1),
+        ))
+    return questions, errors
+
+
+# GIFT (Moodle): multiple choice "{=right ~wrong}", multiple answers with
+# positive "~%50%" weights, and true/false "{T}" / "{F}". Other GIFT question
+# types are reported as errors.
+
+_GIFT_SPECIAL = re.compile(r'\\([~=#{}:\\])')
+
+
+def _gift_unescape(value):
+    return _GIFT_SPECIAL.sub(r'\1', value).strip()
+
+
+def _gift_split(body):
+    """Split an answer block into (marker, text) pairs on unescaped ~ and =."""
+    parts, current, marker, escaped = [], [], None, False
+    for char in body:
+        if escaped:
+            current.append('\\' + char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in '~=':
+            if marker is not None or ''.join(current).strip():
+                parts.append((marker, ''.join(current)))
+            marker, current = char, []
+        else:
+            current.append(char)
+    if marker is not None or ''.join(current).strip():
+        parts.append((marker, ''.join(current)))
+    return parts
+
+
+def _gift_block(lines):
+    block = '\n'.join(lines)
+    match = re.search(r'(?<!\\)\{(.*?)(?<!\\)\}', block, re.S)
+    if not match:
+        raise ValueError('missing answer block {...}')
+    stem = block[:match.start()] + ' ' + block[match.end():]
+    stem = re.sub(r'^\s*::.*?::', '', stem, flags=re.S)
+    stem = re.sub(r'^\s*\[(html|moodle|plain|markdown)\]', '', stem.strip())
+    body = match.group(1).strip()
+
+    if body.upper() in ('T', 'TRUE', 'F', 'FALSE'):
+        is_true = body.upper() in ('T', 'TRUE')
+        answers = [(TRUE_FALSE_ANSWERS[0], is_true), (TRUE_FALSE_ANSWERS[1], not is_true)]
+        return _gift_unescape(stem), answers, 'true_false'
+    if body.startswith('#') or '->' in body:
+        raise ValueError('numeric and matching GIFT questions are not supported')
+
+    answers = []
+    for marker, text in _gift_split(body):
+        if marker is None:
+            raise ValueError('answers must start with = or ~')
+        text = re.split(r'(?<!\\)#', text, maxsplit=1)[0]
+        weight = re.match(r'\s*%(-?\d+(?:\.\d+)?)%', text)
+        if weight:
+            text = text[weight.end():]
+        correct = marker == '=' or bool(weight and float(weight.group(1)) > 0)
+        answers.append((_gift_unescape(text), correct))
+    if all(correct for _, correct in answers):
+        raise ValueError('short-answer GIFT questions are not supported')
+    return _gift_unescape(stem), answers, 'mcq'
+
+
+def parse_gift(text):
+    questions, errors = [], []
+    lines, start = [], None
+
+    def finish():
+        if not lines:
+            return
+        try:
+            stem, answers, question_type = _gift_block(lines)
+        except ValueError as exc:
+            errors.append((start, str(exc)))
+        else:
+            questions.append(_question(start, stem, answers, question_type))
+
+    for number, line in enumerate(text.splitlines(), start=1):
+        stripped = line.strip()
+        if stripped.startswith('//') or stripped.startswith('$CATEGORY'):
+            continue
+        if not stripped:
+            finish()
+            lines, start = [], None
+            continue
+        if start is None:
+            start = number
+        lines.append(line)
+    finish()
+    return questions, errors
+
+
+PARSERS = {'csv': parse_csv, 'json': parse_json, 'gift': parse_gift}
+
+
+def validate_questions(questions):
+    """Normalise parsed questions in place and return per-row errors."""
+    errors = []
+    for question in questions:
+        row = question['row']
+        if not question['text']:
+            errors.append((row, 'question text is empty'))
+        if question['type'] not in QUESTION_TYPES:
+            errors.append((row, f'unknown question type "{question["type"]}"'))
+        points = _positive_int(question['points'])
+        if points is None:
+            errors.append((row, 'points must be a positive integer'))
+        else:
+            question['points'] = points
+        answers = question['answers']
+        if len(answers) < 2:
+            errors.append((row, 'at least two answers are required'))
+        if not any(correct for _, correct in answers):
+            errors.append((row, 'no answer is marked correct'))
+        if question['type'] == 'true_false' and len(answers) != 2:
+            errors.append((row, 'true_false questions need exactly two answers'))
+        for text, _ in answers:
+            if not text:
+                errors.append((row, 'an answer is empty'))
+            elif len(text) > ANSWER_MAX_LENGTH:
+                errors.append((row, f'an answer is longer than {ANSWER_MAX_LENGTH} characters'))
+    return errors
+
+
+def parse_question_file(content, filename='', file_format=''):
+    """
+    Parse and validate an uploaded question bank. Returns the questions or
+    raises QuestionImportError listing every problem, so nothing is saved unless the
+    whole file is clean.
+    """
+    file_format = detect_format(filename, file_format)
+    if file_format not in PARSERS:
+        raise QuestionImportError([(0, f'unsupported format "{file_format}"; use one of {", ".join(FORMATS)}')])
+    if isinstance(content, bytes):
+        if len(content) > MAX_IMPORT_BYTES:
+            raise QuestionImportError([(0, f'file is larger than {MAX_IMPORT_BYTES // (1024 * 1024)} MB')])
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise QuestionImportError([(0, 'file must be UTF-8 encoded')])
+
+    questions, errors = PARSERS[file_format](content)
+    errors += validate_questions(questions)
+    if not questions and not errors:
+        errors.append((0, 'no questions found'))
+    if len(questions) > MAX_IMPORT_QUESTIONS:
+        errors.append((0, f'at most {MAX_IMPORT_QUESTIONS} questions can be imported at once'))
+    if errors:
+        raise QuestionImportError(sorted(errors))
+    return questions
+
+
+def import_questions(quiz, questions):
+    """
+    Insert validated ``questions`` after the quiz's existing ones with two
+    bulk INSERTs in one transaction. Returns the number of questions added.
+    """
+    with transaction.atomic():
+        # Lock the quiz row so concurrent imports do not interleave orders.
+        Quiz.objects.select_for_update().filter(pk=quiz.pk).first()
+        next_order = (Question.objects.filter(video_id=quiz.video_id).aggregate(top=Max('order'))['top'] or 0) + 1
+        created = Question.objects.bulk_create([
+            Question(
+                video_id=quiz.video_id,
+                question_text=question['text'],
+                question_type=question['type'],
+                points=question['points'],
+                order=next_order + index,
+            )
+            for index, question in enumerate(questions)
+        ])
+        Answer.objects.bulk_create([
+            Answer(question=instance, answer_text=text, is_correct=correct, order=position)
+            for instance, question in zip(created, questions)
+            for position, (text, correct) in enumerate(question['answers'])
+        ], batch_size=1000)
+        # bulk_create skips the signals that normally invalidate the answer key.
+        bump_answer_key_version(Quiz.objects.filter(pk=quiz.pk))
+    return len(created)
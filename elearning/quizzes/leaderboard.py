@@ -0,0 +1,443 @@
+import atexit
+import logging
+import random
+import threading
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max
+
+from .models import Leaderboard, LeaderboardVersion, QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+_LOWEST = float('-inf')
+
+
+class _Node:
+    __slots__ = ('key', 'priority', 'size', 'left', 'right')
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _split(node, key):
+    """Split into (keys < key, keys >= key)."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, key)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _remove(node, key):
+    if node is None:
+        return None
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    elif node.key < key:
+        node.right = _remove(node.right, key)
+    else:
+        return _merge(node.left, node.right)
+    _update(node)
+    return node
+
+
+class OrderStatisticTree:
+    """
+    Treap augmented with subtree sizes: insert, remove and "how many keys
+    are smaller" are all O(log n) expected.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self):
+        return _size(self.root)
+
+    def insert(self, key):
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key):
+        self.root = _remove(self.root, key)
+
+    def count_less(self, key):
+        node, count = self.root, 0
+        while node is not None:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def iter_from(self, key):
+        """Yield keys >= ``key`` in order."""
+        stack, node = [], self.root
+        while node is not None:
+            if node.key < key:
+                node = node.right
+            else:
+                stack.append(node)
+                node = node.left
+        while stack:
+            node = stack.pop()
+            yield node.key
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+
+class UnitBoard:
+    """
+    Ranking of one unit's students by total score, highest first. Tied
+    scores share a rank (1, 2, 2, 4). Keys are ``(-score, student_id)``, so a
+    student's rank is one more than the number of strictly higher scores.
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.tree = OrderStatisticTree()
+        self.scores = {}
+        self.row_ids = {}
+        self.flushed = {}
+        for row_id, student_id, score, rank in rows:
+            self.scores[student_id] = score
+            self.row_ids[student_id] = row_id
+            self.flushed[student_id] = rank
+            self.tree.insert((-score, student_id))
+        # Ranks in the table may be stale, so compare everything on the first flush.
+        self.dirty = (_LOWEST, float('inf')) if rows else None
+
+    def _widen(self, low, high):
+        if self.dirty is None:
+            self.dirty = (low, high)
+        else:
+            self.dirty = (min(self.dirty[0], low), max(self.dirty[1], high))
+
+    def set_score(self, row_id, student_id, score):
+        self.row_ids[student_id] = row_id
+        old = self.scores.get(student_id)
+        if old == score:
+            return
+        if old is not None:
+            self.tree.remove((-old, student_id))
+        self.tree.insert((-score, student_id))
+        self.scores[student_id] = score
+        # Only students scoring between the old and new total change rank; a
+        # newcomer pushes down everyone below them.
+        if old is None:
+            self._widen(_LOWEST, score)
+        else:
+            self._widen(min(old, score), max(old, score))
+
+    def rank(self, student_id):
+        score = self.scores.get(student_id)
+        if score is None:
+            return None
+        return self.tree.count_less((-score, _LOWEST)) + 1
+
+    def _ranked(self, keys, first_rank):
+        previous_score, rank = None, first_rank
+        for position, (negative_score, student_id) in enumerate(keys):
+            if previous_score is not None and -negative_score != previous_score:
+                rank = first_rank + position
+            previous_score = -negative_score
+            yield student_id, previous_score, rank
+
+    def top(self, k):
+        """[(student_id, score, rank)] for the best ``k`` students."""
+        return list(self._ranked(islice(self.tree.iter_from((_LOWEST, _LOWEST)), k), 1))
+
+    def take_changes(self):
+        """Students whose rank differs from what was last written, as {student_id: rank}."""
+        if self.dirty is None:
+            return {}
+        low, high = self.dirty
+        self.dirty = None
+        start = (-high, _LOWEST)
+        keys = []
+        for key in self.tree.iter_from(start):
+            if -key[0] < low:
+                break
+            keys.append(key)
+        if not keys:
+            return {}
+        changes = {}
+        for student_id, _, rank in self._ranked(keys, self.tree.count_less((keys[0][0], _LOWEST)) + 1):
+            if self.flushed.get(student_id) != rank:
+                changes[student_id] = rank
+        return changes
+
+    def mark_flushed(self, changes):
+        self.flushed.update(changes)
+
+
+def _current_version(unit_id):
+    """``(version, rebuilt_version)`` of a unit's leaderboard."""
+    return LeaderboardVersion.objects.filter(unit_id=unit_id).values_list(
+        'version', 'rebuilt_version'
+    ).first() or (0, 0)
+
+
+def _lock_unit(unit_id):
+    """
+    Bump the unit's version and hold its row lock until the transaction
+    ends, so score changes in a unit are applied one at a time. Returns the
+    new version.
+    """
+    LeaderboardVersion.objects.get_or_create(unit_id=unit_id)
+    versions = LeaderboardVersion.objects.filter(unit_id=unit_id)
+    versions.update(version=F('version') + 1)
+    return versions.values_list('version', flat=True).get()
+
+
+class LeaderboardEngine:
+    """
+    Per-process ranking engine. Totals in the Leaderboard table are the
+    source of truth; each process keeps an order-statistic tree per unit for
+    rank, top-K and batched rank writes. Every score change bumps the unit's
+    LeaderboardVersion row and stamps the new version on the changed entry,
+    so a process that falls behind only reads the entries changed since its
+    own version. Only a rebuild makes it reload the whole unit.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._boards = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def _board(self, unit_id):
+        version, rebuilt_version = _current_version(unit_id)
+        board = self._boards.get(unit_id)
+        if board is None or board.version < rebuilt_version:
+            rows = Leaderboard.objects.filter(unit_id=unit_id).values_list(
+                'id', 'student_id', 'total_score', 'rank'
+            )
+            board = self._boards[unit_id] = UnitBoard(list(rows), version)
+        elif board.version < version:
+            changed = Leaderboard.objects.filter(unit_id=unit_id, version__gt=board.version).values_list(
+                'id', 'student_id', 'total_score'
+            )
+            for row_id, student_id, total_score in changed:
+                board.set_score(row_id, student_id, total_score)
+            board.version = version
+        return board
+
+    def record(self, unit_id, row_id, student_id, total_score, version):
+        with self._lock:
+            board = self._boards.get(unit_id)
+            if board is not None and board.version == version - 1:
+                board.set_score(row_id, student_id, total_score)
+                board.version = version
+            else:
+                # Other changes came first; read them all from the table.
+                self._board(unit_id)
+        if self.flush_interval <= 0:
+            self.flush()
+        else:
+            self._ensure_timer()
+
+    def rank(self, unit_id, student_id):
+        with self._lock:
+            return self._board(unit_id).rank(student_id)
+
+    def top(self, unit_id, k=10):
+        with self._lock:
+            return self._board(unit_id).top(k)
+
+    def forget(self, unit_ids=None):
+        with self._lock:
+            if unit_ids is None:
+                self._boards.clear()
+            for unit_id in unit_ids or ():
+                self._boards.pop(unit_id, None)
+
+    def _ensure_timer(self):
+        if self._timer is not None and self._timer.is_alive():
+            return
+        self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Leaderboard rank flush failed')
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Write changed ranks with one bulk UPDATE per batch. Returns rows written."""
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._lock:
+                pending = []
+                for board in self._boards.values():
+                    changes = board.take_changes()
+                    if changes:
+                        pending.append((board, changes))
+            rows = [
+                Leaderboard(id=board.row_ids[student_id], rank=rank)
+                for board, changes in pending
+                for student_id, rank in changes.items()
+            ]
+            if rows:
+                try:
+                    Leaderboard.objects.bulk_update(rows, ['rank'], batch_size=500)
+                except Exception:
+                    with self._lock:
+                        for board, _ in pending:
+                            board.dirty = (_LOWEST, float('inf'))
+                    raise
+                with self._lock:
+                    for board, changes in pending:
+                        board.mark_flushed(changes)
+            return len(rows)
+        finally:
+            self._flush_lock.release()
+
+
+leaderboard = LeaderboardEngine(getattr(settings, 'LEADERBOARD_FLUSH_INTERVAL', 5))
+
+
+def record_attempt_score(attempt, unit_id):
+    """
+    Fold a finished attempt into its unit aggregate. Runs after the attempt
+    has committed, so the unit's version row is only locked for this short
+    transaction, not for the whole submission. A student's total is the sum
+    of their best percentage per quiz, so an attempt that does not beat an
+    earlier one is skipped without locking. Otherwise the student's unit
+    total is recomputed from their committed attempts under the lock, which
+    gives the same result whatever order concurrent attempts are scored in.
+    """
+    attempts = QuizAttempt.objects.filter(student_id=attempt.student_id, completed_at__isnull=False)
+    previous_best = attempts.filter(quiz_id=attempt.quiz_id).exclude(pk=attempt.pk).aggregate(
+        best=Max('percentage')
+    )['best']
+    if previous_best is not None and attempt.percentage <= previous_best:
+        return None
+
+    with transaction.atomic():
+        version = _lock_unit(unit_id)
+        best = [
+            row['best'] for row in attempts.filter(video__unit_id=unit_id)
+            .values('quiz_id').annotate(best=Max('percentage')).order_by()
+        ]
+        total_score, total_quizzes = sum(best), len(best)
+        entry, _ = Leaderboard.objects.update_or_create(
+            unit_id=unit_id, student_id=attempt.student_id,
+            defaults={
+                'total_score': total_score,
+                'total_quizzes': total_quizzes,
+                'average_score': total_score / max(total_quizzes, 1),
+                'version': version,
+            },
+        )
+    transaction.on_commit(
+        lambda: leaderboard.record(unit_id, entry.pk, attempt.student_id, total_score, version)
+    )
+    return total_score
+
+
+def rebuild_leaderboards(unit_ids=None):
+    """
+    Recompute aggregates and ranks from QuizAttempt for ``unit_ids`` (or all
+    units) and make every process reload them through ``rebuilt_version``. Returns the number of rows.
+    """
+    attempts = QuizAttempt.objects.filter(completed_at__isnull=False)
+    if unit_ids:
+        attempts = attempts.filter(video__unit_id__in=unit_ids)
+    best = attempts.values('video__unit_id', 'student_id', 'quiz_id').annotate(best=Max('percentage'))
+
+    totals = {}
+    for row in best.iterator():
+        entry = totals.setdefault((row['video__unit_id'], row['student_id']), [0.0, 0])
+        entry[0] += row['best']
+        entry[1] += 1
+
+    by_unit = {}
+    for (unit_id, student_id), (total_score, total_quizzes) in totals.items():
+        by_unit.setdefault(unit_id, []).append((student_id, total_score, total_quizzes))
+
+    rows = []
+    for unit_id, entries in by_unit.items():
+        entries.sort(key=lambda entry: (-entry[1], entry[0]))
+        rank, previous = 0, None
+        for position, (student_id, total_score, total_quizzes) in enumerate(entries, 1):
+            if total_score != previous:
+                rank, previous = position, total_score
+            rows.append(Leaderboard(
+                unit_id=unit_id, student_id=student_id, total_score=total_score,
+                total_quizzes=total_quizzes, average_score=total_score / total_quizzes, rank=rank,
+            ))
+
+    stale = Leaderboard.objects.all()
+    if unit_ids:
+        stale = stale.filter(unit_id__in=unit_ids)
+    with transaction.atomic():
+        rebuilt = set(by_unit) | set(stale.order_by().values_list('unit_id', flat=True).distinct())
+        for unit_id in sorted(rebuilt):
+            _lock_unit(unit_id)
+        LeaderboardVersion.objects.filter(unit_id__in=rebuilt).update(rebuilt_version=F('version'))
+        stale.exclude(unit_id__in=list(by_unit)).delete()
+        for unit_id, entries in by_unit.items():
+            stale.filter(unit_id=unit_id).exclude(
+                student_id__in=[entry[0] for entry in entries]
+            ).delete()
+        Leaderboard.objects.bulk_create(
+            rows, batch_size=500, update_conflicts=True, unique_fields=['unit', 'student'],
+            update_fields=['total_score', 'total_quizzes', 'average_score', 'rank'],
+        )
+
+    leaderboard.forget()
+    return len(rows)
+
+
+def _flush_at_exit():
+    try:
+        leaderboard.flush()
+    except Exception:
+        logger.exception('Leaderboard rank flush at exit failed')
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from elearning.quizzes.exports import EXPORT_FORMATS, filter_attempts, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream quiz attempts joined with their answers as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, dest='course_id')
+        parser.add_argument('--unit', type=int, dest='unit_id')
+        parser.add_argument('--quiz', type=int, dest='quiz_id')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write (default: standard output)')
+
+    def handle(self, *args, **options):
+        attempts = filter_attempts(options['course_id'], options['unit_id'], options['quiz_id'])
+        chunks = stream_export(attempts, options['format'])
+        if not options['output']:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {options["output"]}.'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elearning.quizzes.importers import FORMATS, QuestionImportError, import_questions, parse_question_file
+from elearning.quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Bulk import questions into a quiz from a CSV, JSON or GIFT file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, default='',
+                            help='File format (default: from the file extension)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate the file without saving anything')
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.get(pk=options['quiz_id'])
+        except Quiz.DoesNotExist:
+            raise CommandError(f'Quiz {options["quiz_id"]} does not exist.')
+
+        try:
+            with open(options['path'], 'rb') as handle:
+                content = handle.read()
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["path"]}: {exc}')
+        try:
+            questions = parse_question_file(content, options['path'], options['format'])
+        except QuestionImportError as exc:
+            for row, message in exc.errors:
+                self.stderr.write(f'Row {row}: {message}' if row else message)
+            raise CommandError('Nothing was imported.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{len(questions)} questions are valid.'))
+            return
+        count = import_questions(quiz, questions)
+        self.stdout.write(self.style.SUCCESS(f'Imported {count} questions into "{quiz.title}".'))
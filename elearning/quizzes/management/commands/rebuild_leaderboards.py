@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from elearning.quizzes.leaderboard import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Recompute unit leaderboards (totals and ranks) from quiz attempts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unit', type=int, action='append', dest='unit_ids',
+                            help='Only rebuild the given unit id (repeatable)')
+
+    def handle(self, *args, **options):
+        rows = rebuild_leaderboards(options.get('unit_ids'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} leaderboard entries.'))
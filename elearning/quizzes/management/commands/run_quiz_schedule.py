@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from elearning.quizzes.schedule import REMINDER_WINDOW, send_deadline_reminders, sync_quiz_states
+
+
+class Command(BaseCommand):
+    help = 'Open and close quizzes at their deadlines and send deadline reminder emails (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=int(REMINDER_WINDOW.total_seconds() // 3600),
+                            help='Remind about quizzes closing within this many hours')
+        parser.add_argument('--no-reminders', action='store_true')
+
+    def handle(self, *args, **options):
+        closed = sync_quiz_states()
+        self.stdout.write(f'Closed {closed} quizzes.')
+        if not options['no_reminders']:
+            sent = send_deadline_reminders(window=timedelta(hours=options['hours']))
+            self.stdout.write(f'Sent {sent} reminders.')
+        self.stdout.write(self.style.SUCCESS('Quiz schedule is up to date.'))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_keyset_indexes'),
+        ('quizzes', '0002_quiz_deadline'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', '-started_at', '-id'], name='attempt_quiz_started_idx'),
+        ),
+    ]
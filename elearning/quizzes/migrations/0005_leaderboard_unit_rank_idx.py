@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_video_transcoding'),
+        ('quizzes', '0004_quiz_answer_key_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['unit', 'rank'], name='leaderboard_unit_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_leaderboard_unit_rank_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='shuffle_answers',
+            field=models.BooleanField(default=False, help_text='Show multiple choice options in a different order to each student'),
+        ),
+    ]
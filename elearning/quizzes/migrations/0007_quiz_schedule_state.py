@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:51
+
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def set_open_state(apps, schema_editor):
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    Quiz.objects.exclude(
+        Q(is_active=True) & (Q(deadline__isnull=True) | Q(deadline__gt=timezone.now()))
+    ).update(is_open=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_video_transcoding'),
+        ('quizzes', '0006_quiz_shuffle_answers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='is_open',
+            field=models.BooleanField(default=True, editable=False, help_text='Active and before the deadline; kept up to date by the quiz scheduler'),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['is_active', 'deadline'], name='quiz_active_deadline_idx'),
+        ),
+        migrations.RunPython(set_open_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_video_transcoding'),
+        ('quizzes', '0007_quiz_schedule_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardVersion',
+            fields=[
+                ('unit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_version', serialize=False, to='courses.unit')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('rebuilt_version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='leaderboard',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Unit leaderboard version of the last score change'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['unit', 'version'], name='leaderboard_unit_version_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0008_leaderboard_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='attempt_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bumped for every finished attempt; part of the item analysis cache key'),
+        ),
+    ]
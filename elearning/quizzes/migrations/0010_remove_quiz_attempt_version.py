@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0009_quiz_attempt_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='quiz',
+            name='attempt_version',
+        ),
+    ]
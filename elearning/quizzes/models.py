@@ -43,6 +43,10 @@ class Quiz(models.Model):
     time_limit = models.PositiveIntegerField(default=30, help_text="Time limit in minutes")
     deadline = models.DateTimeField(blank=True, null=True, help_text="Deadline for students to complete quiz")
     is_active = models.BooleanField(default=True)
+    is_open = models.BooleanField(default=True, editable=False, help_text="Active and before the deadline; kept up to date by the quiz scheduler")
+    reminder_sent_at = models.DateTimeField(blank=True, null=True, editable=False)
+    shuffle_answers = models.BooleanField(default=False, help_text="Show multiple choice options in a different order to each student")
+    answer_key_version = models.PositiveIntegerField(default=1, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -50,10 +54,12 @@ class Quiz(models.Model):
         return self.title
     
     def get_total_questions(self):
-        return self.video.questions.count()
+        from .grading import get_answer_key
+        return len(get_answer_key(self).question_points)
     
     def get_total_points(self):
-        return sum(q.points for q in self.video.questions.all())
+        from .grading import get_answer_key
+        return get_answer_key(self).total_points
     
     def is_deadline_passed(self):
         """Check if the quiz deadline has passed"""
@@ -63,11 +69,24 @@ class Quiz(models.Model):
         return timezone.now() > self.deadline
     
     def is_available(self):
-        """Check if quiz is available for students to take"""
-        return self.is_active and not self.is_deadline_passed()
+        """
+        Whether a student may take or submit the quiz: the scheduled is_open
+        state, plus the clock in case the scheduler has not closed the quiz
+        yet. take_quiz and submit_quiz both use it, so they always agree;
+        listings can rely on is_open alone.
+        """
+        return self.is_open and not self.is_deadline_passed()
+    
+    @property
+    def is_expired(self):
+        """Closed by the scheduler because its deadline passed"""
+        return self.is_active and not self.is_open and self.deadline is not None
     
     class Meta:
         verbose_name_plural = 'Quizzes'
+        indexes = [
+            models.Index(fields=['is_active', 'deadline'], name='quiz_active_deadline_idx'),
+        ]
 
 
 class QuizAttempt(models.Model):
@@ -87,6 +106,9 @@ class QuizAttempt(models.Model):
     
     class Meta:
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['quiz', '-started_at', '-id'], name='attempt_quiz_started_idx'),
+        ]
 
 
 class StudentAnswer(models.Model):
@@ -110,6 +132,7 @@ class Leaderboard(models.Model):
     total_quizzes = models.PositiveIntegerField(default=0)
     average_score = models.FloatField(default=0.0)
     rank = models.PositiveIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0, editable=False, help_text="Unit leaderboard version of the last score change")
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
@@ -118,3 +141,21 @@ class Leaderboard(models.Model):
     class Meta:
         unique_together = ['unit', 'student']
         ordering = ['rank']
+        indexes = [
+            models.Index(fields=['unit', 'rank'], name='leaderboard_unit_rank_idx'),
+            models.Index(fields=['unit', 'version'], name='leaderboard_unit_version_idx'),
+        ]
+
+
+class LeaderboardVersion(models.Model):
+    """
+    Change counter for one unit's leaderboard. Score changes bump ``version``
+    and stamp it on the Leaderboard row; a rebuild also moves
+    ``rebuilt_version``, which makes every process reload the whole unit.
+    """
+    unit = models.OneToOneField(Unit, on_delete=models.CASCADE, primary_key=True, related_name='leaderboard_version')
+    version = models.PositiveBigIntegerField(default=0)
+    rebuilt_version = models.PositiveBigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.unit_id} - v{self.version}"
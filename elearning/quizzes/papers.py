@@ -0,0 +1,80 @@
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .grading import LocalKeyCache
+from .models import Answer, Question
+
+PAPER_CACHE_TIMEOUT = 60 * 60 * 24
+LOCAL_PAPERS = getattr(settings, 'QUIZ_PAPER_LRU_SIZE', 256)
+
+local_papers = LocalKeyCache(LOCAL_PAPERS)
+
+
+def load_quiz_paper(quiz):
+    """
+    The questions and answers of ``quiz`` as plain tuples, in two queries and
+    without correctness flags: ``((question_id, text, type, points,
+    ((answer_id, text), ...)), ...)``.
+    """
+    answers = {}
+    for answer_id, question_id, answer_text in Answer.objects.filter(
+        question__video_id=quiz.video_id
+    ).order_by('order', 'id').values_list('id', 'question_id', 'answer_text'):
+        answers.setdefault(question_id, []).append((answer_id, answer_text))
+    return tuple(
+        (question_id, question_text, question_type, points, tuple(answers.get(question_id, ())))
+        for question_id, question_text, question_type, points in Question.objects.filter(
+            video_id=quiz.video_id
+        ).order_by('order', 'id').values_list('id', 'question_text', 'question_type', 'points')
+    )
+
+
+def get_quiz_paper(quiz):
+    """
+    The cached paper for the quiz's current ``answer_key_version``, which is
+    bumped on every question or answer change: process LRU, then the shared
+    cache, then the database, with one loader per quiz version at a time.
+    """
+    version_key = (quiz.pk, quiz.answer_key_version)
+    paper = local_papers.get(version_key)
+    if paper is not None:
+        return paper
+
+    lock = local_papers.loader_lock(version_key)
+    try:
+        with lock:
+            paper = local_papers.get(version_key)
+            if paper is None:
+                cache_key = f'quiz-paper:{quiz.pk}:{quiz.answer_key_version}'
+                paper = cache.get(cache_key)
+                if paper is None:
+                    paper = load_quiz_paper(quiz)
+                    cache.set(cache_key, paper, PAPER_CACHE_TIMEOUT)
+                local_papers.set(version_key, paper)
+    finally:
+        local_papers.release_loader(version_key)
+    return paper
+
+
+def student_paper(quiz, student):
+    """
+    The quiz as ``student`` sees it, ready for the template. With
+    ``quiz.shuffle_answers`` the options of multiple choice questions are
+    shuffled by a seed derived from the quiz and the student, so a student
+    gets the same order on every reload while the cached paper is shared.
+    """
+    rng = random.Random(f'{quiz.pk}:{student.pk}') if quiz.shuffle_answers else None
+    questions = []
+    for question_id, question_text, question_type, points, answers in get_quiz_paper(quiz):
+        answers = list(answers)
+        if rng is not None and question_type == 'mcq':
+            rng.shuffle(answers)
+        questions.append({
+            'id': question_id,
+            'question_text': question_text,
+            'points': points,
+            'answers': [{'id': answer_id, 'answer_text': answer_text} for answer_id, answer_text in answers],
+        })
+    return questions
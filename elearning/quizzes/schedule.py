@@ -0,0 +1,131 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Min, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from elearning.courses.models import CourseEnrollment
+from .models import Quiz, QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+NEXT_TRANSITION_KEY = 'quiz-schedule:next-transition'
+# Longest time between two state checks even when no deadline is coming up,
+# so quizzes changed with queryset.update() are picked up eventually.
+MAX_TRANSITION_WAIT = 60 * 10
+REMINDER_WINDOW = timedelta(hours=getattr(settings, 'QUIZ_REMINDER_HOURS', 24))
+REMINDER_BATCH_SIZE = getattr(settings, 'QUIZ_REMINDER_BATCH_SIZE', 100)
+
+
+def _open_at(now):
+    return Q(is_active=True) & (Q(deadline__isnull=True) | Q(deadline__gt=now))
+
+
+def sync_quiz_states(now=None):
+    """
+    Move quizzes between open and closed with three UPDATEs over the
+    (is_active, deadline) index. Returns the number of quizzes closed.
+    """
+    now = now or timezone.now()
+    closed = Quiz.objects.filter(is_open=True).exclude(_open_at(now)).update(is_open=False)
+    Quiz.objects.filter(_open_at(now), is_open=False).update(is_open=True)
+    return closed
+
+
+def run_due_transitions(now=None):
+    """
+    Close quizzes whose deadline has been reached. The time of the next
+    deadline lives in the shared cache, so until then this is a single
+    cache read; only the first caller past a deadline touches the database.
+    """
+    now = now or timezone.now()
+    due = cache.get(NEXT_TRANSITION_KEY)
+    if due is not None and now.timestamp() < due:
+        return 0
+    closed = sync_quiz_states(now)
+    upcoming = Quiz.objects.filter(is_active=True, deadline__gt=now).aggregate(next=Min('deadline'))['next']
+    next_check = now.timestamp() + MAX_TRANSITION_WAIT
+    if upcoming is not None:
+        next_check = min(next_check, upcoming.timestamp())
+    cache.set(NEXT_TRANSITION_KEY, next_check, None)
+    return closed
+
+
+def reschedule():
+    """Forget the cached next deadline; called when a quiz's schedule changes."""
+    cache.delete(NEXT_TRANSITION_KEY)
+
+
+def open_quizzes_for(student, limit=None):
+    """
+    Quizzes open right now in the courses ``student`` is actively enrolled
+    in and has not completed yet, soonest deadline first.
+    """
+    now = timezone.now()
+    quizzes = Quiz.objects.filter(
+        _open_at(now),
+        video__unit__course__in=CourseEnrollment.objects.filter(
+            student=student, is_active=True
+        ).values('course_id'),
+    ).exclude(
+        id__in=QuizAttempt.objects.filter(
+            student=student, completed_at__isnull=False
+        ).values('quiz_id')
+    ).select_related('video__unit__course').order_by(F('deadline').asc(nulls_last=True), 'id')
+    return quizzes[:limit] if limit else quizzes
+
+
+def _reminder(quiz, email, name):
+    course = quiz.video.unit.course
+    closes = timezone.localtime(quiz.deadline).strftime('%B %d, %Y %H:%M')
+    link = settings.SITE_URL.rstrip('/') + reverse('take_quiz', args=[quiz.id])
+    return EmailMessage(
+        subject=f'Reminder: "{quiz.title}" closes {closes}',
+        body=(
+            f'Hi {name},\n\n'
+            f'The quiz "{quiz.title}" in {course.title} closes on {closes} '
+            f'and you have not completed it yet.\n\n{link}\n'
+        ),
+        to=[email],
+    )
+
+
+def send_deadline_reminders(now=None, window=REMINDER_WINDOW, batch_size=REMINDER_BATCH_SIZE):
+    """
+    Email every enrolled student who has not completed a quiz closing within
+    ``window``. Each quiz is claimed with a conditional UPDATE first, so
+    concurrent runs never remind twice. Messages go out ``batch_size`` at a
+    time over one mail connection. Returns the number of emails sent.
+    """
+    now = now or timezone.now()
+    quizzes = Quiz.objects.filter(
+        is_active=True, deadline__gt=now, deadline__lte=now + window, reminder_sent_at__isnull=True
+    ).select_related('video__unit__course')
+
+    sent = 0
+    with get_connection() as mail:
+        for quiz in quizzes:
+            if not Quiz.objects.filter(pk=quiz.pk, reminder_sent_at__isnull=True).update(reminder_sent_at=now):
+                continue
+            recipients = CourseEnrollment.objects.filter(
+                course_id=quiz.video.unit.course_id, is_active=True
+            ).exclude(student__email='').exclude(
+                student__in=QuizAttempt.objects.filter(
+                    quiz=quiz, completed_at__isnull=False
+                ).values('student_id')
+            ).values_list('student__email', 'student__first_name', 'student__username')
+
+            batch = []
+            for email, first_name, username in recipients.iterator(chunk_size=batch_size):
+                batch.append(_reminder(quiz, email, first_name or username))
+                if len(batch) == batch_size:
+                    sent += mail.send_messages(batch) or 0
+                    batch = []
+            if batch:
+                sent += mail.send_messages(batch) or 0
+            logger.info('Sent deadline reminders for quiz %s', quiz.pk)
+    return sent
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from elearning.courses.curriculum import bump_content_version
+from elearning.courses.models import Course
+from .grading import bump_answer_key_version
+from .leaderboard import record_attempt_score
+from .models import Answer, Question, Quiz, QuizAttempt
+from .schedule import reschedule
+
+
+@receiver(pre_save, sender=Quiz)
+def quiz_schedule_state(sender, instance, **kwargs):
+    # The tutor forms assign the raw datetime-local string.
+    deadline = sender._meta.get_field('deadline').to_python(instance.deadline)
+    if deadline is not None and timezone.is_naive(deadline):
+        deadline = timezone.make_aware(deadline)
+    instance.deadline = deadline
+    instance.is_open = instance.is_active and not instance.is_deadline_passed()
+    if instance.pk and instance.reminder_sent_at:
+        previous = Quiz.objects.filter(pk=instance.pk).values_list('deadline', flat=True).first()
+        if previous != instance.deadline:
+            instance.reminder_sent_at = None
+
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    bump_content_version(Course.objects.filter(units__videos=instance.video_id))
+    transaction.on_commit(reschedule)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_answer_key_version(Quiz.objects.filter(video_id=instance.video_id))
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def answer_changed(sender, instance, **kwargs):
+    # Cascaded answers are removed before their question, so the join still resolves.
+    bump_answer_key_version(Quiz.objects.filter(video__questions=instance.question_id))
+
+
+@receiver(post_save, sender=QuizAttempt)
+def attempt_saved(sender, instance, created, **kwargs):
+    if created and instance.completed_at:
+        # Scored once the submission has committed, so the unit's
+        # leaderboard row is not locked for the whole submit transaction.
+        unit_id = instance.video.unit_id
+        transaction.on_commit(lambda: record_attempt_score(instance, unit_id))
@@ -1,3 +1,233 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from elearning.courses.models import Course, CourseEnrollment, Unit, Video
+from . import leaderboard as leaderboards
+from .analytics import get_item_analysis
+from .importers import QuestionImportError, parse_question_file
+from .leaderboard import LeaderboardEngine, rebuild_leaderboards
+from .models import Answer, Leaderboard, Question, Quiz, QuizAttempt
+
+User = get_user_model()
+
+
+class LeaderboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = User.objects.create_user(username='tutor', role='tutor')
+        course = Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor)
+        cls.unit = Unit.objects.create(course=course, title='Unit 1')
+        cls.quizzes = []
+        for index in range(2):
+            video = Video.objects.create(unit=cls.unit, title=f'Video {index}', video_url='https://example.com', order=index)
+            cls.quizzes.append(Quiz.objects.create(video=video, title=f'Quiz {index}'))
+        cls.students = [User.objects.create_user(username=f'student{index}') for index in range(4)]
+
+    def setUp(self):
+        # The engine the attempt signal reports to, writing ranks straight through.
+        self.engine = LeaderboardEngine(flush_interval=0)
+        patcher = mock.patch.object(leaderboards, 'leaderboard', self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def attempt(self, student, percentage, quiz=0):
+        quiz = self.quizzes[quiz]
+        with self.captureOnCommitCallbacks(execute=True):
+            QuizAttempt.objects.create(
+                student=student, quiz=quiz, video=quiz.video, percentage=percentage, completed_at=timezone.now(),
+            )
+
+    def entry(self, student):
+        return Leaderboard.objects.get(unit=self.unit, student=student)
+
+    def test_only_improvements_change_the_total(self):
+        student = self.students[0]
+        self.attempt(student, 60)
+        self.attempt(student, 50)
+        self.attempt(student, 80)
+        self.attempt(student, 70, quiz=1)
+
+        entry = self.entry(student)
+        self.assertEqual((entry.total_score, entry.total_quizzes, entry.average_score), (150, 2, 75))
+
+    def test_unit_row_is_not_locked_inside_the_submission(self):
+        quiz = self.quizzes[0]
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            QuizAttempt.objects.create(
+                student=self.students[0], quiz=quiz, video=quiz.video, percentage=60, completed_at=timezone.now(),
+            )
+        self.assertFalse([query for query in queries if 'leaderboard' in query['sql']])
+        with self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.entry(self.students[0]).total_score, 60)
+
+    def test_attempts_scored_in_any_order_give_the_same_total(self):
+        quiz = self.quizzes[0]
+        for student, order in ((self.students[0], slice(None)), (self.students[1], slice(None, None, -1))):
+            # Both attempts commit before either is scored.
+            with self.captureOnCommitCallbacks() as callbacks:
+                for percentage in (60, 80):
+                    QuizAttempt.objects.create(
+                        student=student, quiz=quiz, video=quiz.video, percentage=percentage, completed_at=timezone.now(),
+                    )
+            with self.captureOnCommitCallbacks(execute=True):
+                for callback in callbacks[order]:
+                    callback()
+            entry = self.entry(student)
+            self.assertEqual((entry.total_score, entry.total_quizzes), (80, 1))
+
+    def test_ranks_are_written_with_ties(self):
+        for student, percentage in zip(self.students, [90, 70, 70, 50]):
+            self.attempt(student, percentage)
+
+        self.assertEqual([self.entry(student).rank for student in self.students], [1, 2, 2, 4])
+        self.assertEqual(self.engine.top(self.unit.pk, 2), [(self.students[0].pk, 90, 1), (self.students[1].pk, 70, 2)])
+
+        self.attempt(self.students[3], 95)
+
+        self.assertEqual([self.entry(student).rank for student in self.students], [2, 3, 3, 1])
+
+    def test_another_process_applies_only_the_changes(self):
+        for student, percentage in zip(self.students, [90, 70, 60, 50]):
+            self.attempt(student, percentage)
+        other = LeaderboardEngine(flush_interval=0)
+        self.assertEqual(other.rank(self.unit.pk, self.students[3].pk), 4)
+        board = other._boards[self.unit.pk]
+
+        self.attempt(self.students[3], 80)
+
+        # The version check, then the one changed entry.
+        with self.assertNumQueries(2):
+            self.assertEqual(other.rank(self.unit.pk, self.students[3].pk), 2)
+        self.assertIs(other._boards[self.unit.pk], board)
+        self.assertEqual(other.rank(self.unit.pk, self.students[1].pk), 3)
+
+    def test_in_order_changes_are_applied_without_reading_the_table(self):
+        self.attempt(self.students[0], 90)
+        self.attempt(self.students[1], 80)
+        entry = self.entry(self.students[1])
+
+        # Only the rank write.
+        with self.assertNumQueries(1):
+            self.engine.record(self.unit.pk, entry.pk, self.students[1].pk, 95, entry.version + 1)
+        board = self.engine._boards[self.unit.pk]
+        self.assertEqual((board.version, board.rank(self.students[1].pk)), (entry.version + 1, 1))
+
+    def test_rebuild_makes_every_process_reload(self):
+        for student, percentage in zip(self.students, [90, 70, 60, 50]):
+            self.attempt(student, percentage)
+        other = LeaderboardEngine(flush_interval=0)
+        other.rank(self.unit.pk, self.students[0].pk)
+        board = other._boards[self.unit.pk]
+        # A lost update that only the rebuild repairs.
+        Leaderboard.objects.filter(unit=self.unit, student=self.students[3]).update(total_score=99)
+
+        rebuild_leaderboards([self.unit.pk])
+
+        self.assertEqual(other.rank(self.unit.pk, self.students[3].pk), 4)
+        self.assertIsNot(other._boards[self.unit.pk], board)
+        self.assertEqual(self.entry(self.students[3]).total_score, 50)
+
+
+class QuizAvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = User.objects.create_user(username='tutor', role='tutor')
+        course = Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor)
+        unit = Unit.objects.create(course=course, title='Unit 1')
+        video = Video.objects.create(unit=unit, title='Video', video_url='https://example.com')
+        cls.quiz = Quiz.objects.create(video=video, title='Quiz', deadline=timezone.now() + timedelta(days=1))
+        cls.student = User.objects.create_user(username='student')
+        CourseEnrollment.objects.create(student=cls.student, course=course)
+
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def test_quiz_past_its_deadline_is_closed_before_the_scheduler_runs(self):
+        # The deadline passed but the scheduler has not closed the quiz yet.
+        Quiz.objects.filter(pk=self.quiz.pk).update(deadline=timezone.now() - timedelta(minutes=1))
+
+        response = self.client.get(reverse('take_quiz', args=[self.quiz.pk]))
+        self.assertEqual(response.status_code, 302)
+
+        response = self.client.post(
+            reverse('submit_quiz', args=[self.quiz.pk]), json.dumps({'answers': []}), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_open_quiz_can_be_taken(self):
+        response = self.client.get(reverse('take_quiz', args=[self.quiz.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+class ItemAnalysisTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = User.objects.create_user(username='tutor', role='tutor')
+        course = Course.objects.create(title='Algebra', slug='algebra', description='', tutor=tutor)
+        unit = Unit.objects.create(course=course, title='Unit 1')
+        cls.video = Video.objects.create(unit=unit, title='Video', video_url='https://example.com')
+        cls.quiz = Quiz.objects.create(video=cls.video, title='Quiz')
+        question = Question.objects.create(video=cls.video, question_text='2 + 2?')
+        Answer.objects.create(question=question, answer_text='4', is_correct=True)
+        cls.student = User.objects.create_user(username='student')
+
+    def setUp(self):
+        patcher = mock.patch.object(leaderboards, 'leaderboard', LeaderboardEngine(flush_interval=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def attempt(self, percentage):
+        with self.captureOnCommitCallbacks(execute=True):
+            return QuizAttempt.objects.create(
+                student=self.student, quiz=self.quiz, video=self.video,
+                percentage=percentage, completed_at=timezone.now(),
+            )
+
+    def test_cached_analysis_follows_added_and_deleted_attempts(self):
+        self.attempt(100)
+        self.assertEqual(get_item_analysis(self.quiz)['attempts'], 1)
+
+        second = self.attempt(0)
+        self.assertEqual(get_item_analysis(self.quiz)['attempts'], 2)
+
+        second.delete()
+        self.assertEqual(get_item_analysis(self.quiz)['attempts'], 1)
+
+    def test_submission_does_not_write_the_quiz_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.attempt(50)
+        self.assertFalse([query for query in queries if 'UPDATE "quizzes_quiz"' in query['sql']])
+
+
+class QuestionImportPointsTests(TestCase):
+
+    def parse(self, points):
+        content = json.dumps([{
+            'question': '2 + 2?', 'points': points,
+            'answers': [{'text': '4', 'correct': True}, {'text': '5'}],
+        }])
+        return parse_question_file(content, 'bank.json')
+
+    def test_whole_numbers_are_accepted(self):
+        for points, expected in ((3, 3), (2.0, 2), ('4', 4)):
+            with self.subTest(points=points):
+                self.assertEqual(self.parse(points)[0]['points'], expected)
 
-# Create your tests here.
+    def test_fractions_bools_and_non_positive_values_are_rejected(self):
+        for points in (2.7, True, False, 0, -1, '2.5', None, [1]):
+            with self.subTest(points=points), self.assertRaises(QuestionImportError) as raised:
+                self.parse(points)
+            self.assertEqual(raised.exception.errors, [(1, 'points must be a positive integer')])
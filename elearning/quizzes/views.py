@@ -1,12 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.views.decorators.http import require_http_methods
 from elearning.accounts.decorators import tutor_required
-from .models import Quiz, Question, Answer, QuizAttempt, StudentAnswer
-from elearning.courses.models import Video, CourseEnrollment
+from .models import Quiz, Question, Answer, QuizAttempt, Leaderboard
+from elearning.courses.models import Video, Unit, CourseEnrollment
+from elearning.courses.pagination import KeysetPaginator
+from .analytics import get_item_analysis
+from .exports import EXPORT_FORMATS, filter_attempts, stream_export
+from .grading import get_answer_key, record_attempt
+from .importers import FORMATS, QuestionImportError, import_questions, parse_question_file
+from .leaderboard import leaderboard
+from .papers import student_paper
 import json
 
 
@@ -51,6 +58,7 @@ def tutor_edit_quiz(request, quiz_id):
         quiz.pass_percentage = request.POST.get('pass_percentage', 70)
         quiz.time_limit = request.POST.get('time_limit', 30)
         quiz.is_active = request.POST.get('is_active') == 'on'
+        quiz.shuffle_answers = request.POST.get('shuffle_answers') == 'on'
         deadline = request.POST.get('deadline')
         quiz.deadline = deadline if deadline else None
         quiz.save()
@@ -104,6 +112,34 @@ def tutor_add_question(request, quiz_id):
     })
 
 
+@tutor_required
+def tutor_import_questions(request, quiz_id):
+    quiz = get_object_or_404(Quiz, id=quiz_id, video__unit__course__tutor=request.user)
+    errors = []
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('question_file')
+        if not upload:
+            errors = [(0, 'Choose a file to import.')]
+        else:
+            try:
+                questions = parse_question_file(
+                    upload.read(), upload.name, request.POST.get('file_format', '')
+                )
+            except QuestionImportError as exc:
+                errors = exc.errors
+            else:
+                count = import_questions(quiz, questions)
+                messages.success(request, f'Imported {count} questions.')
+                return redirect('tutor_edit_quiz', quiz_id=quiz.id)
+    
+    return render(request, 'quizzes/tutor_import_questions.html', {
+        'quiz': quiz,
+        'errors': errors,
+        'formats': FORMATS,
+    }, status=400 if errors else 200)
+
+
 @tutor_required
 def tutor_delete_question(request, question_id):
     question = get_object_or_404(Question, id=question_id, video__unit__course__tutor=request.user)
@@ -115,13 +151,14 @@ def tutor_delete_question(request, question_id):
 
 @login_required
 def take_quiz(request, quiz_id):
-    quiz = get_object_or_404(Quiz, id=quiz_id)
+    quiz = get_object_or_404(Quiz.objects.select_related('video__unit'), id=quiz_id)
+    course_id = quiz.video.unit.course_id
     
     enrollment = CourseEnrollment.objects.filter(
         student=request.user,
-        course=quiz.video.unit.course,
+        course_id=course_id,
         is_active=True
-    ).first()
+    ).exists()
     
     if not enrollment:
         messages.error(request, 'You must be enrolled in this course to take the quiz.')
@@ -132,74 +169,45 @@ def take_quiz(request, quiz_id):
             messages.error(request, 'The deadline for this quiz has passed.')
         else:
             messages.error(request, 'This quiz is not currently active.')
-        return redirect('course_learn', course_id=quiz.video.unit.course.id)
-    
-    questions = quiz.video.questions.prefetch_related('answers').all()
+        return redirect('course_learn', course_id=course_id)
     
     return render(request, 'quizzes/take_quiz.html', {
         'quiz': quiz,
-        'questions': questions
+        'questions': student_paper(quiz, request.user)
     })
 
 
 @login_required
 @require_http_methods(["POST"])
 def submit_quiz(request, quiz_id):
-    quiz = get_object_or_404(Quiz, id=quiz_id)
-    data = json.loads(request.body)
+    quiz = get_object_or_404(Quiz.objects.select_related('video__unit'), id=quiz_id)
+    try:
+        data = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    submitted = data.get('answers', []) if isinstance(data, dict) else None
+    if not isinstance(submitted, list):
+        return JsonResponse({'error': 'answers must be a list'}, status=400)
     
     enrollment = CourseEnrollment.objects.filter(
         student=request.user,
-        course=quiz.video.unit.course,
+        course_id=quiz.video.unit.course_id,
         is_active=True
-    ).first()
+    ).exists()
     
     if not enrollment:
         return JsonResponse({'error': 'Not enrolled'}, status=403)
     
-    attempt = QuizAttempt.objects.create(
-        student=request.user,
-        quiz=quiz,
-        video=quiz.video
-    )
-    
-    total_score = 0
-    total_points = 0
+    if not quiz.is_available():
+        return JsonResponse({'error': 'This quiz is closed'}, status=403)
     
-    for q_data in data.get('answers', []):
-        question = Question.objects.get(id=q_data['question_id'])
-        total_points += question.points
-        
-        selected_answer_id = q_data.get('answer_id')
-        if selected_answer_id:
-            selected_answer = Answer.objects.get(id=selected_answer_id)
-            is_correct = selected_answer.is_correct
-            points_earned = question.points if is_correct else 0
-            total_score += points_earned
-            
-            StudentAnswer.objects.create(
-                attempt=attempt,
-                question=question,
-                selected_answer=selected_answer,
-                is_correct=is_correct,
-                points_earned=points_earned
-            )
-    
-    percentage = (total_score / total_points * 100) if total_points > 0 else 0
-    is_passed = percentage >= quiz.pass_percentage
-    
-    attempt.score = total_score
-    attempt.total_points = total_points
-    attempt.percentage = percentage
-    attempt.is_passed = is_passed
-    attempt.completed_at = timezone.now()
-    attempt.save()
+    attempt = record_attempt(request.user, quiz, get_answer_key(quiz), submitted)
     
     return JsonResponse({
-        'score': total_score,
-        'total_points': total_points,
-        'percentage': percentage,
-        'is_passed': is_passed,
+        'score': attempt.score,
+        'total_points': attempt.total_points,
+        'percentage': attempt.percentage,
+        'is_passed': attempt.is_passed,
         'attempt_id': attempt.id
     })
 
@@ -220,7 +228,65 @@ def tutor_quiz_analytics(request, quiz_id):
     quiz = get_object_or_404(Quiz, id=quiz_id, video__unit__course__tutor=request.user)
     attempts = QuizAttempt.objects.filter(quiz=quiz).select_related('student')
     
+    paginator = KeysetPaginator(attempts, 50, ordering=('-started_at', '-id'), estimate_total=True)
+    page_obj = paginator.get_page(request.GET)
+    
     return render(request, 'quizzes/tutor_quiz_analytics.html', {
         'quiz': quiz,
-        'attempts': attempts
+        'analysis': get_item_analysis(quiz),
+        'attempts': page_obj,
+        'page_obj': page_obj
+    })
+
+
+@tutor_required
+def tutor_export_attempts(request):
+    filters = {}
+    for param in ('course', 'unit', 'quiz'):
+        value = request.GET.get(param)
+        if value:
+            try:
+                filters[f'{param}_id'] = int(value)
+            except ValueError:
+                return JsonResponse({'error': f'{param} must be an id'}, status=400)
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}, status=400)
+    
+    tutor = None if request.user.role == 'admin' else request.user
+    attempts = filter_attempts(tutor=tutor, **filters)
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(stream_export(attempts, export_format), content_type=f'{content_type}; charset=utf-8')
+    filename = 'quiz-attempts-' + timezone.now().strftime('%Y%m%d-%H%M%S') + '.' + export_format
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required
+def unit_leaderboard(request, unit_id):
+    unit = get_object_or_404(Unit.objects.select_related('course'), id=unit_id)
+    course = unit.course
+    
+    is_staff_view = request.user.role == 'admin' or course.tutor_id == request.user.id
+    if not is_staff_view and not CourseEnrollment.objects.filter(
+        student=request.user, course=course, is_active=True
+    ).exists():
+        messages.error(request, 'You must be enrolled in this course to see its leaderboard.')
+        return redirect('course_detail', slug=course.slug)
+    
+    top = leaderboard.top(unit.id, 10)
+    entries = {
+        entry.student_id: entry
+        for entry in Leaderboard.objects.filter(
+            unit=unit, student_id__in=[student_id for student_id, _, _ in top]
+        ).select_related('student')
+    }
+    rows = [(entries[student_id], rank) for student_id, _, rank in top if student_id in entries]
+    
+    return render(request, 'quizzes/leaderboard.html', {
+        'unit': unit,
+        'rows': rows,
+        'my_rank': leaderboard.rank(unit.id, request.user.id),
+        'my_entry': Leaderboard.objects.filter(unit=unit, student=request.user).first(),
     })
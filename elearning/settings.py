@@ -146,6 +146,25 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Course videos and materials are served through an enrollment check. Set to
+# 'nginx' (X-Accel-Redirect) or 'apache' (X-Sendfile) to let the front-end
+# server stream the bytes; leave empty to stream from Django.
+MEDIA_SENDFILE_BACKEND = os.getenv('MEDIA_SENDFILE_BACKEND', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Uploaded videos are transcoded to HLS renditions by a local ffmpeg in a
+# background process pool. Without ffmpeg on PATH videos are served as-is.
+VIDEO_TRANSCODE_ENABLED = os.getenv('VIDEO_TRANSCODE_ENABLED', 'True') == 'True'
+VIDEO_TRANSCODE_WORKERS = int(os.getenv('VIDEO_TRANSCODE_WORKERS', 2))
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')
+# hls.js for browsers without native HLS playback. By default the pinned
+# version is served from static/vendor/hls.js/ when that copy exists, and
+# from jsDelivr otherwise. HLS_JS_URL overrides the location; set
+# HLS_JS_INTEGRITY to the build's SRI hash to have browsers verify it.
+HLS_JS_URL = os.getenv('HLS_JS_URL', '')
+HLS_JS_INTEGRITY = os.getenv('HLS_JS_INTEGRITY', '')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -161,6 +180,37 @@ CRISPY_TEMPLATE_PACK = "tailwind"
 # Session Configuration - 3 months expiry
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 90  # 90 days in seconds
 SESSION_SAVE_EVERY_REQUEST = True
+# Sessions are only rewritten when their data changes; the sliding expiry is
+# written in batches, at most once per this many seconds per session. With a
+# cache shared by all workers (Redis, Memcached) reads are served from it too.
+SESSION_ENGINE = 'elearning.accounts.session_backend'
+SESSION_EXPIRY_FLUSH_INTERVAL = int(os.getenv('SESSION_EXPIRY_FLUSH_INTERVAL', 300))
+# Seconds a checked (user, session, device, IP) fingerprint is trusted by the
+# single-device middleware before it looks at UserSession again.
+SESSION_FINGERPRINT_TIMEOUT = int(os.getenv('SESSION_FINGERPRINT_TIMEOUT', 60 * 15))
+
+# Video progress heartbeats are buffered in memory and written at most this
+# many seconds apart, which is also the most progress a crash can lose.
+VIDEO_PROGRESS_FLUSH_INTERVAL = int(os.getenv('VIDEO_PROGRESS_FLUSH_INTERVAL', 10))
+
+# Leaderboard ranks are kept in memory and written back at most this many
+# seconds apart. Totals are always written immediately.
+LEADERBOARD_FLUSH_INTERVAL = int(os.getenv('LEADERBOARD_FLUSH_INTERVAL', 5))
+
+# Students get one reminder email for each quiz that closes within this many
+# hours and that they have not completed yet.
+QUIZ_REMINDER_HOURS = int(os.getenv('QUIZ_REMINDER_HOURS', 24))
+
+# Email
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'no-reply@localhost')
+# Base URL used for links in emails.
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
 
 # Login URLs
 LOGIN_URL = '/accounts/login/'
@@ -171,3 +221,22 @@ LOGOUT_REDIRECT_URL = '/accounts/login/'
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY', '')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', '')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
+# Alternative API endpoint, e.g. http://localhost:12111 for a local
+# stripe-mock; empty means Stripe itself.
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', '')
+# Payment provider used by checkout, webhooks and reconciliation. Set it to
+# elearning.payments.gateways.FakeGateway to run without Stripe at all.
+PAYMENT_GATEWAY = os.getenv('PAYMENT_GATEWAY', 'elearning.payments.gateways.StripeGateway')
+
+# Outbound Stripe calls: per-request timeout in seconds, automatic retries of
+# network failures, and how many consecutive failures open the circuit
+# breaker (which then fails checkouts fast for the cooldown, in seconds).
+STRIPE_TIMEOUT = float(os.getenv('STRIPE_TIMEOUT', 10))
+STRIPE_MAX_RETRIES = int(os.getenv('STRIPE_MAX_RETRIES', 2))
+STRIPE_POOL_SIZE = int(os.getenv('STRIPE_POOL_SIZE', 10))
+STRIPE_BREAKER_FAILURES = int(os.getenv('STRIPE_BREAKER_FAILURES', 5))
+STRIPE_BREAKER_COOLDOWN = int(os.getenv('STRIPE_BREAKER_COOLDOWN', 30))
+
+# Threads per web process that process stored webhook events right after they
+# arrive. Set to 0 to leave them to the process_webhooks command.
+STRIPE_WEBHOOK_WORKERS = int(os.getenv('STRIPE_WEBHOOK_WORKERS', 2))
@@ -50,13 +50,17 @@ urlpatterns = [
     path('tutor/units/<int:unit_id>/edit/', course_views.tutor_edit_unit, name='tutor_edit_unit'),
     path('tutor/units/<int:unit_id>/videos/add/', course_views.tutor_add_video, name='tutor_add_video'),
     path('tutor/units/<int:unit_id>/materials/add/', course_views.tutor_add_material, name='tutor_add_material'),
+    path('tutor/units/<int:unit_id>/uploads/', course_views.tutor_start_upload, name='tutor_start_upload'),
+    path('tutor/uploads/<uuid:upload_id>/', course_views.tutor_upload_chunk, name='tutor_upload_chunk'),
     path('tutor/courses/<int:course_id>/progress/', course_views.tutor_student_progress, name='tutor_student_progress'),
     
     path('tutor/quizzes/create/<int:video_id>/', quiz_views.tutor_create_quiz, name='tutor_create_quiz'),
     path('tutor/quizzes/<int:quiz_id>/edit/', quiz_views.tutor_edit_quiz, name='tutor_edit_quiz'),
     path('tutor/quizzes/<int:quiz_id>/questions/add/', quiz_views.tutor_add_question, name='tutor_add_question'),
+    path('tutor/quizzes/<int:quiz_id>/questions/import/', quiz_views.tutor_import_questions, name='tutor_import_questions'),
     path('tutor/questions/<int:question_id>/delete/', quiz_views.tutor_delete_question, name='tutor_delete_question'),
     path('tutor/quizzes/<int:quiz_id>/analytics/', quiz_views.tutor_quiz_analytics, name='tutor_quiz_analytics'),
+    path('tutor/exports/attempts/', quiz_views.tutor_export_attempts, name='tutor_export_attempts'),
     
     path('student-dashboard/', account_views.student_dashboard, name='student_dashboard'),
     path('courses/', course_views.course_catalog, name='course_catalog'),
@@ -65,6 +69,9 @@ urlpatterns = [
     path('courses/<int:course_id>/learn/', course_views.course_learn, name='course_learn'),
     path('videos/<int:video_id>/progress/', course_views.track_video_progress, name='track_video_progress'),
     path('materials/<int:material_id>/view/', course_views.view_material, name='view_material'),
+    path('videos/<int:video_id>/stream/', course_views.stream_video, name='stream_video'),
+    path('videos/<int:video_id>/hls/<path:path>', course_views.video_hls, name='video_hls'),
+    path('materials/<int:material_id>/file/', course_views.material_file, name='material_file'),
     
     path('courses/<int:course_id>/checkout/', payment_views.checkout, name='checkout'),
     path('courses/<int:course_id>/create-payment-intent/', payment_views.create_payment_intent, name='create_payment_intent'),
@@ -75,6 +82,7 @@ urlpatterns = [
     path('quizzes/<int:quiz_id>/take/', quiz_views.take_quiz, name='take_quiz'),
     path('quizzes/<int:quiz_id>/submit/', quiz_views.submit_quiz, name='submit_quiz'),
     path('quizzes/attempts/<int:attempt_id>/results/', quiz_views.quiz_results, name='quiz_results'),
+    path('units/<int:unit_id>/leaderboard/', quiz_views.unit_leaderboard, name='unit_leaderboard'),
 ]
 
 if settings.DEBUG: